@@ -1,41 +1,79 @@
-from flask import Flask, jsonify
+import time
+from flask import Flask, jsonify, Response, g
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_limiter.errors import RateLimitExceeded
-from mongoengine import connect
 from flask_jwt_extended import JWTManager
+from flask_jwt_extended.default_callbacks import default_decode_key_callback
 from config import DevelopmentConfig
-from backend.blueprints.auth.models import User, RevokedToken
+from backend.blueprints.auth.models import User
+from backend.blueprints.auth.revocation import RevocationCache
+from backend.blueprints.auth.principal import PrincipalCache
+from backend.blueprints.auth.hashing import passwords
+from backend.blueprints.coupons.table import active_coupons
+from backend.blueprints.products.autocomplete import product_names
 from datetime import timedelta
 from flask_caching import Cache
 from .celery_utils import celery_init_app
+from .serialization import FastJSONProvider
+from .metrics import registry as metrics
+from . import db
+from .instrumentation import instrumentation, span, record_phase
+from . import ratelimit_storage  # registers the leased+redis:// / leased+memory:// schemes
 
 jwt = JWTManager()
+# storage comes from RATELIMIT_STORAGE_URI (see create_app and ratelimit_storage.py)
 limiter = Limiter(
     key_func=get_remote_address,  # Determines unique user (IP-based)
     default_limits=["10 per minute"],  # Default global limit
-    storage_uri="memory://"  #mongodb://localhost:27017/rate_limits
 )
 
 cache = Cache()
+revocations = RevocationCache()
+principals = PrincipalCache()
 celery_app = None
 
 def create_app(config_class=DevelopmentConfig):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    # jsonify() encodes with orjson when installed (see serialization.py)
+    app.json = FastJSONProvider(app)
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(minutes=30) # expires in 30 
+    # Rate-limit counters shared by all workers, with a per-process lease fast path;
+    # falls back to per-process memory counters if Redis is unreachable
+    app.config.setdefault("RATELIMIT_STORAGE_URI", "leased+redis://localhost:6379/1")
+    app.config.setdefault("RATELIMIT_STORAGE_OPTIONS", {"max_lease": 100})
+    app.config.setdefault("RATELIMIT_IN_MEMORY_FALLBACK_ENABLED", True)
     app.config.from_mapping(
         CELERY=dict(
             broker_url="redis://localhost:6379/0",
             result_backend="redis://localhost:6379/0",
+            imports=(
+                "backend.tasks.notifications",
+                "backend.tasks.inventory",
+                "backend.tasks.outbox",
+            ),
+            beat_schedule={
+                "dispatch-outbox": {"task": "backend.tasks.outbox.dispatch_outbox", "schedule": 1.0},
+                "release-expired-reservations": {
+                    "task": "backend.tasks.inventory.release_expired_reservations", "schedule": 60.0
+                },
+            },
         ),
     )
     
+    instrumentation.init_app(app)
     limiter.init_app(app)
     cache.init_app(app)
+    revocations.init_app(app)
+    principals.init_app(app)
+    passwords.init_app(app)
+    active_coupons.init_app(app)
+    product_names.init_app(app)
 
-    # Initialize MongoEngine
-    connect(host=app.config['MONGO_URI'])
+    # Initialize MongoEngine: pooled `default` (primary) and `catalog`
+    # (secondaryPreferred) aliases, see db.py
+    db.init_app(app)
     jwt.init_app(app)
 
     celery_app = celery_init_app(app)
@@ -48,6 +86,7 @@ def create_app(config_class=DevelopmentConfig):
     from backend.blueprints.cart.routes import cart_bp
     from backend.blueprints.orders.routes import orders_bp
     from backend.blueprints.coupons.routes import coupons_bp
+    from backend.blueprints.products.cache import warmer as product_cache_warmer
     
     app.register_blueprint(test_db_bp, url_prefix='/testdb_connection')
     app.register_blueprint(auth_bp, url_prefix="/auth")
@@ -55,7 +94,18 @@ def create_app(config_class=DevelopmentConfig):
     app.register_blueprint(cart_bp, url_prefix="/cart")
     app.register_blueprint(orders_bp, url_prefix="/orders")
     app.register_blueprint(coupons_bp, url_prefix="/coupons")
+
+    # refills the most requested catalog cache entries after writes, see
+    # products/cache.py
+    product_cache_warmer.init_app(app)
     
+    # Prometheus metrics of this worker (requests, Mongo, caches), see
+    # metrics.py and instrumentation.py
+    @app.get('/metrics')
+    @limiter.exempt
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
     # Handle Rate Limit Errors
     @app.errorhandler(RateLimitExceeded)
     def handle_rate_limit_exceeded(e):
@@ -65,14 +115,23 @@ def create_app(config_class=DevelopmentConfig):
         }), 429
 
     # load user
+    # (with JWT_CLAIM_ONLY_IDENTITY a cached Principal built from the token's
+    # claims is returned; call current_user.load() for the full document)
     @jwt.user_lookup_loader
     def user_lookup_callback(jwt_headers, jwt_data):
+        if app.config["JWT_CLAIM_ONLY_IDENTITY"]:
+            return principals.get(jwt_data)
         identity = jwt_data["sub"]
-        return User.objects(id=identity).first()
+        with span("user_lookup"):
+            return User.objects(id=identity).first()
     
     # additional claims
     @jwt.additional_claims_loader
     def add_claims_to_access_token(identity):
+        # claim-only mode: role and email are passed in explicitly wherever
+        # tokens are issued (login, refresh), so no lookup is needed here
+        if app.config["JWT_CLAIM_ONLY_IDENTITY"]:
+            return {}
         # Lookup the user object based on the identity (user id)
         user = User.objects(id=identity).first()
         if user:
@@ -96,11 +155,21 @@ def create_app(config_class=DevelopmentConfig):
         return jsonify({"message": "The token is missing","error":"authorization_header"}), 401
     
     # revoking access token
+    # (answered from the in-process revocation cache; see auth/revocation.py)
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
-        jti = jwt_payload.get("jti")
-        token = RevokedToken.objects(jti=jti).first()
-        return token is not None
+        started = g.pop("_jwt_decode_started", None)
+        if started is not None:
+            record_phase("jwt_decode", time.perf_counter() - started)
+        with span("revocation"):
+            return revocations.is_revoked(jwt_payload.get("jti"), jwt_payload.get("exp"))
+    
+    # called right before the token's signature is verified; the blocklist
+    # check above runs right after, so the gap is the decode time
+    @jwt.decode_key_loader
+    def decode_key_callback(jwt_header, jwt_data):
+        g._jwt_decode_started = time.perf_counter()
+        return default_decode_key_callback(jwt_header, jwt_data)
     
     return app
    
\ No newline at end of file
@@ -0,0 +1,157 @@
+import asyncio
+from functools import wraps
+import jwt as pyjwt
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from motor.motor_asyncio import AsyncIOMotorClient
+from quart import Quart, g, jsonify, request
+from config import DevelopmentConfig
+from backend.app import create_app, revocations
+
+# Async serving mode
+# ------------------
+# A Quart app that serves the products, cart and orders endpoints as
+# coroutines on Motor, so one worker holds thousands of concurrent
+# connections on an event loop instead of one thread each. It is built around
+# a regular Flask app (create_app) and shares its config and extensions:
+# revocation cache, active-coupon table, product name index, rate-limit
+# storage. Admin and auth endpoints stay on the sync app; order placement
+# (transactions, stock reservations, outbox) runs the sync checkout on a
+# thread inside the Flask app's context.
+#
+#   hypercorn run_async:app
+#
+# Optional dependencies: quart, motor, hypercorn.
+
+
+class AsyncMongo:
+    def __init__(self):
+        self.client = None
+        self.db = None
+
+    def init_app(self, app):
+        @app.before_serving
+        async def connect():
+            # created on the serving loop
+            self.client = AsyncIOMotorClient(app.config["MONGO_URI"])
+            self.db = self.client.get_default_database()
+
+        @app.after_serving
+        async def disconnect():
+            self.client.close()
+
+    def collection(self, document_class):
+        return self.db[document_class._get_collection_name()]
+
+
+class AsyncLimiter:
+    # Same "N per minute" strings, storage and keys as the sync app (fixed
+    # window, keyed by client address and endpoint the way Flask-Limiter keys
+    # them), so a client's requests to both apps count against one limit.
+    # The storage is synchronous (Redis), so hits run on a thread.
+    def __init__(self):
+        self._limiter = None
+        self._key_prefix = ""
+
+    def init_app(self, app):
+        storage = storage_from_string(
+            app.config["RATELIMIT_STORAGE_URI"], **app.config.get("RATELIMIT_STORAGE_OPTIONS", {})
+        )
+        self._limiter = FixedWindowRateLimiter(storage)
+        self._key_prefix = app.config.get("RATELIMIT_KEY_PREFIX", "")
+
+    def _identifiers(self):
+        # [prefix,] client, endpoint, as Flask-Limiter passes them; the async
+        # blueprints are the sync ones with an "_async" suffix
+        blueprint, _, view = (request.endpoint or "").partition(".")
+        endpoint = f"{blueprint.removesuffix('_async')}.{view}"
+        identifiers = [request.remote_addr or "127.0.0.1", endpoint]
+        return [self._key_prefix, *identifiers] if self._key_prefix else identifiers
+
+    def limit(self, value):
+        item = parse(value)
+
+        def decorator(fn):
+            @wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if not await asyncio.to_thread(self._limiter.hit, item, *self._identifiers()):
+                    return jsonify({
+                        "message": "Rate limit exceeded. Please try again later.",
+                        "error": "Too Many Requests"
+                    }), 429
+                return await fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+mongo = AsyncMongo()
+limiter = AsyncLimiter()
+flask_app = None
+
+
+# JWT checks with the sync app's semantics: Bearer access tokens signed with
+# JWT_SECRET_KEY, the same error bodies, and the same revocation cache
+def jwt_required(fn):
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            return jsonify({"message": "The token is missing","error":"authorization_header"}), 401
+        config = flask_app.config
+        try:
+            claims = pyjwt.decode(
+                header[len("Bearer "):],
+                config.get("JWT_SECRET_KEY") or config["SECRET_KEY"],
+                algorithms=[config.get("JWT_ALGORITHM", "HS256")],
+                leeway=config.get("JWT_DECODE_LEEWAY", 0),
+                options={"verify_aud": False}
+            )
+        except pyjwt.ExpiredSignatureError:
+            return jsonify({"message": "The token has expired","error":"token_expired"}), 401
+        except pyjwt.InvalidTokenError:
+            return jsonify({"message": "The token is invalid","error":"invalid_token"}), 401
+        if claims.get("type") != "access":
+            return jsonify({"msg": "Only non-refresh tokens are allowed"}), 422
+        # answered from memory (LRU + Bloom filter) for almost every token,
+        # but warming the filter and a miss read MongoDB, so off the loop
+        if await run_sync(revocations.is_revoked, claims.get("jti"), claims.get("exp")):
+            return jsonify({"msg": "Token has been revoked"}), 401
+        g.jwt = claims
+        return await fn(*args, **kwargs)
+    return wrapper
+
+def get_jwt():
+    return g.jwt
+
+def get_jwt_identity():
+    return g.jwt["sub"]
+
+
+async def run_sync(fn, *args):
+    # blocking MongoEngine code, on a thread inside the Flask app's context
+    def call():
+        with flask_app.app_context():
+            return fn(*args)
+    return await asyncio.to_thread(call)
+
+
+def create_async_app(config_class=DevelopmentConfig):
+    global flask_app
+    flask_app = create_app(config_class)
+
+    app = Quart(__name__)
+    app.config.from_mapping(flask_app.config)
+
+    mongo.init_app(app)
+    limiter.init_app(app)
+
+    from backend.blueprints.products.async_routes import products_async_bp
+    from backend.blueprints.cart.async_routes import cart_async_bp
+    from backend.blueprints.orders.async_routes import orders_async_bp
+
+    app.register_blueprint(products_async_bp, url_prefix="/products")
+    app.register_blueprint(cart_async_bp, url_prefix="/cart")
+    app.register_blueprint(orders_async_bp, url_prefix="/orders")
+
+    return app
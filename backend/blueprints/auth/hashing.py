@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+from backend.instrumentation import span
+
+
+class HashingBusy(Exception):
+    pass
+
+
+# run in the pool's worker processes
+def _hash(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+def _verify(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+# Password hashing service
+# ------------------------
+# Hashing is deliberately slow CPU work, so it runs on a small process pool
+# instead of the request thread (and outside the GIL). At most
+# PASSWORD_HASH_MAX_PENDING hashes may be queued or running per process; past
+# that a caller waits up to PASSWORD_HASH_QUEUE_TIMEOUT seconds for a slot and
+# then gets HashingBusy, so a login storm queues up here instead of starving
+# every other endpoint. PASSWORD_HASH_WORKERS = 0 hashes inline.
+#
+# The pool's processes are started with PASSWORD_HASH_START_METHOD
+# ("forkserver" where available, else "spawn"), never by forking the
+# multithreaded server process, which could copy a lock some other thread
+# holds into a child that then deadlocks on it.
+#
+# Method and cost use werkzeug's syntax, e.g. "scrypt:32768:8:1" or
+# "pbkdf2:sha256:600000". Hashes made with other parameters still verify, and
+# needs_rehash() tells login to upgrade them.
+class PasswordHasher:
+    def __init__(self):
+        self.method = "scrypt"
+        self.salt_length = 16
+        self.workers = min(4, os.cpu_count() or 1)
+        self.max_pending = 32
+        self.queue_timeout = 5.0
+        methods = multiprocessing.get_all_start_methods()
+        self.start_method = "forkserver" if "forkserver" in methods else "spawn"
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+        self._current_prefix = None
+
+    def init_app(self, app):
+        app.config.setdefault("PASSWORD_HASH_METHOD", self.method)
+        app.config.setdefault("PASSWORD_HASH_SALT_LENGTH", self.salt_length)
+        app.config.setdefault("PASSWORD_HASH_WORKERS", self.workers)
+        app.config.setdefault("PASSWORD_HASH_MAX_PENDING", self.max_pending)
+        app.config.setdefault("PASSWORD_HASH_QUEUE_TIMEOUT", self.queue_timeout)
+        app.config.setdefault("PASSWORD_HASH_START_METHOD", self.start_method)
+        self.method = app.config["PASSWORD_HASH_METHOD"]
+        self.salt_length = app.config["PASSWORD_HASH_SALT_LENGTH"]
+        self.workers = app.config["PASSWORD_HASH_WORKERS"]
+        self.max_pending = app.config["PASSWORD_HASH_MAX_PENDING"]
+        self.queue_timeout = app.config["PASSWORD_HASH_QUEUE_TIMEOUT"]
+        self.start_method = app.config["PASSWORD_HASH_START_METHOD"]
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._current_prefix = None
+        app.extensions["password_hasher"] = self
+        if self.workers:
+            self._executor()
+
+    def _executor(self):
+        # created by init_app, and again after a fork (gunicorn workers must
+        # not share the parent's pool); its processes start on first use
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(self.start_method)
+                )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        with span("password_hash"):
+            if not self.workers:
+                return fn(*args)
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                raise HashingBusy("Too many password hashes in progress")
+            try:
+                return self._executor().submit(fn, *args).result()
+            finally:
+                self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        return self._run(_verify, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        # werkzeug hashes look like "<method:params>$<salt>$<hash>"
+        if self._current_prefix is None:
+            # hash once to expand shorthands like "scrypt" to full parameters
+            self._current_prefix = self._run(_hash, "", self.method, 1).split("$", 1)[0]
+        method, _, rest = pwhash.partition("$")
+        salt = rest.partition("$")[0]
+        return method != self._current_prefix or len(salt) != self.salt_length
+
+
+passwords = PasswordHasher()
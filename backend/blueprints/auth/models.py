@@ -1,18 +1,24 @@
 from mongoengine import Document, StringField, DateTimeField
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
-import pytz
+from .hashing import passwords
 
 class User(Document):
     email = StringField(required=True, unique=True)
     password = StringField(required=True)
     role = StringField(required=True, choices=('customer', 'admin','prime_customer'), default='customer')
 
+    # hashed on the password hashing service's process pool (see hashing.py)
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = passwords.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password, password)
+        return passwords.verify(self.password, password)
+
+    def rehash_password(self, password):
+        # upgrade a hash made with outdated parameters; conditional, so a
+        # concurrent password change is never overwritten
+        old_hash = self.password
+        self.set_password(password)
+        User.objects(id=self.pk, password=old_hash).update_one(set__password=self.password)
     
     def to_json(self):
         return {
@@ -23,7 +29,16 @@ class User(Document):
 
 class RevokedToken(Document):
     jti = StringField(required=True, unique=True)
-    revoked_at = DateTimeField(required=True, default=lambda: datetime.now(pytz.timezone("Asia/Kolkata")))
+    # The token's own expiry. The TTL index lets Mongo drop the entry once the
+    # token could no longer be accepted anyway, so the blocklist stays small.
+    expires_at = DateTimeField(db_field='exp')
+
+    meta = {
+        'strict': False,  # entries written before expires_at still carry revoked_at
+        'indexes': [
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0}
+        ]
+    }
     
     def __repr__(self):
         return f"<Token {self.jti}>"
@@ -0,0 +1,72 @@
+import time
+from .models import User
+from .revocation import TTLCache
+
+
+# Lightweight identity for claim-only mode
+# ----------------------------------------
+# Built from the token's claims (sub, role, email) without touching MongoDB.
+# Routes that really need the User document call .load(), which fetches it
+# once per cached principal.
+class Principal:
+    __slots__ = ("id", "role", "email", "_user")
+
+    def __init__(self, id, role=None, email=None):
+        self.id = id
+        self.role = role
+        self.email = email
+        self._user = None
+
+    @property
+    def pk(self):
+        return self.id
+
+    def load(self):
+        if self._user is None:
+            self._user = User.objects(id=self.id).first()
+        return self._user
+
+    def to_json(self):
+        return {
+            "id": self.id,
+            "email": self.email,
+            "role": self.role
+        }
+
+
+class PrincipalCache:
+    def __init__(self):
+        self.ttl = 60
+        self._cache = TTLCache(10_000)
+
+    def init_app(self, app):
+        app.config.setdefault("JWT_CLAIM_ONLY_IDENTITY", False)
+        app.config.setdefault("PRINCIPAL_CACHE_TTL", self.ttl)
+        app.config.setdefault("PRINCIPAL_CACHE_SIZE", 10_000)
+        self.ttl = app.config["PRINCIPAL_CACHE_TTL"]
+        self._cache = TTLCache(app.config["PRINCIPAL_CACHE_SIZE"])
+
+    def get(self, jwt_data):
+        # keyed on the claims too, so a token issued after a role change
+        # never sees a principal built from an older token
+        key = (jwt_data["sub"], jwt_data.get("role"), jwt_data.get("email"))
+        principal = self._cache.get(key)
+        if principal is None:
+            principal = Principal(*key)
+            self._cache.set(key, principal, time.time() + self.ttl)
+        return principal
+
+
+def user_claims(user):
+    return {
+        "role": user.role,
+        "email": user.email
+    }
+
+def claims_from_token(jwt_data):
+    # claims to carry over when a refresh token is exchanged; tokens issued
+    # before claim-only mode may lack them, then the User is read once
+    if "role" in jwt_data and "email" in jwt_data:
+        return {"role": jwt_data["role"], "email": jwt_data["email"]}
+    user = User.objects(id=jwt_data["sub"]).only("role", "email").first()
+    return user_claims(user) if user else {}
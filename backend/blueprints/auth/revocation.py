@@ -0,0 +1,214 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+import pytz
+from bson import ObjectId
+from mongoengine import Q
+from mongoengine.errors import NotUniqueError
+from backend.pubsub import channel_for_app
+from .models import RevokedToken
+
+REVOKED_TOPIC = "revoked_tokens"
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class TTLCache:
+    # Bounded LRU where every entry carries its own expiry time
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Revocation cache for the JWT blocklist check
+# --------------------------------------------
+# Lookup order: LRU (cached answer) -> Bloom filter of revoked JTIs (a miss
+# means "not revoked", no DB read) -> RevokedToken collection. Revocations
+# are published on a pub/sub channel so every worker adds them to its Bloom
+# filter and LRU straight away. Pub/sub drops messages (a failed publish, a
+# listener reconnecting), so "revoked" is cached for the token's remaining
+# lifetime but "not revoked" only for REVOCATION_NEGATIVE_TTL seconds, and
+# the Bloom filter catches up from the collection as often; a resubscribe
+# clears the LRU and reloads the Bloom filter.
+SYNC_OVERLAP = 60  # seconds; revocations written by hosts with skewed clocks
+
+
+class RevocationCache:
+    def __init__(self):
+        self.channel = None
+        self.max_ttl = 60 * 60 * 24
+        self.negative_ttl = 5
+        self.hits = 0
+        self.bloom_skips = 0
+        self.db_lookups = 0
+        self._lru = None
+        self._bloom = None
+        self._warm = False
+        self._warm_lock = threading.Lock()
+        self._synced_at = 0.0
+        # bumped by every revocation; a lookup that overlapped one does not
+        # cache a "not revoked" answer it read before it
+        self._revision = 0
+        self._revision_lock = threading.Lock()
+
+    def init_app(self, app, channel=None):
+        app.config.setdefault("REVOCATION_CACHE_SIZE", 100_000)
+        app.config.setdefault("REVOCATION_BLOOM_CAPACITY", 1_000_000)
+        app.config.setdefault("REVOCATION_BLOOM_ERROR_RATE", 0.01)
+        app.config.setdefault("REVOCATION_MAX_TTL", self.max_ttl)
+        app.config.setdefault("REVOCATION_NEGATIVE_TTL", self.negative_ttl)
+
+        self.max_ttl = app.config["REVOCATION_MAX_TTL"]
+        self.negative_ttl = app.config["REVOCATION_NEGATIVE_TTL"]
+        self._lru = TTLCache(app.config["REVOCATION_CACHE_SIZE"])
+        self._bloom = BloomFilter(app.config["REVOCATION_BLOOM_CAPACITY"], app.config["REVOCATION_BLOOM_ERROR_RATE"])
+        self._warm = False
+
+        self.channel = channel or channel_for_app(app)
+        self.channel.subscribe(REVOKED_TOPIC, self._on_revoked)
+        self.channel.on_resubscribe(self._on_resubscribe)
+        app.extensions["revocations"] = self
+
+    def _expires_at(self, exp, revoked=True):
+        now = time.time()
+        ttl = self.max_ttl if revoked else self.negative_ttl
+        if exp is None:
+            return now + ttl
+        return min(exp, now + ttl)
+
+    def _warm_bloom(self):
+        # Subscribed before loading, so nothing revoked meanwhile is missed
+        with self._warm_lock:
+            if self._warm:
+                return
+            synced_at = time.time()
+            live = RevokedToken.objects(Q(expires_at__gt=datetime.now(pytz.utc)) | Q(expires_at=None))
+            for jti in live.scalar("jti"):
+                self._bloom.add(jti)
+            self._synced_at = synced_at
+            self._warm = True
+
+    def _sync_bloom(self):
+        # adds what was revoked since the last sync (by _id time), in case
+        # the channel dropped it
+        if not self._warm_lock.acquire(blocking=False):
+            return  # another thread is syncing
+        try:
+            synced_at = time.time()
+            since = datetime.fromtimestamp(self._synced_at - SYNC_OVERLAP, tz=pytz.utc)
+            for jti in RevokedToken.objects(id__gte=ObjectId.from_datetime(since)).scalar("jti"):
+                self._bloom.add(jti)
+            self._synced_at = synced_at
+        finally:
+            self._warm_lock.release()
+
+    def is_revoked(self, jti, exp=None):
+        revoked = self._lru.get(jti)
+        if revoked is not None:
+            self.hits += 1
+            return revoked
+
+        revision = self._revision
+
+        if not self._warm:
+            self._warm_bloom()
+        elif time.time() - self._synced_at >= self.negative_ttl:
+            self._sync_bloom()
+
+        if jti not in self._bloom:
+            self.bloom_skips += 1
+            revoked = False
+        else:
+            self.db_lookups += 1
+            revoked = RevokedToken.objects(jti=jti).only("jti").first() is not None
+
+        with self._revision_lock:
+            if revoked or self._revision == revision:
+                self._lru.set(jti, revoked, self._expires_at(exp, revoked))
+                return revoked
+        return self._lru.get(jti) is True
+
+    def revoke(self, jti, exp=None):
+        # stored with the token's real expiry (not the LRU cap); tokens
+        # without one are kept until pruned by hand
+        expires_at = datetime.fromtimestamp(exp, tz=pytz.utc) if exp is not None else None
+        try:
+            RevokedToken(jti=jti, expires_at=expires_at).save()
+        except NotUniqueError:
+            pass  # already revoked
+        self._mark_revoked(jti, exp)
+        self.channel.publish(REVOKED_TOPIC, {"jti": jti, "exp": exp})
+
+    def _mark_revoked(self, jti, exp):
+        with self._revision_lock:
+            self._revision += 1
+            self._bloom.add(jti)
+            self._lru.set(jti, True, self._expires_at(exp))
+
+    def _on_revoked(self, message):
+        self._mark_revoked(message["jti"], message.get("exp"))
+
+    def _on_resubscribe(self):
+        # revocations published while unsubscribed are lost: forget cached
+        # answers and reload the Bloom filter on the next lookup
+        with self._revision_lock:
+            self._revision += 1
+            self._lru.clear()
+            self._warm = False
+
+    def to_json(self):
+        return {
+            "cache_hits": self.hits,
+            "bloom_skips": self.bloom_skips,
+            "db_lookups": self.db_lookups,
+            "cached_tokens": len(self._lru) if self._lru is not None else 0
+        }
@@ -1,11 +1,16 @@
-from flask import Blueprint, jsonify, request
+import click
+from datetime import datetime, timedelta
+import pytz
+from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt, get_jwt_identity
 from mongoengine.errors import ValidationError as MongoValidationError
 from marshmallow.exceptions import ValidationError 
 from .models import User, RevokedToken
+from .hashing import passwords, HashingBusy
+from .principal import user_claims, claims_from_token
 from backend.schemas.register_schema import UserRegisterSchema
 from backend.schemas.login_schema import UserLoginSchema
-from backend.app import limiter
+from backend.app import limiter, revocations
 
 auth_bp = Blueprint('auth', __name__)
 user_register_schema = UserRegisterSchema()
@@ -40,6 +45,8 @@ def register_user():
             "user": user.to_json()
         }), 201
     
+    except HashingBusy:
+        return _hashing_busy_response()
     except MongoValidationError as e:
         return jsonify({
             "message": "Database validation error",
@@ -61,13 +68,21 @@ def login():
     password = data.get('password')
 
     user = User.objects(email=email).first()
-    if not user or not user.check_password(password=password):
-        return jsonify({
-            "message": "Invalid email or password"
-        }), 401
+    try:
+        if not user or not user.check_password(password=password):
+            return jsonify({
+                "message": "Invalid email or password"
+            }), 401
+        # transparently upgrade hashes made with an older method or cost
+        if passwords.needs_rehash(user.password):
+            user.rehash_password(password)
+    except HashingBusy:
+        return _hashing_busy_response()
     
-    access_token = create_access_token(identity=str(user.pk))
-    refresh_token = create_refresh_token(identity=str(user.pk))
+    # role and email come from the user we already loaded
+    claims = user_claims(user)
+    access_token = create_access_token(identity=str(user.pk), additional_claims=claims)
+    refresh_token = create_refresh_token(identity=str(user.pk), additional_claims=claims)
 
     return jsonify({
         "message": "Logged in successfully",
@@ -78,6 +93,14 @@ def login():
         "user": user.to_json()
     }), 200
 
+def _hashing_busy_response():
+    response = jsonify({
+        "message": "Server is busy, please try again shortly",
+        "error": "Service Unavailable"
+    })
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 @auth_bp.get('/protected')
 @limiter.limit("10 per minute")
 @jwt_required()
@@ -99,14 +122,14 @@ def protected():
 @jwt_required(refresh=True)
 def refresh_access_token():
     jwt_data = get_jwt()
-    jti = jwt_data['jti']
     
-    refresh_tokeb_b = RevokedToken(jti=jti)
-    refresh_tokeb_b.save()
+    # revoke the used refresh token on every worker
+    revocations.revoke(jwt_data['jti'], jwt_data.get('exp'))
     
     identity = get_jwt_identity()
-    new_access_token = create_access_token(identity=identity)
-    new_refresh_token = create_refresh_token(identity=identity)
+    claims = claims_from_token(jwt_data)
+    new_access_token = create_access_token(identity=identity, additional_claims=claims)
+    new_refresh_token = create_refresh_token(identity=identity, additional_claims=claims)
 
     return jsonify({
         "access_token": new_access_token,
@@ -119,9 +142,48 @@ def refresh_access_token():
 def logout():
     jwt = get_jwt()
 
-    jti = jwt['jti']
     token_type = jwt['type']
 
-    token_b = RevokedToken(jti=jti)
-    token_b.save()
-    return jsonify({"message": f"{token_type} token revoked and Logout successfully"}), 200
\ No newline at end of file
+    revocations.revoke(jwt['jti'], jwt.get('exp'))
+    return jsonify({"message": f"{token_type} token revoked and Logout successfully"}), 200
+
+# PRUNE REVOKED TOKENS (one-time CLI: `flask auth prune-revoked-tokens`)
+# Backfills `exp` on entries written before the TTL index existed, unsets the
+# old `revoked_at` field and deletes every entry whose token has expired.
+# -------------------------------------------------------------------------
+@auth_bp.cli.command('prune-revoked-tokens')
+@click.option('--lifetime-days', type=int, default=None,
+              help="Lifetime assumed for legacy entries (defaults to JWT_REFRESH_TOKEN_EXPIRES)")
+def prune_revoked_tokens(lifetime_days):
+    if lifetime_days is not None:
+        lifetime = timedelta(days=lifetime_days)
+    else:
+        lifetime = current_app.config.get("JWT_REFRESH_TOKEN_EXPIRES")
+        if not isinstance(lifetime, timedelta):
+            raise click.UsageError("Refresh tokens do not expire; pass --lifetime-days")
+
+    collection = RevokedToken._get_collection()
+    before = _collection_stats(collection)
+
+    # a legacy entry's token expired at the latest `lifetime` after revocation
+    backfilled = collection.update_many(
+        {"exp": {"$exists": False}, "revoked_at": {"$exists": True}},
+        [
+            {"$set": {"exp": {"$add": ["$revoked_at", int(lifetime.total_seconds() * 1000)]}}},
+            {"$unset": "revoked_at"}
+        ]
+    )
+    deleted = collection.delete_many({"exp": {"$lt": datetime.now(pytz.utc)}})
+    RevokedToken.ensure_indexes()
+    after = _collection_stats(collection)
+
+    click.echo(f"Backfilled exp on {backfilled.modified_count} entries, deleted {deleted.deleted_count} expired entries")
+    for label, stats in (("before", before), ("after", after)):
+        click.echo(
+            f"{label}: {stats['count']} documents, "
+            f"{stats['size']} bytes data, {stats['totalIndexSize']} bytes indexes"
+        )
+
+def _collection_stats(collection):
+    stats = collection.database.command("collStats", collection.name)
+    return {key: stats.get(key, 0) for key in ("count", "size", "totalIndexSize")}
@@ -0,0 +1,194 @@
+from decimal import Decimal
+from quart import Blueprint, request, jsonify
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from backend.async_app import mongo, limiter, jwt_required, get_jwt_identity
+from backend.serialization import cart_json
+from backend.blueprints.products.models import Product, ProductVariant
+from .models import Cart
+from backend.validation import is_int, validate_cart_operation
+from .routes import MAX_BATCH_OPERATIONS
+
+# cart_bp as coroutines on Motor (see backend/async_app.py); the filters and
+# updates come from the Cart model, so both apps write carts identically
+cart_async_bp = Blueprint('cart_async', __name__)
+
+
+def _carts():
+    return mongo.collection(Cart)
+
+async def _find_one_and_update(query, update, **kwargs):
+    return await _carts().find_one_and_update(query, update, return_document=ReturnDocument.AFTER, **kwargs)
+
+
+@cart_async_bp.get('/details')
+@limiter.limit("5 per minute")
+@jwt_required
+async def get_cart():
+    cart = await _carts().find_one({"user_id": get_jwt_identity()})
+    if not cart or not cart.get('items'):
+        return jsonify({"message": "Cart is empty"}), 200
+    return jsonify(cart_json(cart)), 200
+
+@cart_async_bp.post('/add_item')
+@limiter.limit("5 per minute")
+@jwt_required
+async def add_to_cart():
+    data = await request.get_json()
+    user_id = get_jwt_identity()
+    product_id = data.get('product_id')
+    sku = data.get('sku')
+    quantity = data.get('quantity', 1)
+    price = data.get('price')
+
+    if not product_id:
+        return jsonify({"message": "Product ID is required"}), 400
+    if not is_int(quantity) or quantity <= 0:
+        return jsonify({"message": "Quantity must be a positive integer"}), 400
+
+    try:
+        doc = await mongo.collection(Product).find_one(*Product.variant_lookup(product_id, sku))
+    except Exception as e:
+        return jsonify({"message": "Failed to fetch product variant", "details": str(e)}), 400
+    variant = Product.first_variant(doc)
+    if variant is None:
+        return jsonify({"message": "Product or variant not found"}), 404
+
+    if price is None:
+        price = variant.price
+        if price is None:
+            return jsonify({"message": "Product has no price"}), 400
+    else:
+        try:
+            price = Decimal(str(price))
+        except Exception as e:
+            return jsonify({"message": "Invalid price format", "details": str(e)}), 400
+
+    increment, push = Cart.add_item_updates(user_id, product_id, quantity, price, variant.sku)
+    for _ in range(3):
+        cart = await _find_one_and_update(*increment)
+        if cart:
+            break
+        try:
+            cart = await _find_one_and_update(*push, upsert=True)
+            break
+        except DuplicateKeyError:
+            continue  # a concurrent request created the cart or pushed this variant first
+    else:
+        return jsonify({"message": "Cart update kept conflicting, please retry"}), 409
+
+    return jsonify({"message": "Item added to cart", "cart": cart_json(cart)}), 200
+
+
+@cart_async_bp.post('/update_item_quantity')
+@limiter.limit("5 per minute")
+@jwt_required
+async def update_item_quantity():
+    data = await request.get_json()
+    user_id = get_jwt_identity()
+    product_id = data.get('product_id')
+    sku = data.get('sku')
+    new_quantity = data.get('quantity')
+
+    if not product_id or new_quantity is None:
+        return jsonify({"message": "Product ID and new quantity are required"}), 400
+    if not is_int(new_quantity):
+        return jsonify({"message": "Quantity must be an integer"}), 400
+
+    if new_quantity <= 0:
+        cart = await _remove_item(user_id, product_id, sku)
+    else:
+        query, update, array_filters = Cart.set_item_update(user_id, product_id, new_quantity, sku)
+        cart = await _find_one_and_update(query, update, array_filters=array_filters)
+    if not cart:
+        return await _missing_item_response(user_id)
+    return jsonify({"message": "Cart updated successfully", "cart": cart_json(cart)}), 200
+
+
+@cart_async_bp.post('/remove_item')
+@limiter.limit("5 per minute")
+@jwt_required
+async def remove_from_cart():
+    data = await request.get_json()
+    user_id = get_jwt_identity()
+    product_id = data.get('product_id')
+
+    if not product_id:
+        return jsonify({"message": "Product ID is required"}), 400
+
+    cart = await _remove_item(user_id, product_id, data.get('sku'))
+    if not cart:
+        return await _missing_item_response(user_id)
+    return jsonify({"message": "Item removed from cart", "cart": cart_json(cart)}), 200
+
+async def _remove_item(user_id, product_id, sku):
+    match = Cart.item_match(product_id, sku)
+    return await _find_one_and_update(
+        {"user_id": user_id, "items": {"$elemMatch": match}},
+        {"$pull": {"items": match}}
+    )
+
+async def _missing_item_response(user_id):
+    if not await _carts().find_one({"user_id": user_id}, {"_id": 1}):
+        return jsonify({"message": "Cart is empty"}), 200
+    return jsonify({"message": "Product not found in cart"}), 404
+
+
+@cart_async_bp.post('/batch')
+@limiter.limit("5 per minute")
+@jwt_required
+async def batch_update_cart():
+    data = await request.get_json()
+    user_id = get_jwt_identity()
+    operations = data.get('operations')
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"message": "A non-empty list of operations is required"}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({"message": f"At most {MAX_BATCH_OPERATIONS} operations per batch"}), 400
+
+    errors = {}
+    for index, operation in enumerate(operations):
+        error = validate_cart_operation(operation)
+        if error:
+            errors[index] = error
+    if errors:
+        return jsonify({"message": "Invalid operations", "errors": errors}), 400
+
+    try:
+        variants = await _fetch_variants({op['product_id'] for op in operations if op['op'] == 'add'})
+    except Exception as e:
+        return jsonify({"message": "Failed to fetch product variants", "details": str(e)}), 400
+
+    for index, operation in enumerate(operations):
+        if operation['op'] != 'add':
+            continue
+        variant = Product.choose_variant(variants.get(operation['product_id'], []), operation.get('sku'))
+        if variant is None:
+            errors[index] = "Product or variant not found"
+            continue
+        operation['sku'] = variant.sku
+        if operation.get('price') is None:
+            operation['price'] = variant.price
+            if operation['price'] is None:
+                errors[index] = "Product has no price"
+        else:
+            operation['price'] = Decimal(str(operation['price']))
+    if errors:
+        return jsonify({"message": "Invalid operations", "errors": errors}), 400
+
+    cart = await _find_one_and_update({"user_id": user_id}, Cart.operations_pipeline(operations), upsert=True)
+    return jsonify({"message": "Cart updated successfully", "cart": cart_json(cart)}), 200
+
+async def _fetch_variants(product_ids):
+    if not product_ids:
+        return {}
+    cursor = mongo.collection(Product).find(
+        {"_id": {"$in": [ObjectId(pid) for pid in product_ids]}},
+        {"variants.sku": 1, "variants.price": 1}
+    )
+    return {
+        str(doc["_id"]): [ProductVariant._from_son(v) for v in doc.get("variants", [])]
+        async for doc in cursor
+    }
@@ -1,7 +1,13 @@
 from mongoengine import Document, EmbeddedDocument, EmbeddedDocumentListField, StringField, IntField, DecimalField
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+class CartConflict(RuntimeError):
+    pass
 
 class CartItem(EmbeddedDocument):
     product_id = StringField(required=True)
+    sku = StringField()  # the chosen variant (absent on lines added before SKUs)
     quantity = IntField(required=True, default=1)
     price = DecimalField(required=True, precision=2)
 
@@ -12,5 +18,133 @@ class Cart(Document):
     def to_json(self):
         return {
             "user_id": self.user_id,
-            "items": [{"product_id": item.product_id, "quantity": item.quantity, "price": item.price} for item in self.items]
+            "items": [{"product_id": item.product_id, "sku": item.sku, "quantity": item.quantity, "price": item.price} for item in self.items]
         }
+
+    # ATOMIC MUTATIONS
+    # Each change is a single server-side update that returns the new cart,
+    # so concurrent requests from one user never overwrite each other.
+    # They return None when the cart (or the item) does not exist.
+    # A line is one variant (SKU) of a product; without a SKU, set and
+    # remove address the product's line(s) regardless of variant.
+    # ---------------------------------------------------------------------
+    @staticmethod
+    def item_match(product_id, sku=None):
+        if sku is None:
+            return {"product_id": product_id}
+        return {"product_id": product_id, "sku": sku}
+
+    @classmethod
+    def _find_one_and_update(cls, query, update, **kwargs):
+        doc = cls._get_collection().find_one_and_update(
+            query, update, return_document=ReturnDocument.AFTER, **kwargs
+        )
+        return cls._from_son(doc) if doc is not None else None
+
+    @classmethod
+    def add_item(cls, user_id, product_id, quantity, price, sku=None):
+        increment, push = cls.add_item_updates(user_id, product_id, quantity, price, sku)
+        for _ in range(3):
+            # bump the quantity if the variant is already in the cart
+            cart = cls._find_one_and_update(*increment)
+            if cart:
+                return cart
+            # otherwise push it, creating the cart on first use
+            try:
+                return cls._find_one_and_update(*push, upsert=True)
+            except DuplicateKeyError:
+                # a concurrent request created the cart or pushed this
+                # variant first; the $inc above will match now
+                continue
+        raise CartConflict("Cart update kept conflicting, please retry")
+
+    @classmethod
+    def add_item_updates(cls, user_id, product_id, quantity, price, sku=None):
+        # -> (filter, update) for the $inc, and for the upserting $push
+        item = CartItem(product_id=product_id, sku=sku, quantity=quantity, price=price).to_mongo()
+        match = cls.item_match(product_id, sku)
+        return (
+            ({"user_id": user_id, "items": {"$elemMatch": match}}, {"$inc": {"items.$.quantity": quantity}}),
+            ({"user_id": user_id, "items": {"$not": {"$elemMatch": match}}}, {"$push": {"items": item}})
+        )
+
+    @classmethod
+    def set_item_quantity(cls, user_id, product_id, quantity, sku=None):
+        if quantity <= 0:
+            return cls.remove_item(user_id, product_id, sku)
+        query, update, array_filters = cls.set_item_update(user_id, product_id, quantity, sku)
+        return cls._find_one_and_update(query, update, array_filters=array_filters)
+
+    @classmethod
+    def set_item_update(cls, user_id, product_id, quantity, sku=None):
+        # -> (filter, update, array_filters); sets every matching line, like
+        # remove pulls every matching line
+        match = cls.item_match(product_id, sku)
+        return (
+            {"user_id": user_id, "items": {"$elemMatch": match}},
+            {"$set": {"items.$[line].quantity": quantity}},
+            [{f"line.{field}": value for field, value in match.items()}]
+        )
+
+    @classmethod
+    def remove_item(cls, user_id, product_id, sku=None):
+        match = cls.item_match(product_id, sku)
+        return cls._find_one_and_update(
+            {"user_id": user_id, "items": {"$elemMatch": match}},
+            {"$pull": {"items": match}}
+        )
+
+    @staticmethod
+    def unchanged_filter(cart):
+        # matches the cart only while it holds exactly the lines read into
+        # `cart` (same variants, same quantities, nothing added)
+        lines = [
+            {"items": {"$elemMatch": {"product_id": item.product_id, "sku": item.sku, "quantity": item.quantity}}}
+            for item in cart.items
+        ]
+        return {"_id": cart.pk, "items": {"$size": len(cart.items)}, "$and": lines}
+
+    # BATCH MUTATIONS
+    # All operations run as one pipeline update (one $set stage per
+    # operation, applied in order), so the whole batch is a single atomic
+    # write. Setting or removing a product that is not in the cart is a no-op.
+    # operations: [{"op": "add"|"set"|"remove", "product_id", "sku", "quantity", "price"}]
+    # --------------------------------------------------------------------------
+    @classmethod
+    def apply_operations(cls, user_id, operations):
+        return cls._find_one_and_update({"user_id": user_id}, cls.operations_pipeline(operations), upsert=True)
+
+    @classmethod
+    def operations_pipeline(cls, operations):
+        pipeline = [{"$set": {"items": {"$ifNull": ["$items", []]}}}]
+        for operation in operations:
+            pipeline.append({"$set": {"items": cls._operation_expr(operation)}})
+        return pipeline
+
+    @staticmethod
+    def _operation_expr(operation):
+        product_id = {"$literal": operation["product_id"]}
+        sku = operation.get("sku")
+        quantity = operation.get("quantity")
+        matches = {"$eq": ["$$this.product_id", product_id]}
+        if sku is not None:
+            matches = {"$and": [matches, {"$eq": ["$$this.sku", {"$literal": sku}]}]}
+
+        def update_matching(new_quantity):
+            return {"$map": {"input": "$items", "in": {"$cond": [
+                matches,
+                {"$mergeObjects": ["$$this", {"quantity": new_quantity}]},
+                "$$this"
+            ]}}}
+
+        if operation["op"] == "remove" or (operation["op"] == "set" and quantity <= 0):
+            return {"$filter": {"input": "$items", "cond": {"$not": [matches]}}}
+        if operation["op"] == "set":
+            return update_matching({"$literal": quantity})
+
+        item = CartItem(product_id=operation["product_id"], sku=sku, quantity=quantity, price=operation["price"]).to_mongo()
+        return {"$cond": [
+            {"$anyElementTrue": [{"$map": {"input": "$items", "in": matches}}]},
+            update_matching({"$add": ["$$this.quantity", quantity]}),
+            {"$concatArrays": ["$items", [{"$literal": item.to_dict()}]]}
+        ]}
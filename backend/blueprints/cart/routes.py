@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
-from .models import Cart, CartItem
+from .models import Cart, CartConflict
 from backend.blueprints.products.models import Product
 from decimal import Decimal
 from backend.app import limiter
+from backend.serialization import cart_json
+from backend.validation import is_int, validate_cart_operation
 
 cart_bp = Blueprint('cart', __name__)
 
@@ -13,10 +15,10 @@ cart_bp = Blueprint('cart', __name__)
 @jwt_required()
 def get_cart():
     user_id = get_jwt_identity()
-    cart = Cart.objects(user_id=user_id).first()
-    if not cart or not cart.items:
+    cart = Cart.objects(user_id=user_id).as_pymongo().first()
+    if not cart or not cart.get('items'):
         return jsonify({"message": "Cart is empty"}), 200
-    return jsonify(cart.to_json()), 200
+    return jsonify(cart_json(cart)), 200
 
 @cart_bp.post('/add_item')
 @limiter.limit("5 per minute")
@@ -25,6 +27,7 @@ def add_to_cart():
     data = request.get_json()
     user_id = get_jwt_identity()
     product_id = data.get('product_id')
+    sku = data.get('sku') # optional: the chosen variant, defaults to the first
     quantity = data.get('quantity', 1)
     price = data.get('price') # optional: price may be provided in payload
 
@@ -32,40 +35,36 @@ def add_to_cart():
         return jsonify({
             "message": "Product ID is required"
         }), 400
+    if not is_int(quantity) or quantity <= 0:
+        return jsonify({"message": "Quantity must be a positive integer"}), 400
     
-    # If price is not provided, attempt to fetch it from the Product model
+    # Fetch only the chosen variant; its SKU goes on the cart line, and
+    # its price is used if price is not provided
+    try:
+        variant = Product.find_variant(product_id, sku)
+    except Exception as e:
+        return jsonify({
+            "message": "Failed to fetch product variant",
+            "details": str(e)
+            }), 400
+    if variant is None:
+        return jsonify({"message": "Product or variant not found"}), 404
+
     if price is None:
-        try:
-            product = Product.objects.get(id=product_id)
-            price = product.variants[0].price if product.variants else None
-            if price is None:
-                return jsonify({"message": "Product has no price"}), 400
-        except Exception as e:
-            return jsonify({
-                "message": "Failed to fetch product price",
-                "details": str(e)
-                }), 400
+        price = variant.price
+        if price is None:
+            return jsonify({"message": "Product has no price"}), 400
     else:
         try:
             price = Decimal(str(price))
         except Exception as e:
             return jsonify({"message": "Invalid price format", "details": str(e)}), 400
         
-    cart = Cart.objects(user_id=user_id).first()
-    if not cart:
-        # creating a new cart if one does not exist for the user
-        cart = Cart(user_id=user_id, items=[])
-
-    # check if the product already exists for the user
-    for item in cart.items:
-        if item.product_id == product_id:
-            item.quantity += quantity
-            break
-    else:
-        # if product is not in the cart, add it as a new item
-        cart.items.append(CartItem(product_id=product_id, quantity=quantity, price=price))
-    
-    cart.save()
+    # single atomic upsert: $inc if the variant is in the cart, else $push
+    try:
+        cart = Cart.add_item(user_id, product_id, quantity, price, sku=variant.sku)
+    except CartConflict as e:
+        return jsonify({"message": str(e)}), 409
     return jsonify({
         "message": "Item added to cart",
         "cart": cart.to_json()
@@ -79,30 +78,20 @@ def update_item_quantity():
     data = request.get_json()
     user_id = get_jwt_identity()
     product_id = data.get('product_id')
+    sku = data.get('sku')
     new_quantity = data.get('quantity')
 
     if not product_id or new_quantity is None:
         return jsonify({"message": "Product ID and new quantity are required"}), 400
 
-    cart = Cart.objects(user_id=user_id).first()
+    if not is_int(new_quantity):
+        return jsonify({"message": "Quantity must be an integer"}), 400
+
+    # $set on the matching line(s) ($pull when quantity <= 0)
+    cart = Cart.set_item_quantity(user_id, product_id, new_quantity, sku)
     if not cart:
-        return jsonify({"message": "Cart is empty"}), 200
+        return _missing_item_response(user_id)
 
-    # Finding the cart item and update the quantity
-    item_found = False
-    for item in cart.items:
-        if item.product_id == product_id:
-            item_found = True
-            if new_quantity > 0:
-                item.quantity = new_quantity
-            else:
-                cart.items.remove(item)
-            break
-
-    if not item_found:
-        return jsonify({"message": "Product not found in cart"}), 404
-
-    cart.save()
     return jsonify({
         "message": "Cart updated successfully",
         "cart": cart.to_json()
@@ -117,28 +106,93 @@ def remove_from_cart():
     data = request.get_json()
     user_id = get_jwt_identity()
     product_id = data.get('product_id')
+    sku = data.get('sku')
 
     if not product_id:
         return jsonify({
             "message": "Product ID is required"
         }), 400
     
-    cart =  Cart.objects(user_id=user_id).first()
+    cart = Cart.remove_item(user_id, product_id, sku)
     if not cart:
+        return _missing_item_response(user_id)
+
+    return jsonify({
+        "message": "Item removed from cart",
+        "cart": cart.to_json()
+    }), 200
+
+
+# Nothing matched: tell an empty cart apart from a missing item
+def _missing_item_response(user_id):
+    if not Cart.objects(user_id=user_id).only('id').first():
         return jsonify({
             "message": "Cart is empty"
         }), 200
-    
-    original_length = len(cart.items)
-    cart.items = [item for item in cart.items if item.product_id != product_id]
-    
-    if len(cart.items) == original_length:
+    return jsonify({
+        "message": "Product not found in cart"
+    }), 404
+
+
+# Apply many add/set/remove operations in one request
+# (variants and missing prices resolved with one product query, all changes
+# applied as a single atomic cart update)
+MAX_BATCH_OPERATIONS = 100
+
+@cart_bp.post('/batch')
+@limiter.limit("5 per minute")
+@jwt_required()
+def batch_update_cart():
+    data = request.get_json()
+    user_id = get_jwt_identity()
+    operations = data.get('operations')
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"message": "A non-empty list of operations is required"}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({"message": f"At most {MAX_BATCH_OPERATIONS} operations per batch"}), 400
+
+    errors = {}
+    for index, operation in enumerate(operations):
+        error = validate_cart_operation(operation)
+        if error:
+            errors[index] = error
+    if errors:
+        return jsonify({"message": "Invalid operations", "errors": errors}), 400
+
+    try:
+        variants = _fetch_variants({op['product_id'] for op in operations if op['op'] == 'add'})
+    except Exception as e:
         return jsonify({
-            "message": "Product not found in cart"
-        }), 404
-    
-    cart.save()
+            "message": "Failed to fetch product variants",
+            "details": str(e)
+        }), 400
+
+    for index, operation in enumerate(operations):
+        if operation['op'] != 'add':
+            continue
+        variant = Product.choose_variant(variants.get(operation['product_id'], []), operation.get('sku'))
+        if variant is None:
+            errors[index] = "Product or variant not found"
+            continue
+        operation['sku'] = variant.sku
+        if operation.get('price') is None:
+            operation['price'] = variant.price
+            if operation['price'] is None:
+                errors[index] = "Product has no price"
+        else:
+            operation['price'] = Decimal(str(operation['price']))
+    if errors:
+        return jsonify({"message": "Invalid operations", "errors": errors}), 400
+
+    cart = Cart.apply_operations(user_id, operations)
     return jsonify({
-        "message": "Item removed from cart",
+        "message": "Cart updated successfully",
         "cart": cart.to_json()
-    }), 200
\ No newline at end of file
+    }), 200
+
+def _fetch_variants(product_ids):
+    if not product_ids:
+        return {}
+    products = Product.objects(id__in=list(product_ids)).only('variants.sku', 'variants.price')
+    return {str(product.pk): product.variants for product in products}
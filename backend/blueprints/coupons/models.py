@@ -12,6 +12,12 @@ class Coupon(Document):
     expiry = DateTimeField(required=True)
     # Optional: list of roles eligible for this coupon (default to customers)
     eligible_roles = ListField(StringField(), default=["customer"])
+    # Optional usage limits (unset = unlimited), enforced by CouponRedemption
+    max_redemptions = IntField(min_value=1)
+    max_redemptions_per_user = IntField(min_value=1)
+
+    # eligibility lookups filter by role and unexpired
+    meta = {'indexes': [('eligible_roles', 'expiry')]}
 
     def to_json(self):
         return {
@@ -19,5 +25,84 @@ class Coupon(Document):
             "code": self.code,
             "discount_percent": self.discount_percent,
             "expiry": self.expiry.isoformat(),
-            "eligible_roles": self.eligible_roles
-        }
\ No newline at end of file
+            "eligible_roles": self.eligible_roles,
+            "max_redemptions": self.max_redemptions,
+            "max_redemptions_per_user": self.max_redemptions_per_user
+        }
+
+    @property
+    def has_usage_limits(self):
+        return bool(self.max_redemptions or self.max_redemptions_per_user)
+
+class CouponRedemption(Document):
+    # One counter document per coupon code with its total redemptions; the
+    # per-user counts live in CouponUserRedemption, one small document per
+    # (coupon, user), so this one never grows. A redemption is a conditional
+    # $inc on each, so limits hold under any concurrency without ever
+    # counting orders.
+    code = StringField(primary_key=True)
+    count = IntField(default=0)
+
+    meta = {'collection': 'coupon_redemptions'}
+
+    @classmethod
+    def redeem(cls, coupon, user_id, session=None):
+        per_user = CouponUserRedemption._get_collection()
+        user_key = {"code": coupon.code, "user_id": user_id}
+        user_query = dict(user_key)
+        if coupon.max_redemptions_per_user:
+            user_query["count"] = {"$lt": coupon.max_redemptions_per_user}
+        if not _conditional_inc(per_user, user_key, user_query, session):
+            return False
+
+        query = {"_id": coupon.code}
+        if coupon.max_redemptions:
+            query["count"] = {"$lt": coupon.max_redemptions}
+        if _conditional_inc(cls._get_collection(), {"_id": coupon.code}, query, session):
+            return True
+        # the total limit is reached: give the user's redemption back
+        per_user.update_one(user_key, {"$inc": {"count": -1}}, session=session)
+        return False
+
+    @classmethod
+    def refund(cls, coupon, user_id, session=None):
+        cls._get_collection().update_one({"_id": coupon.code}, {"$inc": {"count": -1}}, session=session)
+        CouponUserRedemption._get_collection().update_one(
+            {"code": coupon.code, "user_id": user_id}, {"$inc": {"count": -1}}, session=session
+        )
+
+    @classmethod
+    def split_user_counts(cls):
+        # moves per-user counts kept in an embedded "users" map (before
+        # CouponUserRedemption) out to their own documents; -> users moved
+        collection, per_user = cls._get_collection(), CouponUserRedemption._get_collection()
+        moved = 0
+        for doc in collection.find({"users": {"$exists": True}}, {"users": 1}):
+            for user_id, count in doc["users"].items():
+                per_user.update_one(
+                    {"code": doc["_id"], "user_id": user_id}, {"$inc": {"count": count}}, upsert=True
+                )
+                moved += 1
+            collection.update_one({"_id": doc["_id"]}, {"$unset": {"users": ""}})
+        return moved
+
+
+class CouponUserRedemption(Document):
+    code = StringField(required=True)
+    user_id = StringField(required=True)
+    count = IntField(default=0)
+
+    meta = {
+        'collection': 'coupon_user_redemptions',
+        'indexes': [{'fields': ['code', 'user_id'], 'unique': True}]
+    }
+
+
+def _conditional_inc(collection, key, query, session):
+    # $inc count where `query` matches; the counter is created on first use
+    if collection.update_one(query, {"$inc": {"count": 1}}, session=session).modified_count:
+        return True
+    # nothing matched: either a limit is reached or the counter does not
+    # exist yet
+    collection.update_one(key, {"$setOnInsert": {"count": 0}}, upsert=True, session=session)
+    return bool(collection.update_one(query, {"$inc": {"count": 1}}, session=session).modified_count)
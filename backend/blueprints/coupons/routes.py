@@ -1,3 +1,4 @@
+import click
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt
 from mongoengine.errors import ValidationError as MongoValidationError
@@ -5,7 +6,9 @@ from mongoengine.errors import NotUniqueError as MongoUniqueError
 from backend.app import limiter
 from datetime import datetime
 import pytz
-from .models import Coupon
+from backend.serialization import coupon_json
+from .models import Coupon, CouponRedemption
+from .table import active_coupons
 
 coupons_bp = Blueprint('coupons', __name__)
 
@@ -18,8 +21,8 @@ def get_all_coupons():
     if claims.get('role') != 'admin':
         return jsonify({"message": "Only admins can access all coupons"}), 403
 
-    coupons = Coupon.objects()  # Retrieve all coupons
-    coupons_list = [coupon.to_json() for coupon in coupons]
+    coupons = Coupon.objects().as_pymongo()  # Retrieve all coupons (raw documents)
+    coupons_list = [coupon_json(coupon) for coupon in coupons]
     
     return jsonify({
         "message": "Coupons retrieved successfully",
@@ -46,7 +49,10 @@ def create_coupon():
 
         # Optionally, check eligible_roles if provided; default to ['customer']
         eligible_roles = data.get('eligible_roles', ["customer"])
-    except (KeyError, ValueError) as e:
+        # Optional usage limits (omit for unlimited)
+        max_redemptions = _optional_int(data.get('max_redemptions'))
+        max_redemptions_per_user = _optional_int(data.get('max_redemptions_per_user'))
+    except (KeyError, ValueError, TypeError) as e:
         return jsonify({
             "message": "Invalid input",
             "details": str(e)
@@ -57,9 +63,12 @@ def create_coupon():
             code=code,
             discount_percent=discount_percent,
             expiry=expiry,
-            eligible_roles=eligible_roles
+            eligible_roles=eligible_roles,
+            max_redemptions=max_redemptions,
+            max_redemptions_per_user=max_redemptions_per_user
         )
         coupon.save()
+        active_coupons.invalidate()
     except (MongoValidationError, MongoUniqueError) as e:
         return jsonify({
             "message": "Coupon creation failed",
@@ -71,6 +80,9 @@ def create_coupon():
         "coupon": coupon.to_json()
     }), 201
 
+def _optional_int(value):
+    return int(value) if value is not None else None
+
 # UPDATE COUPON (Admin only)
 @coupons_bp.put('/update/<coupon_code>')
 @limiter.limit("5 per minute")
@@ -87,15 +99,20 @@ def update_coupon(coupon_code):
         return jsonify({"message": "Coupon not found"}), 404
 
     try:
-        # Allow updating discount_percent, expiry, and eligible_roles
+        # Allow updating discount_percent, expiry, eligible_roles and usage limits
         if 'discount_percent' in data:
             coupon.discount_percent = int(data['discount_percent'])
         if 'expiry' in data:
             coupon.expiry = datetime.fromisoformat(data['expiry']).replace(tzinfo=pytz.utc)
         if 'eligible_roles' in data:
             coupon.eligible_roles = data['eligible_roles']
+        if 'max_redemptions' in data:
+            coupon.max_redemptions = _optional_int(data['max_redemptions'])
+        if 'max_redemptions_per_user' in data:
+            coupon.max_redemptions_per_user = _optional_int(data['max_redemptions_per_user'])
         coupon.save()
-    except (ValueError, MongoValidationError) as e:
+        active_coupons.invalidate()
+    except (ValueError, TypeError, MongoValidationError) as e:
         return jsonify({
             "message": "Coupon update failed",
             "details": str(e)
@@ -121,6 +138,7 @@ def delete_coupon(coupon_code):
 
     try:
         coupon.delete()
+        active_coupons.invalidate()
     except MongoValidationError as e:
         return jsonify({
             "message": "Coupon deletion failed",
@@ -140,14 +158,20 @@ def get_user_coupons():
     user_role = claims.get('role')
     
     # Retrieving coupons that include the user's role in their eligible_roles
-    # and that haven't expired
-    coupons = Coupon.objects(
-        eligible_roles__in=[user_role],
-        expiry__gte=datetime.now(pytz.utc)
-    )
+    # and that haven't expired (from the in-memory active-coupon table)
+    coupons = active_coupons.for_role(user_role)
     coupons_list = [coupon.to_json() for coupon in coupons]
     
     return jsonify({
         "message": "Coupons retrieved successfully",
         "coupons": coupons_list
-    }), 200
\ No newline at end of file
+    }), 200
+
+
+# MOVE PER-USER REDEMPTION COUNTS to coupon_user_redemptions
+# (CLI: `flask coupons split-redemption-counts`; once, after upgrading)
+# ---------------------------------------------------------------------
+@coupons_bp.cli.command('split-redemption-counts')
+def split_redemption_counts():
+    moved = CouponRedemption.split_user_counts()
+    click.echo(f"Moved {moved} per-user redemption counts")
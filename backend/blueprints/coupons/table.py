@@ -0,0 +1,102 @@
+import heapq
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+import pytz
+from backend import db
+from backend.pubsub import channel_for_app
+from .models import Coupon
+
+COUPONS_TOPIC = "coupons"
+# seconds after an invalidation during which loads go to the primary
+WRITE_WINDOW = 10
+
+
+def _expires_at(coupon):
+    expiry = coupon.expiry
+    if expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=pytz.utc)
+    return expiry.timestamp()
+
+
+# Process-local table of active coupons
+# -------------------------------------
+# Coupons change rarely and are read on every checkout and coupon listing, so
+# each worker keeps the unexpired ones in memory, keyed by code and by role.
+# Entries drop out as they expire. The coupon routes call invalidate(), which
+# is fanned out to every worker over the pub/sub channel; a periodic reload is
+# the safety net for a missed message. Loads read from the catalog alias,
+# except right after an invalidation, when a secondary may still lag.
+class ActiveCouponTable:
+    def __init__(self):
+        self.refresh_interval = 300
+        self.channel = None
+        self._by_code = {}
+        self._by_role = {}
+        self._expiries = []
+        self._loaded_at = None
+        self._primary_until = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app, channel=None):
+        app.config.setdefault("COUPON_TABLE_REFRESH", self.refresh_interval)
+        self.refresh_interval = app.config["COUPON_TABLE_REFRESH"]
+        self.channel = channel or channel_for_app(app)
+        self.channel.subscribe(COUPONS_TOPIC, lambda message: self._reset())
+        self._reset()
+        app.extensions["active_coupons"] = self
+
+    def _reset(self):
+        with self._lock:
+            self._loaded_at = None
+            self._primary_until = time.time() + WRITE_WINDOW
+
+    def _load(self):
+        by_code, by_role, expiries = {}, defaultdict(list), []
+        alias = db.DEFAULT if time.time() < self._primary_until else db.CATALOG
+        for coupon in db.objects(Coupon, alias)(expiry__gte=datetime.now(pytz.utc)).order_by('expiry'):
+            by_code[coupon.code] = coupon
+            for role in coupon.eligible_roles:
+                by_role[role].append(coupon)
+            expiries.append((_expires_at(coupon), coupon.code))
+        heapq.heapify(expiries)
+        self._by_code, self._by_role, self._expiries = by_code, dict(by_role), expiries
+        self._loaded_at = time.time()
+
+    def _purge_expired(self, now):
+        expired = set()
+        while self._expiries and self._expiries[0][0] < now:
+            _, code = heapq.heappop(self._expiries)
+            expired.add(code)
+        if expired:
+            self._by_code = {code: c for code, c in self._by_code.items() if code not in expired}
+            self._by_role = {
+                role: [c for c in coupons if c.code not in expired]
+                for role, coupons in self._by_role.items()
+            }
+
+    def _current(self):
+        now = time.time()
+        with self._lock:
+            if self._loaded_at is None or now - self._loaded_at > self.refresh_interval:
+                self._load()
+            elif self._expiries and self._expiries[0][0] < now:
+                self._purge_expired(now)
+            return self._by_code, self._by_role
+
+    def get(self, code):
+        by_code, _ = self._current()
+        return by_code.get(code)
+
+    def for_role(self, role):
+        _, by_role = self._current()
+        return list(by_role.get(role, []))
+
+    def invalidate(self):
+        self._reset()
+        if self.channel is not None:
+            self.channel.publish(COUPONS_TOPIC, {"event": "invalidate"})
+
+
+active_coupons = ActiveCouponTable()
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+import pytz
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError
+from .models import Order
+
+ARCHIVE_COLLECTION = "orders_archive"
+DUPLICATE_KEY = 11000
+
+
+def archive_collection():
+    return Order._get_collection().database[ARCHIVE_COLLECTION]
+
+
+# Order archival
+# --------------
+# Moves orders older than N days from the hot `order` collection into
+# `orders_archive`, batch by batch (copy, then delete), which keeps the hot
+# collection and its indexes small. Safe to rerun after a crash: a batch that
+# was copied but not deleted is copied again and duplicates are skipped.
+def archive_orders(older_than_days, batch_size=1000):
+    cutoff = datetime.now(pytz.utc) - timedelta(days=older_than_days)
+    orders = Order._get_collection()
+    archive = archive_collection()
+    archive.create_index([("user_id", 1), ("created_at", -1)])
+
+    moved = 0
+    while True:
+        batch = list(orders.find({"created_at": {"$lt": cutoff}}).sort("created_at", 1).limit(batch_size))
+        if not batch:
+            break
+        try:
+            archive.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+                raise
+        orders.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+        moved += len(batch)
+    return moved
+
+
+def find_archived(order_id):
+    try:
+        doc = archive_collection().find_one({"_id": ObjectId(order_id)})
+    except InvalidId:
+        return None
+    return Order._from_son(doc) if doc else None
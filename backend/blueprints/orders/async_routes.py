@@ -0,0 +1,106 @@
+from datetime import datetime
+from quart import Blueprint, request, jsonify
+from bson import ObjectId
+from bson.errors import InvalidId
+from backend.async_app import mongo, limiter, jwt_required, get_jwt, get_jwt_identity, run_sync
+from backend.pagination import encode_cursor, decode_cursor, InvalidCursor
+from backend.serialization import order_summary_json
+from backend.validation import parse_time
+from .models import Order
+from .archive import ARCHIVE_COLLECTION
+from . import checkout
+
+# orders_bp as coroutines on Motor (see backend/async_app.py)
+orders_async_bp = Blueprint('orders_async', __name__)
+
+
+# Create an Order
+# (checkout needs a transaction, stock reservations and the outbox, so the
+# sync checkout runs on a thread; the event loop stays free meanwhile)
+@orders_async_bp.post('/create')
+@limiter.limit("5 per minute")
+@jwt_required
+async def create_order():
+    data = await request.get_json()
+    body, status = await run_sync(
+        checkout.checkout_cart,
+        get_jwt_identity(),
+        get_jwt().get('role'),
+        data.get("coupon_code"),
+        request.headers.get("Idempotency-Key")
+    )
+    return jsonify(body), status
+
+
+# Order History for the current user (newest first, keyset pagination)
+@orders_async_bp.get('/mine')
+@limiter.limit("5 per minute")
+@jwt_required
+async def list_my_orders():
+    user_id = get_jwt_identity()
+    per_page = min(max(request.args.get('per_page', default=10, type=int), 1), 100)
+    status = request.args.get('status')
+    cursor = request.args.get('cursor')
+
+    if status and status not in Order.status.choices:
+        return jsonify({"message": f"status must be one of {', '.join(Order.status.choices)}"}), 400
+    try:
+        since = parse_time(request.args.get('since'))
+    except ValueError as e:
+        return jsonify({"message": "Invalid since", "details": str(e)}), 400
+
+    query = {"user_id": user_id}
+    if status:
+        query["status"] = status
+    if since:
+        query["created_at"] = {"$gte": since}
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor, 2)
+            created_at, last_id = datetime.fromisoformat(created_at), ObjectId(last_id)
+        except (InvalidCursor, InvalidId, ValueError) as e:
+            return jsonify({"message": "Invalid cursor", "details": str(e)}), 400
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}}
+        ]
+
+    projection = {field: 1 for field in Order.SUMMARY_FIELDS if field != 'id'}
+    orders = await (
+        mongo.collection(Order).find(query, projection)
+        .sort([("created_at", -1), ("_id", -1)])
+        .limit(per_page + 1)
+        .to_list(per_page + 1)
+    )
+    has_more = len(orders) > per_page
+    orders = orders[:per_page]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(orders[-1]["created_at"].isoformat(), orders[-1]["_id"])
+
+    return jsonify({
+        "per_page": per_page,
+        "status": status,
+        "next_cursor": next_cursor,
+        "orders": [order_summary_json(order) for order in orders]
+    }), 200
+
+
+# Track Order Status (falls back to the archive collection)
+@orders_async_bp.get('/<order_id>')
+@limiter.limit("5 per minute")
+@jwt_required
+async def track_order(order_id):
+    try:
+        query = {"_id": ObjectId(order_id)}
+    except InvalidId:
+        return jsonify({"message": "Order not found"}), 404
+    doc = await mongo.collection(Order).find_one(query)
+    if doc is None:
+        doc = await mongo.db[ARCHIVE_COLLECTION].find_one(query)
+    if doc is None:
+        return jsonify({"message": "Order not found"}), 404
+    return jsonify({
+        "order": Order._from_son(doc).to_json()
+    }), 200
@@ -0,0 +1,241 @@
+from datetime import datetime
+from decimal import Decimal
+import pytz
+from bson import ObjectId
+from flask import current_app
+from mongoengine.connection import get_connection
+from mongoengine.errors import ValidationError as MongoValidationError
+from pymongo.errors import DuplicateKeyError
+from backend.blueprints.cart.models import Cart
+from backend.blueprints.coupons.models import Coupon, CouponRedemption
+from backend.blueprints.coupons.table import active_coupons
+from backend.tasks.outbox import dispatch_outbox
+from backend import db
+from .models import Order, OrderItem, OutboxEvent, IdempotencyKey
+from . import inventory
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class DuplicateRequest(Exception):
+    def __init__(self, order):
+        super().__init__(f"Order {order.pk} was already placed for this idempotency key")
+        self.order = order
+
+
+class OrderInProgress(CheckoutError):
+    # the key is taken but its order is not visible yet (the first request is
+    # still running, or its transaction has not committed)
+    def __init__(self):
+        super().__init__("An order with this idempotency key is in progress, please retry")
+
+
+def find_idempotent_order(user_id, key):
+    if not key:
+        return None
+    record = IdempotencyKey.objects(user_id=user_id, key=key).first()
+    return Order.objects(id=record.order_id).first() if record else None
+
+
+# Place an order from the user's cart
+# -----------------------------------
+# Shared by the sync and async apps (the async app runs it on a thread).
+# Returns the response body and status code.
+def checkout_cart(user_id, user_role, coupon_code=None, idempotency_key=None):
+    original = find_idempotent_order(user_id, idempotency_key)
+    if original:
+        return _order_placed(original)
+
+    # fetch cart items from the Cart
+    cart = Cart.objects(user_id=user_id).first()
+    if not cart or not cart.items:
+        return {"message": "Cart is empty"}, 400
+
+    order_items = []
+    total_amount = Decimal("0.00")
+
+    for item in cart.items:
+        quantity = item.quantity
+        price = item.price
+        total_amount += price * quantity
+        order_items.append(OrderItem(
+            product_id=item.product_id,
+            sku=item.sku,
+            quantity=quantity,
+            price=price
+        ))
+    
+    discount_applied = Decimal("0.00")
+    coupon = None
+    if coupon_code:
+        # served from the in-memory active-coupon table (no database round trip);
+        # expired coupons have already dropped out of it. place_order confirms
+        # it on the primary, as the table may lag a delete or an edit
+        coupon = active_coupons.get(coupon_code)
+        if not coupon:
+            return {"message": "Invalid or expired coupon code"}, 400
+        
+        # Convert coupon expiry to UTC explicitly
+        coupon_expiry_utc = coupon.expiry.replace(tzinfo=pytz.utc) if coupon.expiry.tzinfo is None else coupon.expiry
+        
+        # Check coupon eligibility based on user's role
+        if coupon.eligible_roles and user_role not in coupon.eligible_roles:
+            return {"message": "You are not eligible to use this coupon"}, 400
+        
+        if coupon_expiry_utc < datetime.now(pytz.utc):
+            return {"message": "Coupon expired"}, 400
+  
+        discount_applied = (total_amount * Decimal(coupon.discount_percent)) / Decimal(100)
+
+    final_amount = total_amount - discount_applied
+
+    # Reserve stock for every line (one conditional bulk write) before the
+    # order is written, so concurrent buyers can never oversell a SKU
+    try:
+        reservation = inventory.reserve(user_id, inventory.cart_lines(cart.items))
+    except inventory.OutOfStock as e:
+        return {
+            "message": "Insufficient stock",
+            "skus": e.skus
+        }, 409
+
+    order = Order(
+        user_id=user_id,
+        items=order_items,
+        total_amount=total_amount,
+        discount_applied=discount_applied,
+        final_amount=final_amount,
+        status="Pending"
+    )
+    try:
+        # coupon redemption, stock commit, cart clear, order insert and outbox
+        # event in one transaction
+        place_order(order, cart, reservation, coupon=coupon, idempotency_key=idempotency_key)
+    except DuplicateRequest as e:
+        return _order_placed(e.order)
+    except CheckoutError as e:
+        return {"message": str(e)}, 409
+    except MongoValidationError as e:
+        return {
+            "message": "Order validation error",
+            "details": str(e)
+        }, 400
+
+    # Nudge the outbox dispatcher; if the broker is unavailable the event stays
+    # pending and the periodic dispatch picks it up
+    try:
+        dispatch_outbox.delay()
+    except Exception as e:
+        current_app.logger.warning("Could not trigger outbox dispatch: %s", e)
+
+    return _order_placed(order)
+
+def _order_placed(order):
+    return {
+        "message": "Order placed successfully",
+        "order": order.to_json()
+    }, 201
+
+
+# Checkout pipeline
+# -----------------
+# The idempotency key, the coupon redemption, committing the stock
+# reservation, clearing the cart, the order insert and the outbox event all
+# run in one Mongo transaction:
+# either all of them happen or none does. The cart is only cleared if it
+# still holds the lines being ordered; otherwise the checkout fails rather
+# than drop a line added meanwhile. Notifications are never queued
+# from here directly; the outbox dispatcher picks the event up.
+def place_order(order, cart, reservation, coupon=None, idempotency_key=None):
+    order.id = ObjectId()
+    try:
+        order.validate()
+    except Exception:
+        inventory.release(reservation)
+        raise
+    order_doc = order.to_mongo()
+    event = OutboxEvent(topic="order_created", payload={"order_id": str(order.pk)})
+    redeemed, cleared = [], []
+
+    def run(session):
+        redeemed.clear()
+        cleared.clear()
+        if idempotency_key:
+            IdempotencyKey._get_collection().insert_one(IdempotencyKey(
+                user_id=order.user_id, key=idempotency_key, order_id=str(order.pk)
+            ).to_mongo(), session=session)
+
+        if coupon is not None:
+            _confirm_coupon(coupon, session)
+        # one conditional $inc on the coupon's counter document
+        if coupon is not None and coupon.has_usage_limits:
+            if not CouponRedemption.redeem(coupon, order.user_id, session=session):
+                raise CheckoutError("Coupon usage limit reached")
+            redeemed.append(coupon)
+
+        if not inventory.commit(reservation, session=session):
+            raise CheckoutError("Stock reservation expired, please retry")
+        result = Cart._get_collection().update_one(Cart.unchanged_filter(cart), {"$set": {"items": []}}, session=session)
+        if not result.matched_count:
+            raise CheckoutError("Your cart changed during checkout, please retry")
+        cleared.append(cart)
+        Order._get_collection().insert_one(order_doc, session=session)
+        OutboxEvent._get_collection().insert_one(event.to_mongo(), session=session)
+
+    use_transactions = _use_transactions()
+    try:
+        if use_transactions:
+            with get_connection().start_session() as session:
+                session.with_transaction(run)
+        else:
+            run(None)
+    except Exception as e:
+        if use_transactions:
+            # nothing was written; the reservation is still held
+            inventory.release(reservation)
+        else:
+            _undo(order, reservation, idempotency_key, redeemed, cleared)
+
+        if isinstance(e, DuplicateKeyError) and idempotency_key:
+            original = find_idempotent_order(order.user_id, idempotency_key)
+            if original is not None:
+                raise DuplicateRequest(original)
+            raise OrderInProgress() from e
+        raise
+
+    return order
+
+
+def _confirm_coupon(coupon, session):
+    # the order was priced with the table's copy; fail if the primary's differs
+    doc = Coupon._get_collection().find_one({"code": coupon.code}, session=session)
+    if doc is None or Coupon._from_son(doc).to_json() != coupon.to_json():
+        raise CheckoutError("Coupon was changed or removed, please retry")
+
+
+def _use_transactions():
+    # MONGO_USE_TRANSACTIONS = None: ask the server once per worker, on the
+    # first checkout (so the app still boots while MongoDB is down)
+    config = current_app.config
+    if config.get("MONGO_USE_TRANSACTIONS") is None:
+        config["MONGO_USE_TRANSACTIONS"] = db.supports_transactions()
+        current_app.logger.info("MongoDB transactions %s", "on" if config["MONGO_USE_TRANSACTIONS"] else "off")
+    return config["MONGO_USE_TRANSACTIONS"]
+
+
+def _undo(order, reservation, idempotency_key, redeemed, cleared):
+    # best effort for deployments without transactions (standalone mongod)
+    if Order.objects(id=order.pk).only('id').first():
+        return  # the order made it, only a later step failed
+    for cart in cleared:
+        Cart._get_collection().update_one(
+            {"_id": cart.pk}, {"$push": {"items": {"$each": [item.to_mongo() for item in cart.items]}}}
+        )
+    for coupon in redeemed:
+        CouponRedemption.refund(coupon, order.user_id)
+    if idempotency_key:
+        IdempotencyKey.objects(user_id=order.user_id, key=idempotency_key, order_id=str(order.pk)).delete()
+    if not inventory.release(reservation):
+        inventory.restock(reservation)
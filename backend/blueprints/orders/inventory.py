@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import pytz
+from bson import ObjectId
+from flask import current_app
+from pymongo import UpdateOne
+from backend.blueprints.products.models import Product
+from .models import StockReservation, ReservationLine
+
+DEFAULT_RESERVATION_TTL = 15 * 60  # seconds
+
+
+class OutOfStock(Exception):
+    def __init__(self, skus):
+        super().__init__(f"Insufficient stock for: {', '.join(skus)}")
+        self.skus = skus
+
+
+# Stock reservations keyed by SKU
+# -------------------------------
+# reserve() decrements every line with one unordered bulk write of conditional
+# updates (`stock >= qty`), tagging each variant with a hold for the
+# reservation. If any line fails, the lines that succeeded are put back.
+# Status changes (held -> committed / released) are conditional updates on the
+# reservation, so an expiring reservation and a finishing checkout can never
+# both win.
+def reserve(user_id, lines, ttl=None):
+    if ttl is None:
+        ttl = current_app.config.get("STOCK_RESERVATION_TTL", DEFAULT_RESERVATION_TTL)
+
+    # the reservation is recorded first so release_expired() can always undo it
+    reservation = StockReservation(
+        user_id=user_id,
+        lines=_merge_lines(lines),
+        expires_at=datetime.now(pytz.utc) + timedelta(seconds=ttl)
+    ).save()
+    reservation_id = str(reservation.pk)
+
+    requests = [
+        UpdateOne(
+            {"_id": ObjectId(line.product_id),
+             "variants": {"$elemMatch": {"sku": line.sku, "stock": {"$gte": line.quantity}}}},
+            {"$inc": {"variants.$.stock": -line.quantity},
+             "$push": {"variants.$.holds": {"reservation_id": reservation_id, "quantity": line.quantity}}}
+        )
+        for line in reservation.lines
+    ]
+    result = Product._get_collection().bulk_write(requests, ordered=False)
+
+    if result.modified_count != len(requests):
+        failed = _unheld_skus(reservation)
+        release(reservation)
+        raise OutOfStock(failed)
+    return reservation
+
+
+def commit(reservation, session=None):
+    # held -> committed: the stock stays decremented, the holds are dropped
+    if not _transition(reservation, "held", "committed", session):
+        return False
+    reservation_id = str(reservation.pk)
+    _bulk_update(reservation, lambda line: _hold_filter(line, reservation_id), lambda line: {
+        "$pull": {"variants.$.holds": {"reservation_id": reservation_id}}
+    }, session)
+    return True
+
+
+def release(reservation):
+    # held -> released: stock goes back only on variants that still carry
+    # this reservation's hold
+    if not _transition(reservation, "held", "released"):
+        return False
+    reservation_id = str(reservation.pk)
+    _bulk_update(reservation, lambda line: _hold_filter(line, reservation_id), lambda line: {
+        "$inc": {"variants.$.stock": line.quantity},
+        "$pull": {"variants.$.holds": {"reservation_id": reservation_id}}
+    })
+    return True
+
+
+def restock(reservation):
+    # undo a committed reservation whose order could not be written
+    # (its holds are gone already, so match on the SKU alone)
+    if not _transition(reservation, "committed", "released"):
+        return False
+    _bulk_update(reservation, lambda line: {"variants.sku": line.sku}, lambda line: {
+        "$inc": {"variants.$.stock": line.quantity}
+    })
+    return True
+
+
+def release_expired(now=None, limit=1000):
+    now = now or datetime.now(pytz.utc)
+    released = 0
+    for reservation in StockReservation.objects(status="held", expires_at__lt=now).limit(limit):
+        if release(reservation):
+            released += 1
+    return released
+
+
+def _merge_lines(lines):
+    merged = OrderedDict()
+    for product_id, sku, quantity in lines:
+        merged[(product_id, sku)] = merged.get((product_id, sku), 0) + quantity
+    return [
+        ReservationLine(product_id=product_id, sku=sku, quantity=quantity)
+        for (product_id, sku), quantity in merged.items()
+    ]
+
+def _hold_filter(line, reservation_id):
+    return {"variants": {"$elemMatch": {"sku": line.sku, "holds.reservation_id": reservation_id}}}
+
+def _bulk_update(reservation, make_filter, make_update, session=None):
+    requests = [
+        UpdateOne({"_id": ObjectId(line.product_id), **make_filter(line)}, make_update(line))
+        for line in reservation.lines
+    ]
+    if requests:
+        Product._get_collection().bulk_write(requests, ordered=False, session=session)
+
+def _transition(reservation, from_status, to_status, session=None):
+    result = StockReservation._get_collection().update_one(
+        {"_id": reservation.pk, "status": from_status},
+        {"$set": {"status": to_status, "finished_at": datetime.now(pytz.utc)}},
+        session=session
+    )
+    if result.modified_count:
+        reservation.status = to_status
+    return bool(result.modified_count)
+
+def _unheld_skus(reservation):
+    reservation_id = str(reservation.pk)
+    held = set()
+    products = Product._get_collection().find(
+        {"_id": {"$in": [ObjectId(line.product_id) for line in reservation.lines]},
+         "variants.holds.reservation_id": reservation_id},
+        {"variants.sku": 1, "variants.holds": 1}
+    )
+    for product in products:
+        for variant in product.get("variants", []):
+            if any(hold.get("reservation_id") == reservation_id for hold in variant.get("holds", [])):
+                held.add((str(product["_id"]), variant["sku"]))
+    return [line.sku for line in reservation.lines if (line.product_id, line.sku) not in held]
+
+
+def cart_lines(cart_items):
+    # (product_id, sku, quantity) per cart item; lines added before cart
+    # items carried a SKU fall back to the product's first variant, the one
+    # add_to_cart used to price them from
+    legacy_ids = list({item.product_id for item in cart_items if not item.sku})
+    skus = {
+        str(product.pk): product.variants[0].sku
+        for product in Product.objects(id__in=legacy_ids).only('variants.sku')
+        if product.variants
+    } if legacy_ids else {}
+    missing = [pid for pid in legacy_ids if pid not in skus]
+    if missing:
+        raise OutOfStock(missing)
+    return [(item.product_id, item.sku or skus[item.product_id], item.quantity) for item in cart_items]
\ No newline at end of file
@@ -1,20 +1,27 @@
 from mongoengine import (
     Document, EmbeddedDocument,
     EmbeddedDocumentListField, StringField, IntField,
-    DecimalField, DateTimeField
+    DecimalField, DateTimeField, DictField
 )
 
 from datetime import datetime
 import pytz
 
+# how long finished stock reservations and dispatched outbox events are kept
+# (for debugging) before MongoDB's TTL monitor deletes them
+RESERVATION_RETENTION = 60 * 60 * 24 * 7
+OUTBOX_RETENTION = 60 * 60 * 24 * 7
+
 class OrderItem(EmbeddedDocument):
     product_id = StringField(required=True)
+    sku = StringField()
     quantity = IntField(required=True, default=1)
     price = DecimalField(required=True, precision=2)
     
     def to_json(self):
         return {
             'product_id': self.product_id,
+            'sku': self.sku,
             'quantity': self.quantity,
             'price': float(self.price)
         }
@@ -26,7 +33,20 @@ class Order(Document):
     discount_applied = DecimalField(required=True, default=0, precision=2)
     final_amount = DecimalField(required=True, precision=2)
     status = StringField(required=True, choices=["Pending","Shipped","Delivered"], default="Pending")
-    created_at = DateTimeField(default=datetime.now(pytz.utc))
+    # a callable, so every order gets its own insert time
+    created_at = DateTimeField(default=lambda: datetime.now(pytz.utc))
+
+    # order history is listed per user, newest first (optionally by status);
+    # created_at alone serves time-range queries and archival
+    meta = {
+        'indexes': [
+            ('user_id', '-created_at', '-id'),
+            ('user_id', 'status', '-created_at', '-id'),
+            'created_at'
+        ]
+    }
+
+    SUMMARY_FIELDS = ('id', 'status', 'total_amount', 'discount_applied', 'final_amount', 'created_at')
 
     def to_json(self):
         return {
@@ -38,4 +58,58 @@ class Order(Document):
             "final_amount": float(self.final_amount),
             "status": self.status,
             "created_at": self.created_at.isoformat()
-        }        
\ No newline at end of file
+        }
+
+class ReservationLine(EmbeddedDocument):
+    product_id = StringField(required=True)
+    sku = StringField(required=True)
+    quantity = IntField(required=True, min_value=1)
+
+class StockReservation(Document):
+    # Stock held for one checkout. "held" stock is already decremented on the
+    # variant; it is either committed by the order or released (on failure or
+    # once expires_at passes for an abandoned checkout).
+    user_id = StringField(required=True)
+    lines = EmbeddedDocumentListField(ReservationLine)
+    status = StringField(required=True, choices=["held", "committed", "released"], default="held")
+    expires_at = DateTimeField(required=True)
+    created_at = DateTimeField(default=lambda: datetime.now(pytz.utc))
+    # set when it leaves "held"; MongoDB deletes it RESERVATION_RETENTION later
+    finished_at = DateTimeField()
+
+    meta = {'indexes': [
+        ('status', 'expires_at'),
+        {'fields': ['finished_at'], 'expireAfterSeconds': RESERVATION_RETENTION}
+    ]}
+
+
+class OutboxEvent(Document):
+    # Written in the same transaction as the order; the outbox dispatcher
+    # turns pending events into Celery tasks (at least once)
+    topic = StringField(required=True)
+    payload = DictField()
+    status = StringField(required=True, choices=["pending", "dispatching", "dispatched"], default="pending")
+    created_at = DateTimeField(default=lambda: datetime.now(pytz.utc))
+    claimed_at = DateTimeField()
+    # set once dispatched; MongoDB deletes it OUTBOX_RETENTION later
+    dispatched_at = DateTimeField()
+
+    meta = {'indexes': [
+        ('status', 'created_at'),
+        {'fields': ['dispatched_at'], 'expireAfterSeconds': OUTBOX_RETENTION}
+    ]}
+
+class IdempotencyKey(Document):
+    # Maps a client's Idempotency-Key to the order it created, so a retried
+    # POST returns that order instead of placing a new one
+    user_id = StringField(required=True)
+    key = StringField(required=True, max_length=255)
+    order_id = StringField(required=True)
+    created_at = DateTimeField(default=lambda: datetime.now(pytz.utc))
+
+    meta = {
+        'indexes': [
+            {'fields': ['user_id', 'key'], 'unique': True},
+            {'fields': ['created_at'], 'expireAfterSeconds': 60 * 60 * 24}
+        ]
+    }
@@ -0,0 +1,75 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+import pytz
+from bson import ObjectId
+from flask import current_app
+from backend.tasks.notifications import send_order_notifications
+from .models import OutboxEvent
+
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def _send_order_notifications(payloads):
+    send_order_notifications.delay([payload["order_id"] for payload in payloads])
+
+# topic -> handler that turns a batch of event payloads into Celery work
+HANDLERS = {
+    "order_created": _send_order_notifications,
+}
+
+
+# Outbox dispatcher
+# -----------------
+# Claims pending events in batches (plus events whose claim went stale because
+# a dispatcher died mid-way) and hands each topic's payloads to its handler as
+# one batch. A partial batch is held back until its oldest event is older than
+# the batch window, so bursts coalesce into few tasks. Delivery is at least once.
+# One call dispatches at most OUTBOX_DISPATCH_LIMIT events.
+def dispatch(limit=None, batch_size=None, window=None):
+    config = current_app.config
+    limit = limit or config.get("OUTBOX_DISPATCH_LIMIT", 1000)
+    batch_size = batch_size or config.get("NOTIFICATION_BATCH_SIZE", 50)
+    if window is None:
+        window = timedelta(seconds=config.get("NOTIFICATION_BATCH_WINDOW", 1.0))
+
+    dispatched = 0
+    while dispatched < limit:
+        events = _claim_batch(min(batch_size, limit - dispatched), window)
+        if not events:
+            break
+
+        by_topic = defaultdict(list)
+        for event in events:
+            by_topic[event["topic"]].append(event.get("payload", {}))
+        for topic, payloads in by_topic.items():
+            HANDLERS[topic](payloads)
+
+        OutboxEvent._get_collection().update_many(
+            {"_id": {"$in": [event["_id"] for event in events]}},
+            {"$set": {"status": "dispatched", "dispatched_at": datetime.now(pytz.utc)}}
+        )
+        dispatched += len(events)
+    return dispatched
+
+
+def _claim_batch(batch_size, window):
+    now = datetime.now(pytz.utc)
+    claimable = {"$or": [
+        {"status": "pending"},
+        {"status": "dispatching", "claimed_at": {"$lt": now - CLAIM_TIMEOUT}}
+    ]}
+    collection = OutboxEvent._get_collection()
+    candidates = list(collection.find(claimable, {"created_at": 1}).sort("created_at", 1).limit(batch_size))
+    if not candidates:
+        return []
+    oldest = candidates[0]["created_at"].replace(tzinfo=pytz.utc)
+    if len(candidates) < batch_size and oldest > now - window:
+        return []  # wait for the batch to fill or the window to pass
+
+    # the claim id tells our claims apart from a concurrent dispatcher's
+    claim_id = ObjectId()
+    collection.update_many(
+        {"_id": {"$in": [c["_id"] for c in candidates]}, **claimable},
+        {"$set": {"status": "dispatching", "claimed_at": now, "claim_id": claim_id}}
+    )
+    return list(collection.find({"claim_id": claim_id, "status": "dispatching"}))
@@ -1,14 +1,17 @@
+import click
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from mongoengine.errors import ValidationError as MongoValidationError
+from mongoengine import Q
+from bson import ObjectId
+from bson.errors import InvalidId
 from backend.app import limiter
-from decimal import Decimal
-from datetime import datetime
+from backend.pagination import encode_cursor, decode_cursor, InvalidCursor
+from backend.serialization import order_summary_json
+from backend.validation import parse_time
+from datetime import datetime, timedelta
 import pytz
-from .models import Order, OrderItem
-from backend.blueprints.coupons.models import Coupon
-from backend.blueprints.cart.models import Cart
-from backend.tasks.notifications import send_order_notification
+from .models import Order
+from . import inventory, checkout, outbox, archive
 
 orders_bp = Blueprint('orders', __name__)
 
@@ -23,85 +26,144 @@ def create_order():
 
     data = request.get_json() # payload will be empty but we still accept coupon
     coupon_code = data.get("coupon_code")
+    # a retried POST with the same Idempotency-Key returns the original order
+    idempotency_key = request.headers.get("Idempotency-Key")
 
-    # fetch cart items from the Cart
-    cart = Cart.objects(user_id=user_id).first()
-    if not cart or not cart.items:
-        return jsonify({"message": "Cart is empty"}), 400
-
-    order_items = []
-    total_amount = Decimal("0.00")
-
-    for item in cart.items:
-        quantity = item.quantity
-        price = item.price
-        total_amount += price * quantity
-        order_items.append(OrderItem(
-            product_id=item.product_id,
-            quantity=quantity,
-            price=price
-        ))
-    
-    discount_applied = Decimal("0.00")
-    if coupon_code:
-        coupon = Coupon.objects(code=coupon_code).first()
-        # print(f"coupon.expiry: {coupon.expiry}, tzinfo: {coupon.expiry.tzinfo}, type: {type(coupon.expiry)}")
-        # print(f"now: {datetime.now(pytz.utc)}, tzinfo: {datetime.now(pytz.utc).tzinfo}, type: {type(datetime.now(pytz.utc))}")
-        if not coupon:
-            return jsonify({"message": "Invalid coupon code"}), 400
-        
-        # Convert coupon expiry to UTC explicitly
-        coupon_expiry_utc = coupon.expiry.replace(tzinfo=pytz.utc) if coupon.expiry.tzinfo is None else coupon.expiry
-        
-        # Check coupon eligibility based on user's role
-        if coupon.eligible_roles and user_role not in coupon.eligible_roles:
-            return jsonify({"message": "You are not eligible to use this coupon"}), 400
-        
-        if coupon_expiry_utc < datetime.now(pytz.utc):
-            return jsonify({"message": "Coupon expired"}), 400
-  
-        discount_applied = (total_amount * Decimal(coupon.discount_percent)) / Decimal(100)
-
-    final_amount = total_amount - discount_applied
+    body, status = checkout.checkout_cart(user_id, user_role, coupon_code, idempotency_key)
+    return jsonify(body), status
 
+# Order History for the current user (newest first)
+# keyset pagination on (created_at, _id): ?per_page=&status= for the first
+# page (optionally ?since=<ISO 8601 time>), then ?cursor=<next_cursor>;
+# only summary fields are loaded
+@orders_bp.get('/mine')
+@limiter.limit("5 per minute")
+@jwt_required()
+def list_my_orders():
+    user_id = get_jwt_identity()
+    per_page = min(max(request.args.get('per_page', default=10, type=int), 1), 100)
+    status = request.args.get('status')
+    cursor = request.args.get('cursor')
+
+    if status and status not in Order.status.choices:
+        return jsonify({"message": f"status must be one of {', '.join(Order.status.choices)}"}), 400
     try:
-        order = Order(
-            user_id=user_id,
-            items=order_items,
-            total_amount=total_amount,
-            discount_applied=discount_applied,
-            final_amount=final_amount,
-            status="Pending"
-        )
-        order.save()
-
-        # Clearing the Cart after order creation
-        cart.items = []
-        cart.save()
-
-        # Queue the background task for order notification
-        send_order_notification.delay(str(order.pk))
-
-        return jsonify({
-            "message": "Order placed successfully",
-            "order": order.to_json()
-        }), 201
-    except MongoValidationError as e:
-        return jsonify({
-            "message": "Order validation error",
-            "details": str(e)
-        }), 400
+        since = parse_time(request.args.get('since'))
+    except ValueError as e:
+        return jsonify({"message": "Invalid since", "details": str(e)}), 400
+
+    query = Q(user_id=user_id)
+    if status:
+        query &= Q(status=status)
+    if since:
+        query &= Q(created_at__gte=since)
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor, 2)
+            created_at, last_id = datetime.fromisoformat(created_at), ObjectId(last_id)
+        except (InvalidCursor, InvalidId, ValueError) as e:
+            return jsonify({"message": "Invalid cursor", "details": str(e)}), 400
+        query &= Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id)
+
+    orders = list(
+        Order.objects(query)
+        .only(*Order.SUMMARY_FIELDS)
+        .order_by('-created_at', '-id')
+        .limit(per_page + 1)
+        .as_pymongo()
+    )
+    has_more = len(orders) > per_page
+    orders = orders[:per_page]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(orders[-1]["created_at"].isoformat(), orders[-1]["_id"])
+
+    return jsonify({
+        "per_page": per_page,
+        "status": status,
+        "next_cursor": next_cursor,
+        "orders": [order_summary_json(order) for order in orders]
+    }), 200
+
+# Orders per day (Admin only)
+# ?since=&until= (ISO 8601, default: the last 30 days)
+@orders_bp.get('/daily')
+@limiter.limit("5 per minute")
+@jwt_required()
+def daily_order_stats():
+    claims = get_jwt()
+    if claims.get('role') != 'admin':
+        return jsonify({"message": "Only admins can view order stats"}), 403
+
+    try:
+        until = parse_time(request.args.get('until')) or datetime.now(pytz.utc)
+        since = parse_time(request.args.get('since')) or until - timedelta(days=30)
+    except ValueError as e:
+        return jsonify({"message": "Invalid time range", "details": str(e)}), 400
+
+    buckets = Order._get_collection().aggregate([
+        {"$match": {"created_at": {"$gte": since, "$lt": until}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            "orders": {"$sum": 1},
+            "revenue": {"$sum": "$final_amount"}
+        }},
+        {"$sort": {"_id": 1}}
+    ])
+    return jsonify({
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "days": [
+            {"date": b["_id"], "orders": b["orders"], "revenue": round(b["revenue"], 2)}
+            for b in buckets
+        ]
+    }), 200
 
 # Track Order Status
+# (orders moved to the archive collection are still found)
 @orders_bp.get('/<order_id>')
 @limiter.limit("5 per minute")
 @jwt_required()
 def track_order(order_id):
     try:
         order = Order.objects.get(id=order_id)
-        return jsonify({
-            "order": order.to_json()
-        }), 200
     except Order.DoesNotExist:
+        order = archive.find_archived(order_id)
+    if not order:
         return jsonify({"message": "Order not found"}), 404
+    return jsonify({
+        "order": order.to_json()
+    }), 200
+
+
+
+# RELEASE EXPIRED STOCK RESERVATIONS
+# (CLI: `flask orders release-expired-reservations`; also a Celery task)
+# ----------------------------------------------------------------------
+@orders_bp.cli.command('release-expired-reservations')
+def release_expired_reservations():
+    released = inventory.release_expired()
+    click.echo(f"Released {released} expired stock reservations")
+
+
+# DISPATCH OUTBOX EVENTS
+# (CLI: `flask orders dispatch-outbox`; also the dispatch_outbox Celery task)
+# ---------------------------------------------------------------------------
+@orders_bp.cli.command('dispatch-outbox')
+@click.option('--limit', type=int, help="Events to dispatch (default: OUTBOX_DISPATCH_LIMIT)")
+def dispatch_outbox_events(limit):
+    # flush everything, including batches still inside their window
+    dispatched = outbox.dispatch(limit=limit, window=timedelta(0))
+    click.echo(f"Dispatched {dispatched} outbox events")
+
 
+# ARCHIVE OLD ORDERS
+# (CLI: `flask orders archive --days 365`)
+# ----------------------------------------
+@orders_bp.cli.command('archive')
+@click.option('--days', type=int, required=True, help="Archive orders older than this many days")
+@click.option('--batch-size', type=int, default=1000)
+def archive_old_orders(days, batch_size):
+    moved = archive.archive_orders(days, batch_size=batch_size)
+    click.echo(f"Archived {moved} orders older than {days} days")
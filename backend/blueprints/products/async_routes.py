@@ -0,0 +1,161 @@
+from quart import Blueprint, request, jsonify
+from bson import ObjectId
+from bson.errors import InvalidId
+from backend.async_app import mongo, limiter, run_sync
+from backend.pagination import encode_cursor, decode_id_cursor, InvalidCursor
+from backend.serialization import product_json
+from .models import Product
+from .autocomplete import product_names
+from .routes import MAX_PER_PAGE, MAX_SEARCH_PER_PAGE, MAX_AUTOCOMPLETE_RESULTS, MAX_SKUS_PER_LOOKUP
+
+# Read endpoints of products_bp as coroutines on Motor (see backend/async_app.py).
+# Same parameters and response shapes; pages are read from MongoDB directly
+# rather than through the sync app's Redis page cache.
+products_async_bp = Blueprint('products_async', __name__)
+
+
+@products_async_bp.before_app_serving
+async def load_product_names():
+    # build the autocomplete index before the first request rather than in it
+    await run_sync(product_names.load)
+
+
+def _products():
+    return mongo.collection(Product)
+
+async def _products_total(category=None):
+    if category:
+        return await _products().count_documents({"category": category})
+    return await _products().estimated_document_count()
+
+
+# FETCHING ALL PRODUCTS (offset or cursor mode)
+#-----------------------------------------------
+@products_async_bp.get('/all_products')
+@limiter.limit("5 per minute")
+async def get_all_products():
+    page = max(request.args.get('page', default=1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', default=5, type=int), 1), MAX_PER_PAGE)
+    cursor = request.args.get('cursor')
+    category = request.args.get('category')
+
+    if cursor is not None or request.args.get('mode') == 'cursor':
+        try:
+            last_id = decode_id_cursor(cursor, category)
+        except (InvalidCursor, InvalidId) as e:
+            return jsonify({"message": "Invalid cursor", "details": str(e)}), 400
+        return jsonify(await _products_page_by_cursor(last_id, category, per_page)), 200
+
+    skip = (page - 1) * per_page
+    products = await _products().find().skip(skip).limit(per_page).to_list(per_page)
+    total = await _products_total()
+    return jsonify({
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "total_pages": (total + per_page - 1)//per_page,
+        "products": [product_json(p) for p in products]
+    }), 200
+
+async def _products_page_by_cursor(last_id, category, per_page):
+    query = {}
+    if last_id:
+        query['_id'] = {'$gt': last_id}
+    if category:
+        query['category'] = category
+
+    # fetching one extra row tells us whether there is a next page
+    products = await _products().find(query).sort('_id', 1).limit(per_page + 1).to_list(per_page + 1)
+    has_more = len(products) > per_page
+    products = products[:per_page]
+
+    next_cursor = None
+    if has_more:
+        last_id = products[-1]["_id"]
+        next_cursor = encode_cursor(category, last_id) if category else encode_cursor(last_id)
+
+    return {
+        "per_page": per_page,
+        "category": category,
+        "total": await _products_total(category),
+        "next_cursor": next_cursor,
+        "products": [product_json(p) for p in products]
+    }
+
+
+# SEARCH PRODUCTS (text index)
+#-----------------------------------------------
+@products_async_bp.get('/search')
+@limiter.limit("20 per minute")
+async def search_products():
+    q = request.args.get('q', '').strip()
+    category = request.args.get('category')
+    page = max(request.args.get('page', default=1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', default=10, type=int), 1), MAX_SEARCH_PER_PAGE)
+    if not q:
+        return jsonify({"message": "Query parameter 'q' is required"}), 400
+
+    query = {"$text": {"$search": q}}
+    if category:
+        query["category"] = category
+    score = {"$meta": "textScore"}
+    products = await (
+        _products().find(query, {"_text_score": score}).sort([("_text_score", score)])
+        .skip((page - 1) * per_page).limit(per_page + 1).to_list(per_page + 1)
+    )
+    return jsonify({
+        "q": q,
+        "category": category,
+        "page": page,
+        "per_page": per_page,
+        "has_more": len(products) > per_page,
+        "products": [product_json(p) for p in products[:per_page]]
+    }), 200
+
+
+# AUTOCOMPLETE PRODUCT NAMES (in-memory; on a thread, as a periodic or
+# pub/sub-triggered rebuild reads the whole catalog)
+#-----------------------------------------------
+@products_async_bp.get('/autocomplete')
+@limiter.limit("60 per minute")
+async def autocomplete_products():
+    q = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', default=10, type=int), 1), MAX_AUTOCOMPLETE_RESULTS)
+    if not q:
+        return jsonify({"suggestions": []}), 200
+    return jsonify({"suggestions": await run_sync(product_names.complete, q, limit)}), 200
+
+
+# VARIANTS BY SKU
+#-----------------------------------------------
+@products_async_bp.get('/by_sku')
+@limiter.limit("20 per minute")
+async def get_variants_by_sku():
+    skus = list(dict.fromkeys(
+        sku.strip() for value in request.args.getlist('sku') for sku in value.split(',') if sku.strip()
+    ))
+    if not skus:
+        return jsonify({"message": "At least one sku is required"}), 400
+    if len(skus) > MAX_SKUS_PER_LOOKUP:
+        return jsonify({"message": f"At most {MAX_SKUS_PER_LOOKUP} SKUs per lookup"}), 400
+
+    rows = _products().aggregate(Product.variants_by_sku_pipeline(skus))
+    variants = dict([Product.variant_row(doc) async for doc in rows])
+    return jsonify({
+        "variants": variants,
+        "missing": [sku for sku in skus if sku not in variants]
+    }), 200
+
+
+# READ PRODUCT
+#-----------------------------------------------
+@products_async_bp.get('/<product_id>')
+@limiter.limit("10 per minute")
+async def read_product(product_id):
+    try:
+        product = await _products().find_one({"_id": ObjectId(product_id)})
+    except InvalidId:
+        product = None
+    if product is None:
+        return jsonify({"message": "Product not found"}), 404
+    return jsonify(product_json(product)), 200
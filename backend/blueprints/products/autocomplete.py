@@ -0,0 +1,127 @@
+import bisect
+import threading
+import time
+from backend.db import catalog_collection
+from backend.pubsub import channel_for_app
+from .models import Product
+
+PRODUCTS_TOPIC = "products"
+
+
+def _key(name, product_id):
+    # case-insensitive order; the id keeps entries with equal names apart
+    return f"{name.casefold()}\x00{product_id}"
+
+
+# Prefix autocomplete over product names
+# --------------------------------------
+# Each worker keeps every product name in a sorted array, so a prefix lookup
+# is one binary search plus a short scan. Product writes update the array in
+# place (add/remove one entry) and are fanned out to the other workers over
+# the pub/sub channel; a periodic full rebuild is the safety net for a missed
+# message.
+class ProductNameIndex:
+    def __init__(self):
+        self.refresh_interval = 3600
+        self.channel = None
+        self._keys = []
+        self._entries = {}  # key -> (product id, name)
+        self._key_by_id = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, channel=None):
+        app.config.setdefault("AUTOCOMPLETE_REFRESH", self.refresh_interval)
+        self.refresh_interval = app.config["AUTOCOMPLETE_REFRESH"]
+        self.channel = channel or channel_for_app(app)
+        self.channel.subscribe(PRODUCTS_TOPIC, self._apply)
+        app.extensions["product_names"] = self
+
+    def _build(self):
+        entries, key_by_id = {}, {}
+        for doc in catalog_collection(Product).find({}, {"name": 1}):
+            product_id, name = str(doc["_id"]), doc.get("name") or ""
+            key = _key(name, product_id)
+            entries[key] = (product_id, name)
+            key_by_id[product_id] = key
+        # build outside the lock, swap in under it
+        keys = sorted(entries)
+        with self._lock:
+            self._keys, self._entries, self._key_by_id = keys, entries, key_by_id
+            self._loaded_at = time.time()
+
+    def load(self):
+        # at startup, so the first lookup doesn't scan the catalog
+        self._build()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.time() - self._loaded_at > self.refresh_interval:
+            self._build()
+
+    def _upsert(self, product_id, name):
+        with self._lock:
+            if self._loaded_at is None:
+                return  # the first lookup builds from the database anyway
+            self._discard(product_id)
+            key = _key(name, product_id)
+            bisect.insort(self._keys, key)
+            self._entries[key] = (product_id, name)
+            self._key_by_id[product_id] = key
+
+    def _remove(self, product_id):
+        with self._lock:
+            self._discard(product_id)
+
+    def _discard(self, product_id):
+        key = self._key_by_id.pop(product_id, None)
+        if key is None:
+            return
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+        self._entries.pop(key, None)
+
+    def _apply(self, message):
+        if message.get("event") == "upsert":
+            self._upsert(message["id"], message["name"])
+        elif message.get("event") == "delete":
+            self._remove(message["id"])
+        elif message.get("event") == "reload":
+            with self._lock:
+                self._loaded_at = None  # rebuilt on the next lookup
+
+    def complete(self, prefix, limit=10):
+        self._ensure_loaded()
+        prefix = prefix.casefold()
+        results = []
+        with self._lock:
+            i = bisect.bisect_left(self._keys, prefix)
+            while i < len(self._keys) and len(results) < limit:
+                key = self._keys[i]
+                if not key.startswith(prefix):
+                    break
+                product_id, name = self._entries[key]
+                results.append({"id": product_id, "name": name})
+                i += 1
+        return results
+
+    # called by the product routes after a write; applied here first so this
+    # worker sees its own write, then published to the others
+    def product_saved(self, product):
+        message = {"event": "upsert", "id": str(product.pk), "name": product.name}
+        self._publish(message)
+
+    def product_deleted(self, product_id):
+        self._publish({"event": "delete", "id": str(product_id)})
+
+    def products_imported(self):
+        # one rebuild instead of a message per imported product
+        self._publish({"event": "reload"})
+
+    def _publish(self, message):
+        self._apply(message)
+        if self.channel is not None:
+            self.channel.publish(PRODUCTS_TOPIC, message)
+
+
+product_names = ProductNameIndex()
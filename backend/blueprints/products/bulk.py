@@ -0,0 +1,178 @@
+import codecs
+import csv
+import io
+import json
+from marshmallow import EXCLUDE, ValidationError
+from mongoengine.errors import ValidationError as MongoValidationError
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from backend.db import catalog_collection
+from backend.schemas.product_schema import ProductSchema
+from backend.serialization import product_json
+from .models import Product
+
+# Bulk import / export
+# --------------------
+# Two formats, read and written as streams (never the whole file in memory):
+#   ndjson  one product per line, as create_product takes it
+#   csv     one row per variant: id, name, category, description, images
+#           ("|"-separated), sku, price, stock; consecutive rows with the
+#           same id are variants of one product (rows without an id: the
+#           same name and category)
+# An exported "id" only groups rows on import (products get new ids).
+CSV_COLUMNS = ("id", "name", "category", "description", "images", "sku", "price", "stock")
+MAX_REPORTED_ERRORS = 1000
+DUPLICATE_KEY = 11000
+
+product_schema = ProductSchema()
+
+
+# READING
+# Records are yielded as (line number, record, error); a line that cannot
+# be parsed has no record, only an error.
+# -----------------------------------------------------------------------
+def ndjson_records(stream):
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+
+
+def csv_records(stream):
+    reader = csv.DictReader(codecs.iterdecode(stream, "utf-8"))
+    product, product_key, first_line = None, None, None
+    for row in reader:
+        key = _csv_product_key(row)
+        if product is None or key != product_key:
+            if product is not None:
+                yield first_line, product, None
+            product, product_key, first_line = _csv_product(row), key, reader.line_num
+        if row.get("sku"):
+            product["variants"].append({"sku": row["sku"], "price": row.get("price"), "stock": row.get("stock") or 0})
+    if product is not None:
+        yield first_line, product, None
+
+
+def _csv_product_key(row):
+    # two exported products can share a name and category; their ids differ
+    if row.get("id"):
+        return ("id", row["id"])
+    return ("name", row.get("name"), row.get("category"))
+
+
+def _csv_product(row):
+    # empty cells are missing fields, so the schema reports them
+    product = {field: row[field] for field in ("name", "category", "description") if row.get(field)}
+    product["variants"] = []
+    if row.get("images"):
+        product["images"] = row["images"].split("|")
+    return product
+
+
+# IMPORT
+# Valid products are inserted in unordered bulk writes of `batch_size`, so
+# one bad document (e.g. a SKU that is already taken) fails alone.
+# ------------------------------------------------------------------------
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.categories = set()
+
+    def error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": errors})
+
+    def to_json(self):
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors)
+        }
+
+
+def import_products(records, batch_size=1000):
+    report = ImportReport()
+    collection = Product._get_collection()
+    batch = []  # [(line number, document)]
+
+    def flush():
+        if not batch:
+            return
+        try:
+            result = collection.bulk_write([InsertOne(doc) for _, doc in batch], ordered=False)
+            report.imported += result.inserted_count
+        except BulkWriteError as e:
+            report.imported += e.details["nInserted"]
+            for write_error in e.details["writeErrors"]:
+                line = batch[write_error["index"]][0]
+                if write_error["code"] == DUPLICATE_KEY:
+                    report.error(line, "A variant SKU is already used by another product")
+                else:
+                    report.error(line, write_error["errmsg"])
+        report.categories.update(doc["category"] for _, doc in batch)
+        batch.clear()
+
+    try:
+        for line, record, problem in records:
+            if problem:
+                report.error(line, problem)
+                continue
+            try:
+                product = Product(**product_schema.load(record, unknown=EXCLUDE))
+                product.validate()
+            except ValidationError as err:
+                report.error(line, err.messages)
+                continue
+            except MongoValidationError as e:
+                report.error(line, str(e))
+                continue
+            batch.append((line, product.to_mongo()))
+            if len(batch) >= batch_size:
+                flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        # the rest of the stream cannot be read; keep what was parsed so far
+        report.error(None, f"Unreadable input: {e}")
+    flush()
+    return report
+
+
+# EXPORT
+# A server-side cursor on the catalog alias, fetching `batch_size`
+# documents per round trip, in _id order.
+# ----------------------------------------------------------------
+def export_cursor(category=None, batch_size=1000):
+    query = {"category": category} if category else {}
+    return catalog_collection(Product).find(query, batch_size=batch_size).sort("_id", 1)
+
+
+def ndjson_lines(docs):
+    for doc in docs:
+        yield json.dumps(product_json(doc)) + "\n"
+
+
+def csv_lines(docs):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield _drain(buffer)
+    for doc in docs:
+        product = product_json(doc)
+        images = "|".join(product["images"])
+        common = [product["id"], product["name"], product["category"], product["description"], images]
+        for variant in product["variants"] or [{"sku": "", "price": "", "stock": ""}]:
+            writer.writerow(common + [variant["sku"], variant["price"], variant["stock"]])
+        yield _drain(buffer)
+
+
+def _drain(buffer):
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value
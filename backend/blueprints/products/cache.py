@@ -0,0 +1,361 @@
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from flask import current_app
+from backend import db
+from backend.app import cache
+from .models import Product
+
+ONE_DAY = 60 * 60 * 24 * 1
+# how long another worker's load may hold a key before we load it ourselves
+LOAD_LOCK_TIMEOUT = 5
+
+# Product cache layer
+# -------------------
+# products:<ns>:item:<product_id>:<item_gen>
+# products:<ns>:list:<listing_gen>:<page params>
+NAMESPACE_KEY = "products:ns"
+LISTING_GEN_KEY = "products:listing_gen"
+
+def _item_gen_key(product_id):
+    return f"products:item_gen:{product_id}"
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0  # loader calls (database reads)
+        self.coalesced = 0  # misses answered by another request's load
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def add(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.loads = 0
+            self.coalesced = 0
+
+    def to_json(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "coalesced": self.coalesced,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None
+            }
+
+stats = {
+    "item": CacheStats(),
+    "listing": CacheStats()
+}
+
+
+# random tokens, so concurrent or evicted bumps never reuse a generation
+def _new_generation():
+    return uuid.uuid4().hex[:16]
+
+def _generation(key, versions):
+    value = versions.get(key)
+    if value is None:
+        cache.add(key, _new_generation(), timeout=0)
+        value = cache.get(key)
+    return value
+
+def _versions(*keys):
+    versions = dict(zip(keys, cache.get_many(*keys)))
+    return [_generation(key, versions) for key in keys]
+
+def _bump(key):
+    cache.set(key, _new_generation(), timeout=0)
+
+def product_key(product_id):
+    namespace, generation = _versions(NAMESPACE_KEY, _item_gen_key(product_id))
+    return f"products:{namespace}:item:{product_id}:{generation}"
+
+def listing_key(**params):
+    namespace, generation = _versions(NAMESPACE_KEY, LISTING_GEN_KEY)
+    query = "&".join(f"{k}={params[k]}" for k in sorted(params) if params[k] is not None)
+    return f"products:{namespace}:list:{generation}:{query}"
+
+
+# STAMPEDE PROTECTION
+# (single-flight per worker, a load lock across workers, probabilistic early
+# refresh; entries are (value, load seconds, expires at))
+# ------------------------------------------------------------------------
+_SKIPPED = object()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _single_flight(key, kind, load, wait=True):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        if not wait:
+            return _SKIPPED
+        stats[kind].add("coalesced")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    try:
+        flight.value = load()
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+    return flight.value
+
+
+def _load(key, loader, kind, ttl, wait=True):
+    lock_key = f"{key}:loading"
+    locked = cache.add(lock_key, 1, timeout=LOAD_LOCK_TIMEOUT)
+    if not locked:
+        if not wait:
+            return _SKIPPED
+        entry = _wait_for_load(key, lock_key)
+        if entry is not None:
+            stats[kind].add("coalesced")
+            return entry[0]
+
+    try:
+        started = time.perf_counter()
+        value = loader()
+        stats[kind].add("loads")
+        if value is not None:
+            cache.set(key, (value, time.perf_counter() - started, time.time() + ttl), timeout=ttl)
+        return value
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
+def _wait_for_load(key, lock_key):
+    # another worker is loading the key; None if it stored nothing (not found,
+    # failed) or took too long
+    deadline = time.time() + LOAD_LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(0.01)
+        entry = _entry(cache.get(key))
+        if entry is not None:
+            return entry
+        if cache.get(lock_key) is None:
+            return None
+    return None
+
+
+def _entry(value):
+    # anything else (e.g. written by an older version) counts as a miss
+    return value if isinstance(value, tuple) and len(value) == 3 else None
+
+
+def _expires_early(load_seconds, expires_at):
+    beta = current_app.config.get("PRODUCT_CACHE_EARLY_EXPIRY_BETA", 1.0)
+    return time.time() - load_seconds * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def _get_or_load(key, loader, kind, timeout=None):
+    ttl = timeout or current_app.config.get("PRODUCT_CACHE_TTL", ONE_DAY)
+    entry = _entry(cache.get(key))
+    if entry is not None:
+        stats[kind].record(hit=True)
+        value, load_seconds, expires_at = entry
+        if _expires_early(load_seconds, expires_at):
+            refreshed = _single_flight(key, kind, lambda: _load(key, loader, kind, ttl, wait=False), wait=False)
+            if refreshed is not _SKIPPED:
+                return refreshed
+        return value
+
+    stats[kind].record(hit=False)
+    value = _single_flight(key, kind, lambda: _load(key, loader, kind, ttl))
+    if value is _SKIPPED:
+        # joined an early refresh that left the reload to another worker
+        value = _load(key, loader, kind, ttl)
+    return value
+
+# loader returns a JSON-ready dict, or None for "not found" (never cached)
+def get_product(product_id, loader, timeout=None):
+    warmer.touch("item", product_id, loader)
+    return _get_or_load(product_key(product_id), loader, "item", timeout)
+
+def get_listing(params, loader, timeout=None):
+    if not params.get("cursor") and params.get("page", 1) == 1:
+        warmer.touch("listing", tuple(sorted(params.items())), loader)
+    return _get_or_load(listing_key(**params), loader, "listing", timeout)
+
+
+# CACHE WARMING
+# (reloads the most requested products and first pages after an invalidation)
+# ------------------------------------------------------------------------
+class CacheWarmer:
+    def __init__(self):
+        self.app = None
+        self.products = 100
+        self.listings = 20
+        self.delay = 0.5
+        self._counts = Counter()  # (kind, key) -> requests
+        self._loaders = {}
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        app.config.setdefault("PRODUCT_CACHE_WARM_PRODUCTS", self.products)
+        app.config.setdefault("PRODUCT_CACHE_WARM_LISTINGS", self.listings)
+        app.config.setdefault("PRODUCT_CACHE_WARM_DELAY", self.delay)
+        self.products = app.config["PRODUCT_CACHE_WARM_PRODUCTS"]
+        self.listings = app.config["PRODUCT_CACHE_WARM_LISTINGS"]
+        self.delay = app.config["PRODUCT_CACHE_WARM_DELAY"]
+        self.app = app
+        app.extensions["product_cache_warmer"] = self
+
+    @property
+    def enabled(self):
+        return self.app is not None and (self.products or self.listings)
+
+    def touch(self, kind, key, loader):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counts[(kind, key)] += 1
+            self._loaders[(kind, key)] = loader
+            if len(self._counts) > 10 * (self.products + self.listings):
+                self._keep(self._counts.most_common(5 * (self.products + self.listings)))
+
+    def _keep(self, counts):
+        self._counts = Counter(dict(counts))
+        self._loaders = {key: self._loaders[key] for key in self._counts}
+
+    def schedule(self):
+        if not self.enabled:
+            return
+        # threads do not survive a fork, so a worker starts its own
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="product-cache-warmer", daemon=True)
+            self._thread.start()
+        self._pending.set()
+
+    def _run(self):
+        while True:
+            self._pending.wait()
+            # let a burst of writes (e.g. an import) settle first
+            time.sleep(self.delay)
+            self._pending.clear()
+            try:
+                with self.app.app_context():
+                    self.warm()
+            except Exception:
+                self.app.logger.exception("Product cache warm-up failed")
+
+    def _hottest(self):
+        with self._lock:
+            ranked = self._counts.most_common()
+            hottest = (
+                [key for key in ranked if key[0][0] == "item"][:self.products]
+                + [key for key in ranked if key[0][0] == "listing"][:self.listings]
+            )
+            hottest = [(key, self._loaders[key]) for key, _ in hottest]
+            # halved, so recent traffic dominates
+            self._keep((key, count // 2) for key, count in ranked if count > 1)
+        return hottest
+
+    def warm(self):
+        ttl = current_app.config.get("PRODUCT_CACHE_TTL", ONE_DAY)
+        for (kind, key), loader in self._hottest():
+            cache_key = product_key(key) if kind == "item" else listing_key(**dict(key))
+            if _entry(cache.get(cache_key)) is None:
+                _single_flight(cache_key, kind, lambda: _load(cache_key, loader, kind, ttl))
+
+
+warmer = CacheWarmer()
+
+
+# READ ROUTING
+# (from the primary for CATALOG_WRITE_WINDOW seconds after a write, so a
+# lagging secondary's copy is never cached)
+# ------------
+def _written_key(product_id=None):
+    return f"products:written:{product_id}" if product_id else "products:written:listings"
+
+def _mark_written(product_id=None):
+    cache.set(_written_key(product_id), 1, timeout=current_app.config.get("CATALOG_WRITE_WINDOW", 10))
+
+def read_alias(product_id=None):
+    return db.DEFAULT if cache.get(_written_key(product_id)) else db.CATALOG
+
+
+# INVALIDATION
+# ------------
+def invalidate_listings():
+    _mark_written()
+    _bump(LISTING_GEN_KEY)
+    warmer.schedule()
+
+def invalidate_product(product_id):
+    _mark_written(product_id)
+    _bump(_item_gen_key(product_id))
+    invalidate_listings()
+
+def invalidate_all():
+    _bump(NAMESPACE_KEY)
+    warmer.schedule()
+
+
+# PRODUCT TOTALS
+# (estimated from collection metadata and cached; refreshed on product writes
+# instead of counting on every listing request)
+# --------------------------------------------------------------------------
+def _total_key(category=None):
+    return f"products:total:{category}" if category else "products:total"
+
+def get_products_total(category=None):
+    total = cache.get(_total_key(category))
+    if total is None:
+        total = refresh_products_total(category)
+    return total
+
+def refresh_products_total(category=None):
+    if category:
+        total = Product.objects(category=category).count()
+    else:
+        total = Product._get_collection().estimated_document_count()
+    cache.set(_total_key(category), total, timeout=ONE_DAY)
+    return total
+
+def invalidate_products_total(*categories):
+    refresh_products_total()
+    for category in categories:
+        if category:
+            cache.delete(_total_key(category))
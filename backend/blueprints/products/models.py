@@ -1,9 +1,17 @@
 from mongoengine import Document, StringField, IntField, ListField,DecimalField, EmbeddedDocument, EmbeddedDocumentListField
+from bson import ObjectId
+from backend.db import catalog_collection
+
+class StockHold(EmbeddedDocument):
+    # stock taken out of `ProductVariant.stock` by a pending reservation
+    reservation_id = StringField(required=True)
+    quantity = IntField(required=True, min_value=1)
 
 class ProductVariant(EmbeddedDocument):
     sku = StringField(required=True)
     stock = IntField(min_value=0, default=0)
     price = DecimalField(precision=2, min_value=0)
+    holds = EmbeddedDocumentListField(StockHold)
 
     def to_json(self):
         return {
@@ -19,7 +27,16 @@ class Product(Document):
     variants = EmbeddedDocumentListField(ProductVariant)
     images = ListField(StringField())
     
-    meta = {'collection': 'products', 'indexes': ['name', 'category']}
+    meta = {'collection': 'products', 'indexes': [
+        'name', 'category', ('category', 'id'),
+        # a SKU names one variant across the whole catalog (multikey, unique;
+        # products without variants are left out of the index)
+        {'fields': ['variants.sku'], 'unique': True,
+         'partialFilterExpression': {'variants.sku': {'$exists': True}}},
+        # full-text search over name and description (/products/search)
+        {'fields': ['$name', '$description'], 'default_language': 'english',
+         'weights': {'name': 10, 'description': 2}}
+    ]}
     def to_json(self):
         return {
             "id": str(self.pk),
@@ -30,4 +47,60 @@ class Product(Document):
             "images": self.images
         }
 
+    # VARIANT LOOKUPS
+    # Served by the variants.sku index; only the matching array elements are
+    # sent back, never the whole product document.
+    # -----------------------------------------------------------------------
+    @classmethod
+    def find_variant(cls, product_id, sku=None):
+        # the chosen variant of one product (its first variant without a SKU)
+        doc = cls._get_collection().find_one(*cls.variant_lookup(product_id, sku))
+        return cls.first_variant(doc)
+
+    @staticmethod
+    def variant_lookup(product_id, sku=None):
+        # -> (query, projection)
+        query = {"_id": ObjectId(product_id)}
+        projection = {"variants": {"$slice": 1}}
+        if sku is not None:
+            query["variants.sku"] = sku
+            projection = {"variants.$": 1}
+        return query, projection
+
+    @staticmethod
+    def first_variant(doc):
+        if not doc or not doc.get("variants"):
+            return None
+        return ProductVariant._from_son(doc["variants"][0])
+
+    @staticmethod
+    def choose_variant(variants, sku):
+        # the requested SKU, or the product's first variant
+        if sku is None:
+            return variants[0] if variants else None
+        return next((variant for variant in variants if variant.sku == sku), None)
+
+    @classmethod
+    def variants_by_sku(cls, skus):
+        # {sku: variant with its product's id, name and category}, in one aggregation
+        # a catalog read, answered by a secondary when there is one
+        rows = catalog_collection(cls).aggregate(cls.variants_by_sku_pipeline(skus))
+        return dict(cls.variant_row(doc) for doc in rows)
+
+    @staticmethod
+    def variants_by_sku_pipeline(skus):
+        return [
+            {"$match": {"variants.sku": {"$in": skus}}},
+            {"$project": {
+                "name": 1,
+                "category": 1,
+                "variants": {"$filter": {"input": "$variants", "cond": {"$in": ["$$this.sku", skus]}}}
+            }},
+            {"$unwind": "$variants"}
+        ]
 
+    @staticmethod
+    def variant_row(doc):
+        variant = ProductVariant._from_son(doc["variants"]).to_json()
+        variant.update(product_id=str(doc["_id"]), name=doc["name"], category=doc["category"])
+        return variant["sku"], variant
@@ -1,46 +1,190 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt
-from mongoengine.errors import ValidationError as MongoValidationError
+from mongoengine.errors import ValidationError as MongoValidationError, NotUniqueError
 from marshmallow import ValidationError
+from bson.errors import InvalidId
 from .models import Product
 from backend.schemas.product_schema import ProductSchema
-from backend.app import limiter, cache
-
-ONE_DAY = 60 * 60 * 24 * 1
-ONE_WEEK = ONE_DAY * 7
+from backend.pagination import encode_cursor, decode_id_cursor, InvalidCursor
+from backend.serialization import product_json
+from backend.app import limiter
+from backend import db
+from . import cache as product_cache
+from .autocomplete import product_names
+from . import bulk
 
 products_bp = Blueprint('products', __name__)
 product_schema = ProductSchema()
 
-# FETCHING ALL PRODUCTS with Pagination (Cached)
+# FETCHING ALL PRODUCTS with Pagination (Cached per page)
+# Offset mode: ?page=&per_page=
+# Cursor mode: ?mode=cursor&per_page=[&category=] for the first page, then
+# ?cursor=<next_cursor> to fetch the next page by an _id range query
 #-----------------------------------------------
+MAX_PER_PAGE = 100
+
 @products_bp.get('/all_products')
-@cache.cached(timeout=ONE_DAY, key_prefix="all_products")
 @limiter.limit("5 per minute")
 def get_all_products():
-    page = request.args.get('page', default=1, type=int)
-    per_page = request.args.get('per_page', default=5, type=int)
+    page = max(request.args.get('page', default=1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', default=5, type=int), 1), MAX_PER_PAGE)
+    cursor = request.args.get('cursor')
+    category = request.args.get('category')
+
+    if cursor is not None or request.args.get('mode') == 'cursor':
+        try:
+            last_id = decode_id_cursor(cursor, category)
+        except (InvalidCursor, InvalidId) as e:
+            return jsonify({"message": "Invalid cursor", "details": str(e)}), 400
+        params = {"mode": "cursor", "cursor": cursor, "category": category, "per_page": per_page}
+        body = product_cache.get_listing(params, lambda: _products_page_by_cursor(last_id, category, per_page))
+        return jsonify(body), 200
+
+    params = {"mode": "offset", "page": page, "per_page": per_page}
+    body = product_cache.get_listing(params, lambda: _products_page_by_offset(page, per_page))
+    return jsonify(body), 200
 
+def _products_page_by_offset(page, per_page):
     # Calculate skip count for pagination
     skip = (page - 1) * per_page
 
-    products = Product.objects.skip(skip).limit(per_page)
-    products_list = [p.to_json() for p in products]
+    # raw documents: no MongoEngine objects are built for listings
+    products = db.objects(Product, product_cache.read_alias()).skip(skip).limit(per_page).as_pymongo()
+    products_list = [product_json(p) for p in products]
 
-    total = Product.objects.count()
+    total = product_cache.get_products_total()
     total_pages = (total + per_page - 1)//per_page
 
-    return jsonify({
+    return {
         "page":page,
         "per_page":per_page,
         "total":total,
         "total_pages":total_pages,
         "products":products_list
+    }
+
+def _products_page_by_cursor(last_id, category, per_page):
+    query = {}
+    if last_id:
+        query['id__gt'] = last_id
+    if category:
+        query['category'] = category
+
+    # fetching one extra row tells us whether there is a next page
+    products = list(
+        db.objects(Product, product_cache.read_alias())(**query)
+        .order_by('id').limit(per_page + 1).as_pymongo()
+    )
+    has_more = len(products) > per_page
+    products = products[:per_page]
+
+    next_cursor = None
+    if has_more:
+        last_id = products[-1]["_id"]
+        next_cursor = encode_cursor(category, last_id) if category else encode_cursor(last_id)
+
+    return {
+        "per_page": per_page,
+        "category": category,
+        "total": product_cache.get_products_total(category),
+        "next_cursor": next_cursor,
+        "products": [product_json(p) for p in products]
+    }
+
+
+# SEARCH PRODUCTS (Cached per query, like listing pages)
+# Full-text search over name and description via the text index, best match
+# first: ?q=watch[&category=Wearables][&page=&per_page=]
+#-----------------------------------------------
+MAX_SEARCH_PER_PAGE = 50
+
+@products_bp.get('/search')
+@limiter.limit("20 per minute")
+def search_products():
+    q = request.args.get('q', '').strip()
+    category = request.args.get('category')
+    page = max(request.args.get('page', default=1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', default=10, type=int), 1), MAX_SEARCH_PER_PAGE)
+    if not q:
+        return jsonify({"message": "Query parameter 'q' is required"}), 400
+
+    params = {"mode": "search", "q": q, "category": category, "page": page, "per_page": per_page}
+    body = product_cache.get_listing(params, lambda: _search_page(q, category, page, per_page))
+    return jsonify(body), 200
+
+def _search_page(q, category, page, per_page):
+    query = {'category': category} if category else {}
+    products = list(
+        db.objects(Product, product_cache.read_alias())(**query).search_text(q).order_by('$text_score')
+        .skip((page - 1) * per_page).limit(per_page + 1).as_pymongo()
+    )
+    return {
+        "q": q,
+        "category": category,
+        "page": page,
+        "per_page": per_page,
+        "has_more": len(products) > per_page,
+        "products": [product_json(p) for p in products[:per_page]]
+    }
+
+
+# AUTOCOMPLETE PRODUCT NAMES
+# Prefix match served from this worker's in-memory name index: ?q=sma[&limit=]
+#-----------------------------------------------
+MAX_AUTOCOMPLETE_RESULTS = 20
+
+@products_bp.get('/autocomplete')
+@limiter.limit("60 per minute")
+def autocomplete_products():
+    q = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', default=10, type=int), 1), MAX_AUTOCOMPLETE_RESULTS)
+    if not q:
+        return jsonify({"suggestions": []}), 200
+    return jsonify({"suggestions": product_names.complete(q, limit)}), 200
+
+
+# VARIANTS BY SKU
+# Bulk lookup of variants (price, stock) with their product, in one query:
+# ?sku=SWX-001&sku=SWX-002 (or ?sku=SWX-001,SWX-002)
+#-----------------------------------------------
+MAX_SKUS_PER_LOOKUP = 100
+
+@products_bp.get('/by_sku')
+@limiter.limit("20 per minute")
+def get_variants_by_sku():
+    skus = list(dict.fromkeys(
+        sku.strip() for value in request.args.getlist('sku') for sku in value.split(',') if sku.strip()
+    ))
+    if not skus:
+        return jsonify({"message": "At least one sku is required"}), 400
+    if len(skus) > MAX_SKUS_PER_LOOKUP:
+        return jsonify({"message": f"At most {MAX_SKUS_PER_LOOKUP} SKUs per lookup"}), 400
+
+    variants = Product.variants_by_sku(skus)
+    return jsonify({
+        "variants": variants,
+        "missing": [sku for sku in skus if sku not in variants]
+    }), 200
+
+
+# PRODUCT CACHE STATS (Admin only)
+# hit/miss counters of this worker's product cache
+# ------------------------------------------------
+@products_bp.get('/cache_stats')
+@limiter.limit("10 per minute")
+@jwt_required()
+def get_cache_stats():
+    claims = get_jwt()
+    if claims.get('role') != 'admin':
+        return jsonify({"message": "Only admins can view cache stats"}), 403
+
+    return jsonify({
+        kind: counters.to_json() for kind, counters in product_cache.stats.items()
     }), 200
 
 
 # CREATE PRODUCT with JWT Auth & RBAC 
-# (Clear caches on successful creation)
+# (Invalidate product listings on successful creation)
 # --------------------------------------
 @products_bp.post('/create_product')
 @limiter.limit("3 per minute")
@@ -64,11 +208,15 @@ def create_product():
     try:
         # create a new product document
         product = Product(**data).save()
-        # clearing caches since product data has changed
-        cache.clear()
+        # a new product only changes the listings
+        product_cache.invalidate_listings()
+        product_cache.invalidate_products_total(product.category)
+        product_names.product_saved(product)
         return jsonify({
             "message": "Product created successfully"
             }), 201
+    except NotUniqueError:
+        return jsonify({"message": "A variant SKU is already used by another product"}), 409
     except MongoValidationError as e:
         return jsonify({
             "message": "Database validation error",
@@ -76,21 +224,86 @@ def create_product():
         }), 400
     
 
-# READ PRODUCT (Cached)
-# ---------------------
+# BULK IMPORT with JWT Auth & RBAC
+# Streams NDJSON (application/x-ndjson) or CSV (text/csv) from the request
+# body, or pass ?format=ndjson|csv; see bulk.py for both formats. Every
+# product is validated like create_product; valid ones are inserted in
+# unordered bulk writes of BULK_IMPORT_BATCH_SIZE and invalid ones are
+# reported by line. Caches are invalidated once, at the end.
+# --------------------------------------
+BULK_FORMATS = {"application/x-ndjson": "ndjson", "application/jsonl": "ndjson", "text/csv": "csv"}
+
+@products_bp.post('/import')
+@limiter.limit("2 per minute")
+@jwt_required()
+def import_products():
+    claims = get_jwt()
+    if claims.get('role') != 'admin':
+        return jsonify({"message": "Only admins can import products"}), 403
+
+    data_format = request.args.get('format') or BULK_FORMATS.get(request.mimetype)
+    if data_format == "ndjson":
+        records = bulk.ndjson_records(request.stream)
+    elif data_format == "csv":
+        records = bulk.csv_records(request.stream)
+    else:
+        return jsonify({"message": "Send NDJSON (application/x-ndjson) or CSV (text/csv)"}), 415
+
+    report = bulk.import_products(records, current_app.config.get("BULK_IMPORT_BATCH_SIZE", 1000))
+    if report.imported:
+        product_cache.invalidate_listings()
+        product_cache.invalidate_products_total(*report.categories)
+        product_names.products_imported()
+    return jsonify({
+        "message": f"Imported {report.imported} products, {report.failed} failed",
+        **report.to_json()
+    }), 200
+
+
+# BULK EXPORT with JWT Auth & RBAC
+# Streams every product (or one ?category=) as NDJSON or ?format=csv, read
+# BULK_EXPORT_BATCH_SIZE documents at a time from a server-side cursor
+# --------------------------------------
+@products_bp.get('/export')
+@limiter.limit("2 per minute")
+@jwt_required()
+def export_products():
+    claims = get_jwt()
+    if claims.get('role') != 'admin':
+        return jsonify({"message": "Only admins can export products"}), 403
+
+    data_format = request.args.get('format', 'ndjson')
+    if data_format not in ("ndjson", "csv"):
+        return jsonify({"message": "format must be ndjson or csv"}), 400
+
+    docs = bulk.export_cursor(request.args.get('category'), current_app.config.get("BULK_EXPORT_BATCH_SIZE", 1000))
+    if data_format == "csv":
+        lines, mimetype = bulk.csv_lines(docs), "text/csv"
+    else:
+        lines, mimetype = bulk.ndjson_lines(docs), "application/x-ndjson"
+    return Response(
+        stream_with_context(lines), mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=products.{data_format}"}
+    )
+
+
+# READ PRODUCT (Cached per product id)
+# ------------------------------------
 @products_bp.get('/<product_id>')
-@cache.cached(timeout=ONE_DAY, key_prefix="product_{product_id}")
 @limiter.limit("10 per minute")
 def read_product(product_id):
-    try:
-        product = Product.objects.get(id=product_id)
-        return jsonify(product.to_json()), 200
-    except Product.DoesNotExist:
+    product = product_cache.get_product(product_id, lambda: _load_product(product_id))
+    if product is None:
         return jsonify({"message": "Product not found"}), 404
+    return jsonify(product), 200
+
+def _load_product(product_id):
+    product = db.objects(Product, product_cache.read_alias(product_id))(id=product_id).as_pymongo().first()
+    return product_json(product) if product else None
 
 
 # UPDATE PRODUCT with JWT Auth & RBAC 
-# (Clear caches on successful update)
+# (Invalidate the product's cache entry on successful update)
 # --------------------------------------
 @products_bp.put('/update_product/<product_id>')
 @limiter.limit("3 per minute") 
@@ -112,16 +325,21 @@ def update_product(product_id):
 
     try:
         product = Product.objects.get(id=product_id)
+        old_category = product.category
         product.update(**data)
         product.reload()  # Refreshing product data after update
-        # Clearing caches to reflect updates
-        cache.clear()
+        # Invalidating this product's cache entry to reflect updates
+        product_cache.invalidate_product(product_id)
+        product_cache.invalidate_products_total(old_category, product.category)
+        product_names.product_saved(product)
         return jsonify({
             "message": "Product updated successfully",
             "product": product.to_json()
         }), 200
     except Product.DoesNotExist:
         return jsonify({"message": "Product not found"}), 404
+    except NotUniqueError:
+        return jsonify({"message": "A variant SKU is already used by another product"}), 409
     except MongoValidationError as e:
         return jsonify({
             "message": "Database validation error",
@@ -130,7 +348,7 @@ def update_product(product_id):
 
 
 # DELETE PRODUCT with JWT Auth & RBAC 
-# (Clear caches on successful deletion)
+# (Invalidate the product's cache entry on successful deletion)
 # ----------------------------------------
 @products_bp.delete('/delete_product/<product_id>')
 @limiter.limit("2 per minute")
@@ -143,8 +361,10 @@ def delete_product(product_id):
     try:
         product = Product.objects.get(id=product_id)
         product.delete()
-        # Clearing caches to reflect deletion
-        cache.clear()
+        # Invalidating this product's cache entry to reflect deletion
+        product_cache.invalidate_product(product_id)
+        product_cache.invalidate_products_total(product.category)
+        product_names.product_deleted(product_id)
         return jsonify({"message": "Product deleted successfully"}), 200
     except Product.DoesNotExist:
         return jsonify({"message": "Product not found"}), 404
@@ -0,0 +1,136 @@
+from mongoengine import connect
+from mongoengine.connection import get_connection, get_db
+from mongoengine.queryset import QuerySet
+from pymongo import monitoring
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+from backend.metrics import registry
+from backend.instrumentation import CommandMetricsListener
+
+# MongoDB connections
+# -------------------
+# Two aliases, each with its own pool:
+#   default  primary reads and all writes (cart, orders, auth, admin writes)
+#   catalog  catalog reads (product listings and lookups, coupon table) with
+#            MONGO_CATALOG_READ_PREFERENCE, secondaryPreferred by default
+# Pool size, wait-queue timeout and idle time come from config. Pool
+# checkout latency and connection counts, and per-command timings (see
+# instrumentation.py), are exported at /metrics.
+DEFAULT = "default"
+CATALOG = "catalog"
+
+checkout_seconds = registry.histogram(
+    "mongo_pool_checkout_seconds", "Time to check a connection out of the pool",
+    ("alias",), buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0)
+)
+checkout_failures = registry.counter(
+    "mongo_pool_checkout_failures_total", "Failed connection checkouts", ("alias", "reason")
+)
+connections_in_use = registry.gauge(
+    "mongo_pool_connections_in_use", "Connections checked out of the pool", ("alias",)
+)
+connections_open = registry.gauge(
+    "mongo_pool_connections_open", "Open pooled connections", ("alias",)
+)
+pool_clears = registry.counter(
+    "mongo_pool_cleared_total", "Times the pool was cleared (e.g. after a network error)", ("alias",)
+)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    def __init__(self, alias):
+        self.alias = alias
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pool_clears.inc(alias=self.alias)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        connections_open.inc(alias=self.alias)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        connections_open.dec(alias=self.alias)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        checkout_failures.inc(alias=self.alias, reason=event.reason)
+        self._observe(event)
+
+    def connection_checked_out(self, event):
+        connections_in_use.inc(alias=self.alias)
+        self._observe(event)
+
+    def _observe(self, event):
+        if event.duration is not None:
+            checkout_seconds.observe(event.duration, alias=self.alias)
+
+    def connection_checked_in(self, event):
+        connections_in_use.dec(alias=self.alias)
+
+
+def init_app(app):
+    app.config.setdefault("MONGO_MAX_POOL_SIZE", 100)
+    app.config.setdefault("MONGO_MIN_POOL_SIZE", 0)
+    app.config.setdefault("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000)
+    app.config.setdefault("MONGO_MAX_IDLE_TIME_MS", 60_000)
+    app.config.setdefault("MONGO_CATALOG_URI", app.config["MONGO_URI"])
+    app.config.setdefault("MONGO_CATALOG_READ_PREFERENCE", "secondaryPreferred")
+    app.config.setdefault("MONGO_CATALOG_MAX_STALENESS_SECONDS", None)
+    # a pymongo-compatible client class, e.g. mongomock's for the benchmarks
+    app.config.setdefault("MONGO_CLIENT_CLASS", None)
+    # None: detected with supports_transactions() on the first checkout
+    app.config.setdefault("MONGO_USE_TRANSACTIONS", None)
+
+    pool_options = dict(
+        maxPoolSize=app.config["MONGO_MAX_POOL_SIZE"],
+        minPoolSize=app.config["MONGO_MIN_POOL_SIZE"],
+        waitQueueTimeoutMS=app.config["MONGO_WAIT_QUEUE_TIMEOUT_MS"],
+        maxIdleTimeMS=app.config["MONGO_MAX_IDLE_TIME_MS"],
+    )
+    if app.config["MONGO_CLIENT_CLASS"] is not None:
+        pool_options["mongo_client_class"] = app.config["MONGO_CLIENT_CLASS"]
+    connect(
+        host=app.config["MONGO_URI"], alias=DEFAULT,
+        event_listeners=[PoolMetricsListener(DEFAULT), CommandMetricsListener(DEFAULT)], **pool_options
+    )
+
+    read_preference = make_read_preference(
+        read_pref_mode_from_name(app.config["MONGO_CATALOG_READ_PREFERENCE"]), None,
+        app.config["MONGO_CATALOG_MAX_STALENESS_SECONDS"] or -1
+    )
+    connect(
+        host=app.config["MONGO_CATALOG_URI"], alias=CATALOG, read_preference=read_preference,
+        event_listeners=[PoolMetricsListener(CATALOG), CommandMetricsListener(CATALOG)], **pool_options
+    )
+
+
+def supports_transactions(alias=DEFAULT):
+    # replica set members and mongos routers do, a standalone mongod does not
+    hello = get_connection(alias).admin.command("hello")
+    return "setName" in hello or hello.get("msg") == "isdbgrid"
+
+
+def catalog_collection(document_class):
+    # raw pymongo collection of a document class, on the catalog alias
+    return get_db(CATALOG)[document_class._get_collection_name()]
+
+
+def objects(document_class, alias):
+    # A queryset on `alias`. QuerySet.using() would instead switch the class
+    # itself to the alias while it runs (visible to every other thread) and
+    # re-create all of its indexes on every call.
+    document_class._get_collection()  # indexes are created on first use
+    collection = get_db(alias)[document_class._get_collection_name()]
+    return document_class._meta.get("queryset_class", QuerySet)(document_class, collection)
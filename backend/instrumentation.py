@@ -0,0 +1,236 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from bson import encode
+from flask import g, request
+from pymongo import monitoring
+from backend.metrics import registry
+
+# Hot-path instrumentation
+# ------------------------
+# (request and Mongo command metrics at /metrics, folded stacks of slow
+# requests in PROFILE_DIR)
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "Request latency", ("method", "endpoint", "status")
+)
+request_phases = registry.histogram(
+    "request_phase_seconds", "Time spent per phase of a request", ("endpoint", "phase")
+)
+commands_per_request = registry.histogram(
+    "mongo_commands_per_request", "Mongo commands issued per request", ("endpoint",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+)
+bytes_per_request = registry.histogram(
+    "mongo_bytes_per_request", "Mongo command and reply bytes per request", ("endpoint", "direction"),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+)
+command_duration = registry.histogram(
+    "mongo_command_duration_seconds", "Mongo command round-trip time", ("alias", "command")
+)
+cache_lookups = registry.counter(
+    "cache_lookups_total", "Cache lookups by result", ("cache", "result")
+)
+cache_hit_ratio = registry.gauge(
+    "cache_hit_ratio", "Share of lookups answered from the cache", ("cache",)
+)
+
+
+class RequestStats:
+    __slots__ = ("commands", "bytes_sent", "bytes_received", "phases")
+
+    def __init__(self):
+        self.commands = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.phases = {}
+
+    def add_phase(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+# per request (a context variable, so threads and asyncio tasks each see their own)
+_current = ContextVar("request_stats", default=None)
+
+
+@contextmanager
+def span(phase):
+    # time a block and attribute it to a phase of the current request
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_phase(phase, time.perf_counter() - start)
+
+
+def record_phase(phase, seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.add_phase(phase, seconds)
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    # bytes are measured by re-encoding, so only with INSTRUMENT_MONGO_BYTES
+    measure_bytes = False
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def started(self, event):
+        stats = _current.get()
+        if stats is None:
+            return
+        stats.commands += 1
+        if self.measure_bytes:
+            stats.bytes_sent += len(encode(event.command))
+
+    def succeeded(self, event):
+        self._finished(event)
+        stats = _current.get()
+        if stats is not None and self.measure_bytes:
+            stats.bytes_received += len(encode(event.reply))
+
+    def failed(self, event):
+        self._finished(event)
+
+    def _finished(self, event):
+        seconds = event.duration_micros / 1e6
+        command_duration.observe(seconds, alias=self.alias, command=event.command_name)
+        record_phase("mongo", seconds)
+
+
+class SamplingProfiler:
+    # samples request threads every `interval`, keeps the slow requests
+    def __init__(self, interval, threshold, directory):
+        self.interval = interval
+        self.threshold = threshold
+        self.directory = directory
+        self._samples = {}  # thread id -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._samples.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[_fold(frame)] += 1
+
+    def begin(self):
+        self.start()
+        with self._lock:
+            self._samples[threading.get_ident()] = StackCounter()
+
+    def end(self, endpoint, seconds):
+        with self._lock:
+            samples = self._samples.pop(threading.get_ident(), None)
+        if not samples or seconds < self.threshold:
+            return
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{int(seconds * 1000)}ms.folded"
+        with open(os.path.join(self.directory, name), "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _fold(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def _collect_cache_stats():
+    # read on scrape from the caches' own counters
+    from backend.app import revocations
+    from backend.blueprints.products import cache as product_cache
+
+    for kind, counters in product_cache.stats.items():
+        stats = counters.to_json()
+        _export_cache(f"products_{kind}", {"hit": stats["hits"], "miss": stats["misses"]})
+
+    stats = revocations.to_json()
+    _export_cache("revocation", {
+        "hit": stats["cache_hits"], "bloom_skip": stats["bloom_skips"], "db_lookup": stats["db_lookups"]
+    })
+
+
+def _export_cache(name, counts):
+    for result, count in counts.items():
+        cache_lookups.set(count, cache=name, result=result)
+    lookups = sum(counts.values())
+    cache_hit_ratio.set(counts["hit"] / lookups if lookups else 0, cache=name)
+
+
+class Instrumentation:
+    def __init__(self):
+        self.profiler = None
+
+    def init_app(self, app):
+        app.config.setdefault("INSTRUMENT_MONGO_BYTES", False)
+        app.config.setdefault("PROFILE_SLOW_REQUESTS", False)
+        app.config.setdefault("PROFILE_SLOW_THRESHOLD", 0.5)
+        app.config.setdefault("PROFILE_INTERVAL", 0.005)
+        app.config.setdefault("PROFILE_DIR", "profiles")
+        CommandMetricsListener.measure_bytes = app.config["INSTRUMENT_MONGO_BYTES"]
+        if app.config["PROFILE_SLOW_REQUESTS"]:
+            self.profiler = SamplingProfiler(
+                app.config["PROFILE_INTERVAL"], app.config["PROFILE_SLOW_THRESHOLD"], app.config["PROFILE_DIR"]
+            )
+
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+        registry.add_collector(_collect_cache_stats)
+        app.extensions["instrumentation"] = self
+
+    def _before(self):
+        g._instrumentation = (time.perf_counter(), _current.set(RequestStats()))
+        if self.profiler is not None:
+            self.profiler.begin()
+
+    def _after(self, response):
+        g._instrumentation_status = response.status_code
+        return response
+
+    def _teardown(self, exc):
+        started = g.pop("_instrumentation", None)
+        if started is None:
+            return
+        start, token = started
+        seconds = time.perf_counter() - start
+        stats = _current.get()
+        _current.reset(token)
+
+        endpoint = request.endpoint or "unmatched"
+        status = g.pop("_instrumentation_status", 500)
+        request_duration.observe(seconds, method=request.method, endpoint=endpoint, status=status)
+        commands_per_request.observe(stats.commands, endpoint=endpoint)
+        if CommandMetricsListener.measure_bytes:
+            bytes_per_request.observe(stats.bytes_sent, endpoint=endpoint, direction="sent")
+            bytes_per_request.observe(stats.bytes_received, endpoint=endpoint, direction="received")
+        for phase, phase_seconds in stats.phases.items():
+            request_phases.observe(phase_seconds, endpoint=endpoint, phase=phase)
+        if self.profiler is not None:
+            self.profiler.end(endpoint, seconds)
+
+
+instrumentation = Instrumentation()
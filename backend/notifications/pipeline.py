@@ -0,0 +1,57 @@
+import asyncio
+from .transports import transport_from_config
+
+
+# Notification pipeline
+# ---------------------
+# Sends a batch of notifications concurrently on an asyncio loop (bounded by
+# `concurrency`), retrying each failed send with exponential backoff up to
+# `max_retries` times. Nothing here blocks a worker on a fixed sleep: a batch
+# costs about as long as its slowest send.
+class NotificationPipeline:
+    def __init__(self, transport, concurrency=20, max_retries=3, backoff=0.2):
+        self.transport = transport
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def send(self, notifications):
+        # returns (sent, failed) lists of notifications
+        if not notifications:
+            return [], []
+        return asyncio.run(self.send_async(notifications))
+
+    async def send_async(self, notifications):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send_one(notification):
+            async with semaphore:
+                return await self._send_with_retry(notification)
+
+        results = await asyncio.gather(*(send_one(n) for n in notifications))
+        sent = [n for n, ok in zip(notifications, results) if ok]
+        failed = [n for n, ok in zip(notifications, results) if not ok]
+        return sent, failed
+
+    async def _send_with_retry(self, notification):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.transport.send(notification)
+                return True
+            except Exception:
+                if attempt == self.max_retries:
+                    return False
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+
+
+def pipeline_from_app(app):
+    pipeline = app.extensions.get("notification_pipeline")
+    if pipeline is None:
+        pipeline = NotificationPipeline(
+            transport_from_config(app.config),
+            concurrency=app.config.get("NOTIFICATION_CONCURRENCY", 20),
+            max_retries=app.config.get("NOTIFICATION_MAX_RETRIES", 3),
+            backoff=app.config.get("NOTIFICATION_RETRY_BACKOFF", 0.2)
+        )
+        app.extensions["notification_pipeline"] = pipeline
+    return pipeline
@@ -0,0 +1,73 @@
+import asyncio
+import random
+import smtplib
+from email.message import EmailMessage
+
+# Notification transports
+# -----------------------
+# A transport delivers one notification (a dict with "to", "subject", "body")
+# and raises on failure; the pipeline owns batching, concurrency and retries.
+
+
+class Transport:
+    async def send(self, notification):
+        raise NotImplementedError
+
+
+class FakeTransport(Transport):
+    # Local stand-in for an SMTP/SMS provider: records what was sent, with an
+    # optional simulated network latency and failure rate
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = []
+
+    async def send(self, notification):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ConnectionError("simulated transport failure")
+        self.sent.append(notification)
+
+
+class SMTPTransport(Transport):
+    def __init__(self, host, port=25, sender="no-reply@localhost", username=None, password=None, use_tls=False):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+
+    def _send_sync(self, notification):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = notification["to"]
+        message["Subject"] = notification["subject"]
+        message.set_content(notification["body"])
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+    async def send(self, notification):
+        # smtplib blocks, so each send runs on the default thread pool
+        await asyncio.to_thread(self._send_sync, notification)
+
+
+def transport_from_config(config):
+    kind = config.get("NOTIFICATION_TRANSPORT", "fake")
+    if kind == "fake":
+        return FakeTransport(latency=config.get("NOTIFICATION_FAKE_LATENCY", 0.0))
+    if kind == "smtp":
+        return SMTPTransport(
+            host=config["SMTP_HOST"],
+            port=config.get("SMTP_PORT", 25),
+            sender=config.get("SMTP_SENDER", "no-reply@localhost"),
+            username=config.get("SMTP_USERNAME"),
+            password=config.get("SMTP_PASSWORD"),
+            use_tls=config.get("SMTP_USE_TLS", False)
+        )
+    raise ValueError(f"Unknown notification transport: {kind}")
@@ -0,0 +1,40 @@
+import base64
+import json
+
+from bson import ObjectId
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# Opaque cursors for keyset pagination
+# (a cursor is just the sort key of the last row a client has seen)
+def encode_cursor(*values):
+    raw = json.dumps([str(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {e}")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Malformed cursor")
+    return values
+
+
+# Cursor over _id, optionally tied to a scope (e.g. the category being listed)
+def decode_id_cursor(cursor, scope=None):
+    if not cursor:
+        return None
+    if scope:
+        cursor_scope, last_id = decode_cursor(cursor, 2)
+        if cursor_scope != scope:
+            raise InvalidCursor("Cursor does not match category")
+    else:
+        last_id, = decode_cursor(cursor, 1)
+    return ObjectId(last_id)
@@ -0,0 +1,160 @@
+import json
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Pluggable pub/sub channels
+# --------------------------
+# Used to fan out events (e.g. revoked tokens) to every worker process.
+#   redis://host:port/db  -> RedisChannel (shared across processes and nodes)
+#   memory://<name>       -> InMemoryChannel (single process; tests and local runs)
+
+
+class Channel:
+    def publish(self, topic, message):
+        raise NotImplementedError
+
+    def subscribe(self, topic, callback):
+        raise NotImplementedError
+
+    def on_resubscribe(self, callback):
+        # callback() runs whenever the channel (re)subscribes, as it may have
+        # missed messages while it wasn't
+        pass
+
+    def close(self):
+        pass
+
+
+class InMemoryChannel(Channel):
+    # Channels created with the same name share subscribers, so a test can
+    # stand up several "workers" in one process and watch messages fan out.
+    _hubs = defaultdict(lambda: defaultdict(list))
+    _hubs_lock = threading.Lock()
+
+    def __init__(self, name="default"):
+        self.name = name
+        self.published = []
+
+    def publish(self, topic, message):
+        self.published.append((topic, message))
+        with self._hubs_lock:
+            callbacks = list(self._hubs[self.name][topic])
+        for callback in callbacks:
+            callback(message)
+
+    def subscribe(self, topic, callback):
+        with self._hubs_lock:
+            self._hubs[self.name][topic].append(callback)
+
+    def close(self):
+        with self._hubs_lock:
+            self._hubs.pop(self.name, None)
+
+
+class RedisChannel(Channel):
+    # Connects lazily, so the app boots without Redis: a listener thread
+    # (re)connects in the background and resubscribes every topic, and a
+    # publish while Redis is down is logged and dropped (the other workers
+    # miss that message, like any sent while their listener reconnects).
+    RETRY_SECONDS = 5
+
+    def __init__(self, url):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._errors = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+        self._callbacks = defaultdict(list)
+        self._resubscribed = []
+        self._lock = threading.Lock()
+        self._pubsub = None
+        self._thread = None
+        self._closed = threading.Event()
+
+    def publish(self, topic, message):
+        try:
+            self._redis.publish(topic, json.dumps(message))
+        except self._errors as e:
+            logger.error("Could not publish to %s, other workers miss this message: %s", topic, e)
+
+    def subscribe(self, topic, callback):
+        with self._lock:
+            self._callbacks[topic].append(callback)
+            pubsub = self._pubsub
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name="pubsub-listener", daemon=True)
+                self._thread.start()
+        if pubsub is not None:
+            try:
+                pubsub.subscribe(topic)
+            except self._errors:
+                pass  # subscribed again on reconnect
+
+    def on_resubscribe(self, callback):
+        with self._lock:
+            self._resubscribed.append(callback)
+
+    def _listen(self):
+        while not self._closed.is_set():
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                with self._lock:
+                    topics = list(self._callbacks)
+                    self._pubsub = pubsub
+                pubsub.subscribe(*topics)
+                self._notify_resubscribed()
+                while not self._closed.is_set():
+                    raw = pubsub.get_message(timeout=1.0)
+                    if raw is not None:
+                        self._dispatch(raw)
+            except self._errors as e:
+                logger.warning("Pub/sub listener cannot reach Redis, retrying in %ss: %s", self.RETRY_SECONDS, e)
+                self._closed.wait(self.RETRY_SECONDS)
+            finally:
+                with self._lock:
+                    self._pubsub = None
+                pubsub.close()
+
+    def _notify_resubscribed(self):
+        with self._lock:
+            callbacks = list(self._resubscribed)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Pub/sub resubscribe callback failed")
+
+    def _dispatch(self, raw):
+        topic = raw["channel"].decode() if isinstance(raw["channel"], bytes) else raw["channel"]
+        message = json.loads(raw["data"])
+        for callback in self._callbacks[topic]:
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("Pub/sub callback for %s failed", topic)
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+
+def channel_from_url(url):
+    if url.startswith("memory://"):
+        return InMemoryChannel(url[len("memory://"):] or "default")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisChannel(url)
+    raise ValueError(f"Unsupported pub/sub channel URL: {url}")
+
+
+def channel_for_app(app):
+    # one channel per app, shared by every cache that fans out invalidations
+    channel = app.extensions.get("pubsub")
+    if channel is None:
+        app.config.setdefault("PUBSUB_URL", app.config["CELERY"]["broker_url"])
+        channel = channel_from_url(app.config["PUBSUB_URL"])
+        app.extensions["pubsub"] = channel
+    return channel
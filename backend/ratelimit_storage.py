@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+from limits.storage import Storage
+
+# Shared rate-limit storage with a per-process lease fast path
+# ------------------------------------------------------------
+# Counters live in a store shared by every worker and node (Redis, or an
+# in-process fake for tests), so "5 per minute" means 5 per minute in total,
+# not 5 per worker, and survives restarts.
+#
+# To keep a network hop off most requests, a worker leases a block of counter
+# values with one INCRBY and hands them out locally. Every hit still gets a
+# unique counter value, so the limit is never exceeded. Values leased but not
+# used before the window ends count against it, which can only make the
+# limit slightly stricter. Leases start at 1 and double while a key stays hot,
+# capped at `max_lease` and at a tenth of the limit, so low limits stay exact.
+# Expired leases are swept every `prune_interval` seconds, and per-key locks
+# are striped over a fixed set, so a long-lived worker seeing many client IPs
+# does not grow without bound.
+#
+#   leased+redis://host:port/db   leased+memory://<name>
+
+
+class FakeCounterStore:
+    # In-process stand-in for the shared store. Instances created with the
+    # same name share counters, like workers talking to one Redis.
+    _stores = defaultdict(dict)
+    _stores_lock = threading.Lock()
+
+    def __init__(self, name="default"):
+        self.name = name
+        self.calls = 0
+        with self._stores_lock:
+            self._counters = self._stores[name]
+        self._lock = threading.Lock()
+
+    def incr(self, key, amount, expiry):
+        # -> (new value, window expiry as epoch seconds)
+        self.calls += 1
+        now = time.time()
+        with self._lock:
+            value, expires_at = self._counters.get(key, (0, 0))
+            if expires_at <= now:
+                value, expires_at = 0, now + expiry
+            value += amount
+            self._counters[key] = (value, expires_at)
+            return value, expires_at
+
+    def get(self, key):
+        with self._lock:
+            value, expires_at = self._counters.get(key, (0, 0))
+            if expires_at <= time.time():
+                return 0, time.time()
+            return value, expires_at
+
+    def clear(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def reset(self):
+        with self._lock:
+            count = len(self._counters)
+            self._counters.clear()
+            return count
+
+    def check(self):
+        return True
+
+
+class RedisCounterStore:
+    # INCRBY and set the window's expiry on first use, atomically
+    INCR_SCRIPT = """
+    local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+    if value == tonumber(ARGV[1]) then
+        redis.call('EXPIRE', KEYS[1], ARGV[2])
+    end
+    return {value, redis.call('PTTL', KEYS[1])}
+    """
+
+    def __init__(self, url, prefix="LEASED"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._incr = self._redis.register_script(self.INCR_SCRIPT)
+        self.prefix = prefix
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def incr(self, key, amount, expiry):
+        value, ttl_ms = self._incr(keys=[self._key(key)], args=[amount, expiry])
+        return int(value), time.time() + max(int(ttl_ms), 0) / 1000
+
+    def get(self, key):
+        pipe = self._redis.pipeline()
+        pipe.get(self._key(key))
+        pipe.pttl(self._key(key))
+        value, ttl_ms = pipe.execute()
+        return int(value or 0), time.time() + max(int(ttl_ms), 0) / 1000
+
+    def clear(self, key):
+        self._redis.delete(self._key(key))
+
+    def reset(self):
+        keys = list(self._redis.scan_iter(f"{self.prefix}:*"))
+        if keys:
+            self._redis.delete(*keys)
+        return len(keys)
+
+    def check(self):
+        try:
+            return self._redis.ping()
+        except Exception:
+            return False
+
+
+class _Lease:
+    __slots__ = ("next", "last", "expires_at", "size", "acquired_at")
+
+    def __init__(self, first, last, expires_at, size, acquired_at):
+        self.next = first
+        self.last = last
+        self.expires_at = expires_at
+        self.size = size
+        self.acquired_at = acquired_at
+
+
+class LeasedStorage(Storage):
+    STORAGE_SCHEME = ["leased+redis", "leased+rediss", "leased+memory"]
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, uri=None, wrap_exceptions=False, max_lease=100, hot_interval=1.0, prune_interval=60.0,
+                 **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.max_lease = max_lease
+        self.hot_interval = hot_interval
+        self.prune_interval = prune_interval
+        self.local_hits = 0
+        self.store_calls = 0
+
+        backend_uri = uri.split("+", 1)[1]
+        if backend_uri.startswith("memory://"):
+            self.store = FakeCounterStore(urlparse(backend_uri).netloc or "default")
+        else:
+            self.store = RedisCounterStore(backend_uri)
+
+        self._leases = {}
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._prune_lock = threading.Lock()
+        self._next_prune = time.time() + prune_interval
+
+    @property
+    def base_exceptions(self):
+        try:
+            import redis
+            return (redis.RedisError, ConnectionError)
+        except ImportError:
+            return ConnectionError
+
+    def _key_lock(self, key):
+        return self._locks[hash(key) % self.LOCK_STRIPES]
+
+    def _prune(self, now):
+        # drop leases whose window has ended; one sweep at a time, the
+        # others skip it
+        if now < self._next_prune or not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_prune = now + self.prune_interval
+            for key, lease in self._leases.copy().items():
+                if lease.expires_at <= now:
+                    with self._key_lock(key):
+                        if self._leases.get(key) is lease:
+                            del self._leases[key]
+        finally:
+            self._prune_lock.release()
+
+    def _lease_size(self, key, previous, now, amount):
+        size = 1
+        if previous and previous.expires_at > now and now - previous.acquired_at < self.hot_interval:
+            size = previous.size * 2
+        # limits keys end in .../<amount>/<multiples>/<granularity>
+        try:
+            limit = int(key.rsplit("/", 3)[-3])
+            size = min(size, max(1, limit // 10))
+        except (ValueError, IndexError):
+            pass
+        return max(min(size, self.max_lease), amount)
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        self._prune(time.time())
+        with self._key_lock(key):
+            now = time.time()
+            lease = self._leases.get(key)
+            if not elastic_expiry and lease and lease.expires_at > now and lease.next + amount - 1 <= lease.last:
+                self.local_hits += 1
+                value = lease.next + amount - 1
+                lease.next += amount
+                return value
+
+            size = amount if elastic_expiry else self._lease_size(key, lease, now, amount)
+            self.store_calls += 1
+            last, expires_at = self.store.incr(key, size, expiry)
+            first = last - size + 1
+            self._leases[key] = _Lease(first + amount, last, expires_at, size, now)
+            return first + amount - 1
+
+    def get(self, key):
+        with self._key_lock(key):
+            lease = self._leases.get(key)
+            if lease and lease.expires_at > time.time() and lease.next <= lease.last:
+                return lease.next - 1
+        value, _ = self.store.get(key)
+        return value
+
+    def get_expiry(self, key):
+        lease = self._leases.get(key)
+        if lease and lease.expires_at > time.time():
+            return lease.expires_at
+        _, expires_at = self.store.get(key)
+        return expires_at
+
+    def check(self):
+        return self.store.check()
+
+    def reset(self):
+        self._leases.clear()
+        return self.store.reset()
+
+    def clear(self, key):
+        with self._key_lock(key):
+            self._leases.pop(key, None)
+        self.store.clear(key)
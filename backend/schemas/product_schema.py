@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, fields, validate, validates, ValidationError
 
 
 class ProductVariantSchema(Schema):
@@ -12,3 +12,9 @@ class ProductSchema(Schema):
     category = fields.Str(required=True)
     images = fields.List(fields.Str(), missing=[])
     variants = fields.List(fields.Nested(ProductVariantSchema), missing=[])
+
+    @validates('variants')
+    def validate_unique_skus(self, variants, **kwargs):
+        skus = [variant['sku'] for variant in variants]
+        if len(skus) != len(set(skus)):
+            raise ValidationError("Variant SKUs must be unique")
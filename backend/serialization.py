@@ -0,0 +1,141 @@
+import dataclasses
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+from bson import Decimal128, ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+CENTS = Decimal("0.01")
+
+
+def _default(o):
+    # Decimal stays a string, like Flask's default provider
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, Decimal128):
+        return str(o.to_decimal())
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, UUID):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+# JSON provider
+# -------------
+# Registered as app.json, so jsonify() encodes with orjson when it is
+# installed (the stdlib encoder otherwise). Both understand Decimal, ObjectId
+# and datetimes, so raw pymongo documents can be returned as they are.
+class FastJSONProvider(DefaultJSONProvider):
+    def _option(self):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            kwargs.setdefault("default", _default)
+            kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+            kwargs.setdefault("sort_keys", self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=self._option()).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_default, option=self._option() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+# Serializers for raw documents
+# -----------------------------
+# List endpoints read with .as_pymongo() and build the response from the raw
+# documents, skipping MongoEngine object construction. Each function returns
+# the same shape as the model's to_json (keep them in step).
+def _money(value):
+    return float(value) if value is not None else None
+
+
+def _cents(value):
+    # as a DecimalField hands it back (stored as a float)
+    return Decimal(str(value)).quantize(CENTS) if value is not None else None
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def variant_json(doc):
+    return {
+        "sku": doc.get("sku"),
+        "stock": doc.get("stock", 0),
+        "price": _money(doc.get("price"))
+    }
+
+
+def product_json(doc):
+    return {
+        "id": str(doc["_id"]),
+        "name": doc.get("name"),
+        "description": doc.get("description"),
+        "category": doc.get("category"),
+        "variants": [variant_json(v) for v in doc.get("variants", [])],
+        "images": doc.get("images", [])
+    }
+
+
+def order_summary_json(doc):
+    return {
+        "id": str(doc["_id"]),
+        "status": doc.get("status"),
+        "total_amount": _money(doc.get("total_amount")),
+        "discount_applied": _money(doc.get("discount_applied", 0)),
+        "final_amount": _money(doc.get("final_amount")),
+        "created_at": _isoformat(doc.get("created_at"))
+    }
+
+
+def cart_json(doc):
+    return {
+        "user_id": doc.get("user_id"),
+        "items": [{
+            "product_id": item.get("product_id"),
+            "sku": item.get("sku"),
+            "quantity": item.get("quantity", 1),
+            "price": _cents(item.get("price"))
+        } for item in doc.get("items", [])]
+    }
+
+
+def coupon_json(doc):
+    return {
+        "id": str(doc["_id"]),
+        "code": doc.get("code"),
+        "discount_percent": doc.get("discount_percent"),
+        "expiry": _isoformat(doc.get("expiry")),
+        "eligible_roles": doc.get("eligible_roles", ["customer"]),
+        "max_redemptions": doc.get("max_redemptions"),
+        "max_redemptions_per_user": doc.get("max_redemptions_per_user")
+    }
+
@@ -0,0 +1,8 @@
+from celery import shared_task
+from backend.blueprints.orders import inventory
+
+
+# Put back stock held by abandoned checkouts (schedule with celery beat)
+@shared_task(ignore_result=False)
+def release_expired_reservations() -> int:
+    return inventory.release_expired()
@@ -1,11 +1,43 @@
 from celery import shared_task
-from time import sleep
+from bson import ObjectId
+from flask import current_app
+from backend.blueprints.orders.models import Order
+from backend.blueprints.auth.models import User
+from backend.notifications.pipeline import pipeline_from_app
 
 # Using shared_task decorator integrates with the global Celery instance
 @shared_task(ignore_result=False)
 def send_order_notification(order_id) -> str:
-    # Simulate a long-running task, e.g., sending an email or SMS
-    print(f"Starting order notification for order: {order_id}")
-    sleep(5)  # Simulate delay
-    print(f"Notification sent for order: {order_id}")
-    return f"Notification sent for order {order_id}"
\ No newline at end of file
+    # Single-order entry point, kept for messages queued before batching
+    send_order_notifications([order_id])
+    return f"Notification sent for order {order_id}"
+
+# Batched: one task per batch of orders, coalesced by the outbox dispatcher
+@shared_task(ignore_result=False)
+def send_order_notifications(order_ids) -> dict:
+    # two queries per batch resolve every recipient
+    orders = Order._get_collection().find(
+        {"_id": {"$in": [ObjectId(order_id) for order_id in order_ids]}}, {"user_id": 1}
+    )
+    user_ids = {str(order["_id"]): order["user_id"] for order in orders}
+    emails = {
+        str(user["_id"]): user["email"]
+        for user in User._get_collection().find(
+            {"_id": {"$in": [ObjectId(user_id) for user_id in set(user_ids.values())]}}, {"email": 1}
+        )
+    }
+
+    notifications = [
+        {
+            "order_id": order_id,
+            "to": emails.get(user_ids.get(order_id)),
+            "subject": "Order placed",
+            "body": f"Your order {order_id} has been placed successfully."
+        }
+        for order_id in order_ids
+    ]
+    sent, failed = pipeline_from_app(current_app).send(notifications)
+    return {
+        "sent": [n["order_id"] for n in sent],
+        "failed": [n["order_id"] for n in failed]
+    }
@@ -0,0 +1,9 @@
+from celery import shared_task
+from backend.blueprints.orders import outbox
+
+
+# Turn pending outbox events into Celery tasks (schedule with celery beat;
+# create_order also triggers it right after a checkout commits)
+@shared_task(ignore_result=False)
+def dispatch_outbox(limit=None) -> int:
+    return outbox.dispatch(limit=limit)
@@ -0,0 +1,40 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytz
+
+
+# Request validation and parsing
+# (shared by the sync and async routes)
+def is_int(value):
+    # JSON true/false arrive as bools, which are ints in Python
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_time(value):
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed.replace(tzinfo=pytz.utc) if parsed.tzinfo is None else parsed
+
+
+def validate_cart_operation(operation):
+    if not isinstance(operation, dict):
+        return "Operation must be an object"
+    if operation.get('op') not in ('add', 'set', 'remove'):
+        return "op must be one of add, set, remove"
+    if not operation.get('product_id'):
+        return "Product ID is required"
+    if operation.get('sku') is not None and not isinstance(operation['sku'], str):
+        return "SKU must be a string"
+    quantity = operation.setdefault('quantity', 1 if operation['op'] == 'add' else None)
+    if operation['op'] == 'add' and (not is_int(quantity) or quantity <= 0):
+        return "Quantity must be a positive integer"
+    if operation['op'] == 'set' and not is_int(quantity):
+        return "Quantity must be an integer"
+    if operation.get('price') is not None:
+        try:
+            Decimal(str(operation['price']))
+        except Exception:
+            return "Invalid price format"
+    return None
@@ -0,0 +1,162 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from . import baseline
+from .client import FlaskClient, HttpClient
+from .config import DEFAULT_MONGO_URI, make_config, create_benchmark_app
+from .runner import run_scenario
+from .scenarios import SCENARIOS
+from .seed import SeedData, seed
+
+# python -m benchmarks [scenario ...] [options], see README.md (Benchmarks)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Load-test the API with realistic mixes.")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"scenarios to run, in order (default: all): {', '.join(SCENARIOS)}")
+
+    target = parser.add_argument_group("target")
+    target.add_argument("--backend", choices=("mongomock", "mongodb"), default="mongomock",
+                        help="in-process mongomock, or a MongoDB server at --mongo-uri")
+    target.add_argument("--mongo-uri", default=DEFAULT_MONGO_URI,
+                        help="benchmark database (its name must contain 'bench'; it is dropped when seeding)")
+    target.add_argument("--no-transactions", action="store_true",
+                        help="place orders without a transaction (by default, used when the server supports them)")
+    target.add_argument("--redis-url", help="use Redis for the caches and pub/sub instead of in-process ones")
+    target.add_argument("--no-cache", action="store_true",
+                        help="disable the shared cache (product pages, totals), so reads measure the database")
+    target.add_argument("--url", help="drive a running server (e.g. http://localhost:5005) instead of the app "
+                                      "in process; it must use the same --mongo-uri")
+
+    data = parser.add_argument_group("data")
+    data.add_argument("--no-seed", action="store_true", help="reuse the data of an earlier run")
+    data.add_argument("--products", type=int, default=10_000)
+    data.add_argument("--variants", type=int, default=3, help="variants (SKUs) per product")
+    data.add_argument("--users", type=int, default=200)
+    data.add_argument("--orders", type=int, default=20_000)
+    data.add_argument("--coupons", type=int, default=20)
+    data.add_argument("--scarce-stock", type=int, default=100, help="stock of the SKU in stock_contention")
+    data.add_argument("--limited-redemptions", type=int, default=100, help="redemptions of the coupon in coupon_contention")
+    data.add_argument("--seed", type=int, default=0, help="random seed for the data and the operation mix")
+
+    load = parser.add_argument_group("load")
+    load.add_argument("--concurrency", type=int, default=8, help="virtual users (threads)")
+    load.add_argument("--duration", type=float, default=20, help="measured seconds per scenario")
+    load.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before that")
+
+    results = parser.add_argument_group("results")
+    results.add_argument("--output", help="write every result to this JSON file")
+    results.add_argument("--save-baseline", metavar="PATH", help="record the results as the new baseline")
+    results.add_argument("--compare", metavar="PATH", help="compare against a baseline; exit 1 on regression")
+    results.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, as a fraction")
+    results.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore latency changes below this")
+
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    if args.url and args.backend == "mongomock":
+        parser.error("--url needs --backend mongodb, so the server and the seeding share a database")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = make_config(
+        args.backend, args.mongo_uri, args.redis_url, transactions=False if args.no_transactions else None, cache=not args.no_cache
+    )
+    app = create_benchmark_app(config)
+
+    with app.app_context():
+        if not args.no_seed:
+            counts = seed(
+                products=args.products, users=args.users, orders=args.orders, coupons=args.coupons,
+                variants=args.variants, scarce_stock=args.scarce_stock,
+                limited_redemptions=args.limited_redemptions, seed=args.seed
+            )
+            print("seeded " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+        data = SeedData.load()
+
+        client = HttpClient(args.url) if args.url else FlaskClient(app)
+        settings = {
+            "backend": args.backend,
+            "cache": not args.no_cache,
+            "target": args.url or "in-process",
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "products": args.products,
+            "users": args.users,
+            "orders": args.orders,
+            "seed": args.seed,
+        }
+        expected = baseline.load(args.compare)["scenarios"] if args.compare else {}
+
+        results, failed = {}, False
+        for name in args.scenarios or list(SCENARIOS):
+            print(f"\n== {name}: {SCENARIOS[name].description}")
+            if not SCENARIOS[name].operations_for(args.backend):
+                print("   skipped: needs --backend mongodb")
+                continue
+            result = run_scenario(
+                client, data, SCENARIOS[name], backend=args.backend, concurrency=args.concurrency,
+                duration=args.duration, warmup=args.warmup, seed=args.seed
+            )
+            results[name] = result
+            print_result(result)
+
+            if args.save_baseline:
+                baseline.save(args.save_baseline, name, settings, result)
+            if name in expected:
+                failed |= report_comparison(expected[name], settings, result, args)
+            elif args.compare:
+                print(f"   (no baseline for {name})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "settings": settings, "results": results}, f, indent=2)
+            f.write("\n")
+    return 1 if failed else 0
+
+
+def print_result(result):
+    print(f"   {'operation':32} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+    rows = list(result["operations"].items()) + [("(total)", result["totals"])]
+    for name, stats in rows:
+        print(
+            f"   {name:32} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput']:>9} "
+            f"{_value(stats['p50']):>9} {_value(stats['p90']):>9} {_value(stats['p99']):>9}"
+        )
+
+
+def report_comparison(expected, settings, result, args):
+    if expected["settings"] != settings:
+        print(f"   warning: baseline settings differ: {expected['settings']}")
+    regressions = baseline.compare(
+        expected["result"], result, tolerance=args.tolerance, min_delta_ms=args.min_delta_ms
+    )
+    for name, metric, old, new in regressions:
+        print(f"   REGRESSION {name} {metric}: {old} -> {new}")
+    if not regressions:
+        print("   no regressions against the baseline")
+    return bool(regressions)
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "commit": commit}
+
+
+def _value(value):
+    return "-" if value is None else value
+
+
+if __name__ == "__main__":
+    sys.exit(main())
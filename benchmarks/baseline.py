@@ -0,0 +1,50 @@
+import json
+import os
+
+# Baselines
+# ---------
+# A baseline file holds the last accepted result of each scenario:
+#   {"version": 1, "scenarios": {"browse": {"settings": {...}, "result": {...}}}}
+# A comparison run fails when, against it, an operation's p50 or p99 got
+# slower by more than `tolerance` (and by more than `min_delta_ms`, so
+# sub-millisecond jitter is ignored), its error rate went up, or the
+# scenario's total throughput dropped by more than `tolerance`. Operations
+# with fewer than `min_requests` samples on either side are not judged.
+VERSION = 1
+
+
+def load(path):
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get("version") != VERSION:
+        raise ValueError(f"{path}: unsupported baseline version {baseline.get('version')}")
+    return baseline
+
+
+def save(path, scenario, settings, result):
+    # adds or replaces one scenario, keeping the others
+    baseline = load(path) if os.path.exists(path) else {"version": VERSION, "scenarios": {}}
+    baseline["scenarios"][scenario] = {"settings": settings, "result": result}
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(expected, actual, tolerance=0.2, min_delta_ms=2.0, min_requests=50):
+    # -> [(operation, metric, baseline value, new value)] of regressions
+    regressions = []
+
+    old, new = expected["totals"], actual["totals"]
+    if new["throughput"] < old["throughput"] * (1 - tolerance):
+        regressions.append(("(total)", "throughput", old["throughput"], new["throughput"]))
+
+    for name, old in expected["operations"].items():
+        new = actual["operations"].get(name)
+        if new is None or min(old["requests"], new["requests"]) < min_requests:
+            continue
+        for metric in ("p50", "p99"):
+            if new[metric] > old[metric] * (1 + tolerance) and new[metric] - old[metric] > min_delta_ms:
+                regressions.append((name, metric, old[metric], new[metric]))
+        if new["error_rate"] > old["error_rate"] + 0.01:
+            regressions.append((name, "error_rate", old["error_rate"], new["error_rate"]))
+    return regressions
@@ -0,0 +1,172 @@
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import monitoring
+from backend.blueprints.auth.models import User
+from backend.blueprints.cart.models import Cart
+from backend.blueprints.products import cache as product_cache
+from backend.blueprints.products.models import Product
+from .client import FlaskClient
+from .config import DEFAULT_MONGO_URI, make_config, create_benchmark_app
+from .runner import Recorder, Session
+from .seed import SeedData, seed
+
+# Concurrency checks
+# ------------------
+# python -m benchmarks.checks [check ...] [--backend ...]
+# Correctness under concurrency rather than speed: each check releases
+# `--requests` concurrent requests together through a barrier and asserts on
+# the outcome. Prints one line per check; exits 1 if any check fails, so it
+# can run in CI.
+
+
+def burst(requests, send):
+    # -> Counter of the statuses of `requests` concurrent send(i) calls
+    barrier = threading.Barrier(requests)
+
+    def run(i):
+        barrier.wait()
+        status, _ = send(i)
+        return status
+
+    with ThreadPoolExecutor(requests) as pool:
+        return Counter(pool.map(run, range(requests)))
+
+
+class QueryCounter(monitoring.CommandListener):
+    # Counts the find commands sent for one collection, from pymongo's command
+    # monitoring; registered globally, so before the app creates its clients.
+    # mongomock sends no command events, so there its find() calls are counted.
+    def __init__(self, collection):
+        self.collection = collection
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def install(self, backend):
+        if backend == "mongodb":
+            monitoring.register(self)
+            return
+        import mongomock
+        find, counter = mongomock.collection.Collection.find, self
+
+        def counted_find(collection, *args, **kwargs):
+            if collection.name == counter.collection:
+                counter.add()
+            return find(collection, *args, **kwargs)
+        mongomock.collection.Collection.find = counted_find
+
+    def add(self):
+        with self._lock:
+            self.count += 1
+
+    def started(self, event):
+        if event.command_name == "find" and event.command.get("find") == self.collection:
+            self.add()
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+product_queries = QueryCounter(Product._get_collection_name())
+
+
+def parallel_cart_adds(app, client, data, requests):
+    # one user adds the same product from `requests` requests at once: every
+    # add must land exactly once on a single cart line
+    session = Session(client, data, Recorder(), None, data.customers[0])
+    session.login(record=False)
+    user_id = str(User.objects(email=session.email).only("id").first().pk)
+    Cart.objects(user_id=user_id).delete()
+    product_id, _ = data.products[0]
+
+    statuses = burst(requests, lambda _: session.call(
+        "cart.add_item", "POST", "/cart/add_item", json={"product_id": product_id, "quantity": 1}, record=False
+    ))
+    cart = Cart.objects(user_id=user_id).first()
+    lines = [item for item in cart.items if item.product_id == product_id] if cart else []
+    quantity = sum(item.quantity for item in lines)
+    ok = statuses == Counter({200: requests}) and len(lines) == 1 and quantity == requests
+    return ok, f"statuses {dict(statuses)}, {len(lines)} cart line(s), quantity {quantity}"
+
+
+def cache_stampede(app, client, data, requests):
+    # `requests` concurrent reads of one product page, and then of one catalog
+    # page, that are not cached yet must query the products collection once
+    # each. After an invalidation the cache warmer must reload both pages with
+    # one query each, so the next reads query nothing.
+    product_id, _ = data.products[0]
+    product_cache.invalidate_all()
+    pages = [
+        f"/products/{product_id}",
+        # a page size nothing else asks for, so the page is not cached
+        "/products/all_products?per_page=17",
+    ]
+
+    ok, details = True, []
+    for path in pages:
+        queries = product_queries.count
+        statuses = burst(requests, lambda _: client.request("GET", path))
+        queries = product_queries.count - queries
+        ok &= statuses == Counter({200: requests}) and queries == 1
+        details.append(f"{path}: statuses {dict(statuses)}, {queries} quer{'y' if queries == 1 else 'ies'}")
+
+    queries = product_queries.count
+    product_cache.invalidate_product(product_id)
+    time.sleep(app.config["PRODUCT_CACHE_WARM_DELAY"] + 1)
+    warmed = product_queries.count - queries
+    for path in pages:
+        client.request("GET", path)
+    after = product_queries.count - queries - warmed
+    ok &= warmed == len(pages) and after == 0
+    details.append(f"after invalidation the warmer made {warmed} queries, the next reads {after}")
+    return ok, "; ".join(details)
+
+
+CHECKS = {
+    "parallel_cart_adds": parallel_cart_adds,
+    "cache_stampede": cache_stampede,
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.checks",
+                                     description="Check correctness under concurrent requests.")
+    parser.add_argument("checks", nargs="*", metavar="check", help=f"checks to run (default: all): {', '.join(CHECKS)}")
+    parser.add_argument("--requests", type=int, default=500, help="concurrent requests per check")
+    parser.add_argument("--backend", choices=("mongomock", "mongodb"), default="mongomock")
+    parser.add_argument("--mongo-uri", default=DEFAULT_MONGO_URI,
+                        help="benchmark database (its name must contain 'bench'; it is dropped when seeding)")
+    parser.add_argument("--redis-url", help="use Redis for the caches instead of in-process ones")
+    parser.add_argument("--products", type=int, default=1000)
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown check(s): {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    product_queries.install(args.backend)
+    app = create_benchmark_app(make_config(args.backend, args.mongo_uri, args.redis_url))
+    client = FlaskClient(app)
+
+    failed = False
+    with app.app_context():
+        seed(products=args.products, users=2, orders=0, coupons=0)
+        data = SeedData.load()
+        for name in args.checks or list(CHECKS):
+            ok, details = CHECKS[name](app, client, data, args.requests)
+            print(f"{'ok  ' if ok else 'FAIL'} {name}: {details}")
+            failed |= not ok
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import http.client
+import threading
+from json import dumps, loads
+from urllib.parse import urlparse
+
+# Benchmark clients
+# -----------------
+# Both return (status, parsed JSON body or None) and keep one connection per
+# thread:
+#   FlaskClient  drives the app in process through its WSGI test client, no
+#                server needed
+#   HttpClient   talks to a running server (run.py, gunicorn, or the async
+#                variant in run_async.py), keep-alive
+
+
+class FlaskClient:
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, json=None, token=None):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = client.open(path, method=method, json=json, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    def __init__(self, base_url, timeout=30):
+        url = urlparse(base_url)
+        self.scheme = url.scheme
+        self.netloc = url.netloc
+        self.prefix = url.path.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            connection = self._local.connection = cls(self.netloc, timeout=self.timeout)
+        return connection
+
+    def request(self, method, path, json=None, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        body = None
+        if json is not None:
+            body = dumps(json)
+            headers["Content-Type"] = "application/json"
+        connection = self._connection()
+        try:
+            connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            # the server closed the keep-alive connection; reconnect next time
+            connection.close()
+            self._local.connection = None
+            raise
+        try:
+            return response.status, loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
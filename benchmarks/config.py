@@ -0,0 +1,53 @@
+import functools
+from config import DevelopmentConfig
+from backend.app import create_app
+
+# Benchmark configuration
+# -----------------------
+# The app as it runs in production, minus what would distort the numbers or
+# needs outside services: rate limits are off, caches and pub/sub live in
+# process unless a Redis URL is given, and Celery queues into memory.
+DEFAULT_MONGO_URI = "mongodb://localhost:27017/ecommerce_bench"
+
+
+class BenchmarkConfig(DevelopmentConfig):
+    # every route is limited to a few requests per minute
+    RATELIMIT_ENABLED = False
+    RATELIMIT_STORAGE_URI = "memory://"
+    CACHE_TYPE = "SimpleCache"
+    CACHE_THRESHOLD = 1_000_000
+    PUBSUB_URL = "memory://benchmarks"
+    MONGO_URI = DEFAULT_MONGO_URI
+
+
+def make_config(backend="mongomock", mongo_uri=None, redis_url=None, transactions=None, cache=True):
+    # mongomock: in-process, no server needed; relative numbers only, and
+    #            without $text search or transactions
+    # mongodb:   a real server at mongo_uri (a replica set for transactions)
+    attrs = {"MONGO_URI": mongo_uri or DEFAULT_MONGO_URI}
+    if backend == "mongomock":
+        import mongomock
+
+        # both aliases (default and catalog) must see the same data
+        store = mongomock.store.ServerStore()
+        attrs["MONGO_CLIENT_CLASS"] = functools.partial(mongomock.MongoClient, _store=store)
+        attrs["MONGO_USE_TRANSACTIONS"] = False
+    elif backend == "mongodb":
+        attrs["MONGO_USE_TRANSACTIONS"] = transactions  # None: detected from the server
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
+
+    if redis_url:
+        attrs.update(CACHE_TYPE="RedisCache", CACHE_REDIS_URL=redis_url, PUBSUB_URL=redis_url)
+    if not cache:
+        attrs["CACHE_TYPE"] = "NullCache"
+    return type("BenchmarkConfig", (BenchmarkConfig,), attrs)
+
+
+def create_benchmark_app(config_class):
+    app = create_app(config_class)
+    # create_app points Celery at Redis; the order outbox nudge would block
+    # on a missing broker, so queue into memory instead (nothing consumes it)
+    app.extensions["celery"].conf.update(broker_url="memory://", result_backend="cache+memory://")
+    return app
+
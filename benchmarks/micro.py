@@ -0,0 +1,216 @@
+import argparse
+import sys
+import time
+import uuid
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from flask.json.provider import DefaultJSONProvider
+from backend.blueprints.cart.models import Cart, CartItem
+from backend.blueprints.coupons.models import Coupon
+from backend.blueprints.orders.models import Order
+from backend.blueprints.products.models import Product
+from backend.serialization import product_json, order_summary_json, cart_json, coupon_json
+from backend.notifications.pipeline import NotificationPipeline
+from backend.notifications.transports import FakeTransport
+from backend.tasks.notifications import send_order_notifications
+from .config import DEFAULT_MONGO_URI, make_config, create_benchmark_app
+from .seed import seed
+
+# Micro-benchmarks
+# ----------------
+# python -m benchmarks.micro [benchmark ...] [options]
+# Time one component in process, away from the HTTP stack, and print one row
+# per variant measured. See README.md (Benchmarks).
+
+
+# NOTIFICATIONS
+# Orders notified per second by one worker slot: the batched pipeline (one
+# send_order_notifications task per NOTIFICATION_BATCH_SIZE orders, sends
+# concurrent on asyncio) against the task it replaced, which slept 5 seconds
+# per order. The fake transport simulates each send's network latency.
+LEGACY_NOTIFICATION_SECONDS = 5
+
+
+def legacy_send_order_notification(order_id):
+    # what send_order_notification did before the pipeline
+    time.sleep(LEGACY_NOTIFICATION_SECONDS)
+
+
+def seeded(benchmark):
+    benchmark.seeded = True
+    return benchmark
+
+
+@seeded
+def notifications(app, args):
+    order_ids = [str(doc["_id"]) for doc in Order._get_collection().find({}, {"_id": 1}).limit(args.notifications)]
+    batch_size = app.config.get("NOTIFICATION_BATCH_SIZE", 50)
+    app.extensions["notification_pipeline"] = NotificationPipeline(
+        FakeTransport(latency=args.send_latency),
+        concurrency=app.config.get("NOTIFICATION_CONCURRENCY", 20)
+    )
+
+    started = time.perf_counter()
+    for i in range(0, len(order_ids), batch_size):
+        send_order_notifications(order_ids[i:i + batch_size])
+    elapsed = time.perf_counter() - started
+    rows = [("notifications.pipeline", len(order_ids) / elapsed, "orders/s per worker slot")]
+
+    if args.legacy_notifications:
+        started = time.perf_counter()
+        for order_id in order_ids[:args.legacy_notifications]:
+            legacy_send_order_notification(order_id)
+        elapsed = time.perf_counter() - started
+        rows.append(("notifications.legacy_sleep", args.legacy_notifications / elapsed, "orders/s per worker slot"))
+    return rows
+
+
+# RATE LIMITING
+# Time per limiter hit (Flask-Limiter's fixed window, as on every request) on
+# the in-process memory:// storage every worker used to have, against the
+# shared leased storage: at a low limit (leases of 1, so every hit reaches
+# the store) and a high one (most hits served from the local lease). Hits
+# rotate over --clients keys, like requests from that many IPs. The shared
+# store is the in-process fake unless --redis-url is given.
+def ratelimit(app, args):
+    storages = ["memory://", f"leased+memory://bench-{uuid.uuid4().hex}"]
+    if args.redis_url:
+        storages += [args.redis_url, "leased+" + args.redis_url]
+
+    rows, baseline = [], {}
+    for limit in ("5/minute", "1000/minute"):
+        for uri in storages:
+            storage = storage_from_string(uri)
+            storage.reset()
+            limiter = FixedWindowRateLimiter(storage)
+            item = parse(limit)
+            clients = [f"10.0.{i // 256}.{i % 256}" for i in range(args.clients)]
+
+            started = time.perf_counter()
+            for i in range(args.ratelimit_hits):
+                limiter.hit(item, "backend.blueprints.products.routes.read_product", clients[i % len(clients)])
+            micros = (time.perf_counter() - started) / args.ratelimit_hits * 1e6
+
+            scheme = uri.split("://")[0]
+            baseline.setdefault(limit, micros)
+            unit = f"us/hit, {micros - baseline[limit]:+.2f} us vs memory://"
+            if hasattr(storage, "store_calls"):
+                unit += f", {storage.store_calls / args.ratelimit_hits:.3f} store calls/hit"
+            rows.append((f"ratelimit.{scheme}.{limit}", micros, unit))
+            storage.reset()
+    return rows
+
+
+# SERIALIZATION
+# Time to read and encode one response body, per list endpoint: the model
+# path (MongoEngine documents, to_json, Flask's stdlib JSON provider)
+# against the raw path the endpoints use (as_pymongo documents, the
+# serializers in backend/serialization.py, the app's FastJSONProvider).
+@seeded
+def serialization(app, args):
+    user_id = Order._get_collection().find_one({}, {"user_id": 1})["user_id"]
+    product_ids = [str(doc["_id"]) for doc in Product._get_collection().find({}, {"_id": 1}).limit(20)]
+    Cart.objects(user_id=user_id).delete()
+    Cart(user_id=user_id, items=[
+        CartItem(product_id=product_id, sku=f"BENCH-{i:07d}-0", quantity=1, price="9.99")
+        for i, product_id in enumerate(product_ids)
+    ]).save()
+
+    def orders():
+        return Order.objects(user_id=user_id).order_by('-created_at').limit(20)
+
+    endpoints = {
+        "products.all_products": (
+            lambda: {"products": [p.to_json() for p in Product.objects.limit(args.page_size)]},
+            lambda: {"products": [product_json(p) for p in Product.objects.limit(args.page_size).as_pymongo()]},
+        ),
+        "orders.mine": (
+            lambda: {"orders": [o.to_json() for o in orders()]},
+            lambda: {"orders": [order_summary_json(o) for o in orders().only(*Order.SUMMARY_FIELDS).as_pymongo()]},
+        ),
+        "cart.details": (
+            lambda: Cart.objects(user_id=user_id).first().to_json(),
+            lambda: cart_json(Cart.objects(user_id=user_id).as_pymongo().first()),
+        ),
+        "coupons.all": (
+            lambda: {"coupons": [c.to_json() for c in Coupon.objects]},
+            lambda: {"coupons": [coupon_json(c) for c in Coupon.objects.as_pymongo()]},
+        ),
+    }
+    stdlib = DefaultJSONProvider(app)
+
+    rows = []
+    for name, (model, raw) in endpoints.items():
+        model_micros = _time_per_call(lambda: stdlib.dumps(model()), args.repeat)
+        raw_micros = _time_per_call(lambda: app.json.dumps(raw()), args.repeat)
+        rows.append((f"serialization.{name}.model", model_micros, "us/response"))
+        rows.append((f"serialization.{name}.raw", raw_micros, f"us/response, {model_micros / raw_micros:.1f}x faster"))
+    return rows
+
+
+def _time_per_call(call, repeat):
+    call()  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        call()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+BENCHMARKS = {
+    "notifications": notifications,
+    "ratelimit": ratelimit,
+    "serialization": serialization,
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.micro", description="Time single components.")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help=f"benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--backend", choices=("mongomock", "mongodb"), default="mongomock")
+    parser.add_argument("--mongo-uri", default=DEFAULT_MONGO_URI,
+                        help="benchmark database (its name must contain 'bench'; it is dropped when seeding)")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=5000)
+
+    group = parser.add_argument_group("notifications")
+    group.add_argument("--notifications", type=int, default=2000, help="orders to notify")
+    group.add_argument("--send-latency", type=float, default=0.05, help="simulated seconds per send")
+    group.add_argument("--legacy-notifications", type=int, default=1,
+                       help=f"orders for the old task ({LEGACY_NOTIFICATION_SECONDS}s each; 0 skips it)")
+
+    group = parser.add_argument_group("ratelimit")
+    group.add_argument("--ratelimit-hits", type=int, default=100_000)
+    group.add_argument("--clients", type=int, default=1000, help="distinct client IPs")
+    group.add_argument("--redis-url", help="also time redis:// and leased+redis:// storages on this server")
+
+    group = parser.add_argument_group("serialization")
+    group.add_argument("--page-size", type=int, default=100, help="products per listing page")
+    group.add_argument("--repeat", type=int, default=200, help="responses timed per endpoint")
+
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = create_benchmark_app(make_config(args.backend, args.mongo_uri))
+
+    names = args.benchmarks or list(BENCHMARKS)
+    with app.app_context():
+        if any(getattr(BENCHMARKS[name], "seeded", False) for name in names):
+            counts = seed(products=args.products, users=200, orders=args.orders, coupons=20)
+            print("seeded " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+        print(f"\n   {'benchmark':40} {'result':>12}")
+        for name in names:
+            for row, value, unit in BENCHMARKS[name](app, args):
+                print(f"   {row:40} {value:>12.2f} {unit}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
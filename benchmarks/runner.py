@@ -0,0 +1,152 @@
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from .seed import PASSWORD
+
+# Load generator
+# --------------
+# `concurrency` threads, each one virtual user (Session) with its own account
+# and random stream, pick operations by weight in a closed loop until the
+# time is up. Calls made during the warm-up are not recorded.
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # call name -> [seconds]
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.measure_from = math.inf
+        self._lock = threading.Lock()
+
+    def record(self, name, started, seconds, status, ok):
+        if started < self.measure_from:
+            return
+        with self._lock:
+            self.latencies[name].append(seconds)
+            self.statuses[name][str(status)] += 1
+            if not ok:
+                self.errors[name] += 1
+
+
+class Session:
+    def __init__(self, client, data, recorder, rng, email, admin_token=None, mongod=False):
+        self.client = client
+        self.data = data
+        self.recorder = recorder
+        self.rng = rng
+        self.email = email
+        self.admin_token = admin_token
+        self.mongod = mongod  # a real server rather than mongomock
+        self.access_token = None
+        self.refresh_token = None
+
+    def login(self, record=True):
+        status, body = self.call("auth.login", "POST", "/auth/login", auth=None, record=record, json={
+            "email": self.email, "password": PASSWORD
+        })
+        if status == 200:
+            self.access_token = body["tokens"]["access_token"]
+            self.refresh_token = body["tokens"]["refresh_token"]
+        return status
+
+    def call(self, name, method, path, json=None, auth="user", ok=None, record=True):
+        # auth: "user", "admin", "refresh" or None; ok: the statuses that
+        # count as success (any 2xx by default)
+        token = {"user": self.access_token, "admin": self.admin_token, "refresh": self.refresh_token}.get(auth)
+        started = time.perf_counter()
+        try:
+            status, body = self.client.request(method, path, json=json, token=token)
+        except Exception:
+            status, body = "exception", None
+        seconds = time.perf_counter() - started
+        succeeded = status in ok if ok else isinstance(status, int) and 200 <= status < 300
+        if record:
+            self.recorder.record(name, started, seconds, status, succeeded)
+        return status, body
+
+
+def run_scenario(client, data, scenario, backend="mongomock", concurrency=8, duration=20.0, warmup=3.0, seed=0):
+    operations = scenario.operations_for(backend)
+    weights = [weight for weight, _ in operations]
+    recorder = Recorder()
+
+    # log everyone in before the clock starts
+    admin_tokens = []
+    for email in data.admins:
+        admin = Session(client, data, recorder, None, email)
+        if admin.login(record=False) == 200:
+            admin_tokens.append(admin.access_token)
+    if not admin_tokens:
+        raise RuntimeError("No admin could log in; seed the benchmark database first")
+
+    sessions = [
+        Session(
+            client, data, recorder, random.Random(seed * 1000 + i),
+            data.customers[i % len(data.customers)], admin_tokens[i % len(admin_tokens)],
+            mongod=backend == "mongodb"
+        )
+        for i in range(concurrency)
+    ]
+    with ThreadPoolExecutor(concurrency) as pool:
+        statuses = list(pool.map(lambda session: session.login(record=False), sessions))
+    if any(status != 200 for status in statuses):
+        raise RuntimeError(f"Logins failed during setup: {Counter(statuses)}")
+
+    def loop(session):
+        while time.perf_counter() < deadline:
+            operation = session.rng.choices(operations, weights)[0][1]
+            operation(session)
+
+    start = time.perf_counter()
+    recorder.measure_from = start + warmup
+    deadline = recorder.measure_from + duration
+    with ThreadPoolExecutor(concurrency) as pool:
+        for future in [pool.submit(loop, session) for session in sessions]:
+            future.result()
+    # the last operations finish after the deadline
+    elapsed = time.perf_counter() - recorder.measure_from
+
+    return summarize(recorder, elapsed)
+
+
+def summarize(recorder, elapsed):
+    operations = {
+        name: _stats(latencies, recorder.errors[name], elapsed, dict(recorder.statuses[name]))
+        for name, latencies in sorted(recorder.latencies.items())
+    }
+    every = [seconds for latencies in recorder.latencies.values() for seconds in latencies]
+    totals = _stats(every, sum(recorder.errors.values()), elapsed)
+    return {"elapsed": round(elapsed, 3), "totals": totals, "operations": operations}
+
+
+def _stats(latencies, errors, elapsed, statuses=None):
+    latencies = sorted(latencies)
+    stats = {
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0,
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0,
+        # latencies in milliseconds
+        "mean": _ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50": _percentile(latencies, 0.50),
+        "p90": _percentile(latencies, 0.90),
+        "p99": _percentile(latencies, 0.99),
+        "max": _ms(latencies[-1]) if latencies else None,
+    }
+    if statuses is not None:
+        stats["statuses"] = statuses
+    return stats
+
+
+def _percentile(latencies, q):
+    # nearest rank
+    if not latencies:
+        return None
+    return _ms(latencies[max(0, math.ceil(q * len(latencies)) - 1)])
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
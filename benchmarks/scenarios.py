@@ -0,0 +1,300 @@
+import uuid
+from urllib.parse import quote
+from .seed import DEEP_PAGE_SIZE, LIMITED_COUPON, SCARCE_SKU
+
+# Operations
+# ----------
+# Each operation is one user action against the API, made of one or more
+# calls on a Session (see runner.py); every call is timed under its own name.
+# Operations marked needs_mongod use what mongomock lacks ($text search,
+# update pipelines, the bulk writes of stock reservations) and are left out
+# of mongomock runs; on mongomock
+# carts also get each product's first variant, as positional projections
+# (used to pick a SKU) are missing too.
+
+
+def needs_mongod(operation):
+    operation.needs_mongod = True
+    return operation
+
+
+# AUTH
+def login(session):
+    session.login()
+
+
+def protected(session):
+    session.call("auth.protected", "GET", "/auth/protected")
+
+
+def refresh(session):
+    status, body = session.call("auth.refresh", "GET", "/auth/refresh_access_token", auth="refresh")
+    if status == 200:
+        session.access_token, session.refresh_token = body["access_token"], body["refresh_token"]
+
+
+# PRODUCTS
+def list_products(session):
+    session.call("products.list", "GET", "/products/all_products?per_page=20")
+
+
+def list_category(session):
+    category = session.rng.choice(session.data.categories)
+    session.call("products.list_category", "GET", f"/products/all_products?per_page=20&category={category}")
+
+
+def list_next_pages(session):
+    # follow the cursor a few pages deep
+    status, body = session.call("products.list", "GET", "/products/all_products?per_page=20")
+    for _ in range(session.rng.randint(1, 3)):
+        if status != 200 or not body.get("next_cursor"):
+            return
+        status, body = session.call(
+            "products.list_next", "GET", f"/products/all_products?per_page=20&cursor={quote(body['next_cursor'])}"
+        )
+
+
+def first_page(session):
+    session.call("products.page_first", "GET", f"/products/all_products?page=1&per_page={DEEP_PAGE_SIZE}")
+
+
+def deep_page(session):
+    session.call("products.page_deep", "GET",
+                 f"/products/all_products?page={session.data.deep_page}&per_page={DEEP_PAGE_SIZE}")
+
+
+def first_cursor_page(session):
+    session.call("products.cursor_first", "GET", f"/products/all_products?mode=cursor&per_page={DEEP_PAGE_SIZE}")
+
+
+def deep_cursor_page(session):
+    if session.data.deep_cursor:
+        session.call("products.cursor_deep", "GET",
+                     f"/products/all_products?per_page={DEEP_PAGE_SIZE}&cursor={quote(session.data.deep_cursor)}")
+
+
+def read_product(session):
+    product_id, _ = session.data.pick_product(session.rng)
+    session.call("products.read", "GET", f"/products/{product_id}")
+
+
+@needs_mongod
+def search(session):
+    q = session.rng.choice(session.data.words)
+    session.call("products.search", "GET", f"/products/search?q={q}")
+
+
+@needs_mongod
+def search_category(session):
+    q = session.rng.choice(session.data.words)
+    category = session.rng.choice(session.data.categories)
+    session.call("products.search_category", "GET", f"/products/search?q={q}&category={category}")
+
+
+@needs_mongod
+def search_two_words(session):
+    q = " ".join(session.rng.sample(session.data.words, 2))
+    session.call("products.search_two_words", "GET", f"/products/search?q={quote(q)}&per_page=20")
+
+
+def autocomplete(session):
+    word = session.rng.choice(session.data.words)
+    prefix = word[:session.rng.randint(1, len(word))]
+    session.call("products.autocomplete", "GET", f"/products/autocomplete?q={prefix}")
+
+
+def by_sku(session):
+    skus = [session.rng.choice(skus) for _, skus in session.rng.sample(session.data.products, 5) if skus]
+    session.call("products.by_sku", "GET", f"/products/by_sku?sku={','.join(skus)}")
+
+
+def create_product(session):
+    sku = f"BENCH-NEW-{uuid.uuid4().hex[:12]}"
+    session.call("products.create", "POST", "/products/create_product", auth="admin", json={
+        "name": f"{session.rng.choice(session.data.words).title()} {sku}",
+        "category": session.rng.choice(session.data.categories),
+        "description": "created by the benchmark",
+        "variants": [{"sku": sku, "stock": 1000, "price": "19.99"}]
+    }, ok=(201,))
+    return sku
+
+
+def update_product(session):
+    product_id, _ = session.data.pick_product(session.rng)
+    session.call("products.update", "PUT", f"/products/update_product/{product_id}", auth="admin", json={
+        "description": f"updated by the benchmark {uuid.uuid4().hex[:8]}"
+    })
+
+
+def create_and_delete_product(session):
+    # only products the benchmark created itself are deleted
+    sku = create_product(session)
+    status, body = session.call("products.by_sku", "GET", f"/products/by_sku?sku={sku}")
+    if status == 200 and sku in body["variants"]:
+        product_id = body["variants"][sku]["product_id"]
+        session.call("products.delete", "DELETE", f"/products/delete_product/{product_id}", auth="admin")
+
+
+# CART
+def add_to_cart(session, product=None, quantity=1):
+    product_id, skus = product or session.data.pick_product(session.rng)
+    payload = {"product_id": product_id, "quantity": quantity}
+    if skus and session.mongod:
+        payload["sku"] = session.rng.choice(skus)
+    session.call("cart.add_item", "POST", "/cart/add_item", json=payload)
+    return product_id
+
+
+def cart_details(session):
+    session.call("cart.details", "GET", "/cart/details")
+
+
+def update_cart_item(session):
+    product_id = add_to_cart(session)
+    session.call("cart.update_item_quantity", "POST", "/cart/update_item_quantity", json={
+        "product_id": product_id, "quantity": session.rng.randint(1, 5)
+    })
+
+
+def remove_cart_item(session):
+    product_id = add_to_cart(session)
+    session.call("cart.remove_item", "POST", "/cart/remove_item", json={"product_id": product_id})
+
+
+@needs_mongod
+def cart_batch(session):
+    operations = [
+        {"op": "add", "product_id": session.data.pick_product(session.rng)[0], "quantity": 1}
+        for _ in range(session.rng.randint(2, 5))
+    ]
+    session.call("cart.batch", "POST", "/cart/batch", json={"operations": operations})
+
+
+# ORDERS
+@needs_mongod
+def checkout(session):
+    for _ in range(session.rng.randint(1, 3)):
+        add_to_cart(session)
+    payload = {}
+    if session.data.coupons and session.rng.random() < 0.3:
+        payload["coupon_code"] = session.rng.choice(session.data.coupons)
+    # 400: the coupon is not valid for this user's role
+    session.call("orders.create", "POST", "/orders/create", json=payload, ok=(201, 400))
+
+
+@needs_mongod
+def checkout_scarce(session):
+    # every session competes for the same few units of one SKU
+    product_id = add_to_cart(session, product=(session.data.scarce_product, [SCARCE_SKU]))
+    status, _ = session.call("orders.create_scarce", "POST", "/orders/create", json={}, ok=(201, 409))
+    if status != 201:
+        _empty_line(session, product_id)
+
+
+@needs_mongod
+def checkout_limited_coupon(session):
+    # every session competes for the same few coupon redemptions
+    product_id = add_to_cart(session)
+    status, _ = session.call("orders.create_limited_coupon", "POST", "/orders/create", json={
+        "coupon_code": LIMITED_COUPON
+    }, ok=(201, 409))
+    if status != 201:
+        _empty_line(session, product_id)
+
+
+def _empty_line(session, product_id):
+    # a failed checkout leaves the cart as it was; keep it from growing
+    session.call("cart.remove_item", "POST", "/cart/remove_item", json={"product_id": product_id})
+
+
+def order_history(session):
+    status, body = session.call("orders.mine", "GET", "/orders/mine?per_page=20")
+    if status == 200 and body["next_cursor"] and session.rng.random() < 0.5:
+        session.call("orders.mine_next", "GET", f"/orders/mine?per_page=20&cursor={quote(body['next_cursor'])}")
+    return body["orders"] if status == 200 else []
+
+
+def track_order(session):
+    orders = order_history(session)
+    if orders:
+        session.call("orders.track", "GET", f"/orders/{session.rng.choice(orders)['id']}")
+
+
+def daily_stats(session):
+    session.call("orders.daily", "GET", "/orders/daily", auth="admin")
+
+
+# COUPONS
+def my_coupons(session):
+    session.call("coupons.my_coupons", "GET", "/coupons/my_coupons")
+
+
+def all_coupons(session):
+    session.call("coupons.all", "GET", "/coupons/all", auth="admin")
+
+
+def create_coupon(session):
+    session.call("coupons.create", "POST", "/coupons/create", auth="admin", json={
+        "code": f"BENCH-NEW-{uuid.uuid4().hex[:12]}",
+        "discount_percent": session.rng.randint(5, 30),
+        "expiry": "2099-12-31T00:00:00",
+        "eligible_roles": ["customer"]
+    }, ok=(201,))
+
+
+def update_coupon(session):
+    if session.data.coupons:
+        code = session.rng.choice(session.data.coupons)
+        session.call("coupons.update", "PUT", f"/coupons/update/{code}", auth="admin", json={
+            "discount_percent": session.rng.randint(5, 30)
+        })
+
+
+class Scenario:
+    def __init__(self, name, description, operations):
+        self.name = name
+        self.description = description
+        self.operations = operations  # [(weight, operation)]
+
+    def operations_for(self, backend):
+        if backend == "mongodb":
+            return self.operations
+        return [(weight, op) for weight, op in self.operations if not getattr(op, "needs_mongod", False)]
+
+
+SCENARIOS = {s.name: s for s in [
+    Scenario("browse", "Catalog browsing: listings, product pages, search, autocomplete", [
+        (30, list_products), (10, list_category), (10, list_next_pages), (25, read_product),
+        (8, search), (10, autocomplete), (5, by_sku), (2, my_coupons)
+    ]),
+    Scenario("deep_pages", "Listing page 1 vs page 10,000, offset (skip) and cursor mode; run with --no-cache", [
+        (25, first_page), (25, deep_page), (25, first_cursor_page), (25, deep_cursor_page)
+    ]),
+    Scenario("search", "Text search (one word, two words, within a category) and autocomplete; run with --no-cache", [
+        (35, search), (20, search_two_words), (20, search_category), (25, autocomplete)
+    ]),
+    Scenario("checkout", "Shopping: cart mutations, checkout with and without coupons, order history", [
+        (15, read_product), (25, add_to_cart), (15, cart_details), (5, update_cart_item),
+        (5, remove_cart_item), (5, cart_batch), (20, checkout), (10, order_history)
+    ]),
+    Scenario("admin_write", "Admin write bursts (products, coupons) under catalog reads", [
+        (15, create_product), (15, update_product), (5, create_and_delete_product),
+        (5, create_coupon), (5, update_coupon), (5, all_coupons),
+        (25, list_products), (20, read_product), (5, autocomplete)
+    ]),
+    Scenario("auth", "Token checks on protected routes, refreshes and logins", [
+        (50, protected), (20, refresh), (10, login), (20, my_coupons)
+    ]),
+    Scenario("login_burst", "Logins only (password hashing pool)", [
+        (100, login)
+    ]),
+    Scenario("order_history", "Order history pages, order tracking and admin daily stats", [
+        (60, order_history), (30, track_order), (10, daily_stats)
+    ]),
+    Scenario("stock_contention", "Every session checks out the same low-stock SKU", [
+        (100, checkout_scarce)
+    ]),
+    Scenario("coupon_contention", "Every session redeems the same usage-limited coupon", [
+        (100, checkout_limited_coupon)
+    ]),
+]}
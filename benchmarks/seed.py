@@ -0,0 +1,216 @@
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+import pytz
+from bson import ObjectId
+from mongoengine import Document
+from mongoengine.base.common import _document_registry
+from mongoengine.connection import get_db
+from backend import db
+from backend.pagination import encode_cursor
+from backend.blueprints.auth.models import User
+from backend.blueprints.auth.hashing import passwords
+from backend.blueprints.products.models import Product, ProductVariant
+from backend.blueprints.orders.models import Order, OrderItem
+from backend.blueprints.coupons.models import Coupon
+
+# Benchmark data
+# --------------
+# Deterministic for a given seed, so two runs (or two branches) are measured
+# against the same catalog, users and order history. Everything is inserted
+# with insert_many in batches; every user shares one password hash.
+PASSWORD = "bench-password"
+BATCH_SIZE = 1000
+
+CATEGORIES = [
+    "Electronics", "Wearables", "Home", "Kitchen", "Outdoor",
+    "Books", "Toys", "Beauty", "Sports", "Office"
+]
+WORDS = [
+    "smart", "classic", "portable", "wireless", "organic", "compact", "deluxe", "ultra",
+    "watch", "lamp", "kettle", "backpack", "speaker", "blender", "jacket", "notebook",
+    "charger", "bottle", "headphones", "sneakers", "camera", "desk", "tent", "mixer"
+]
+
+# a product with little stock and a coupon with few redemptions, for the
+# contention scenarios
+SCARCE_SKU = "BENCH-SCARCE"
+LIMITED_COUPON = "BENCH-LIMITED"
+
+# the deep listing page of the deep_pages scenario (needs 200,000 products
+# to exist; smaller catalogs use their last page)
+DEEP_PAGE = 10_000
+DEEP_PAGE_SIZE = 20
+
+
+def reset():
+    # drop the benchmark database; refuses anything not named like one
+    database = get_db(db.DEFAULT)
+    if "bench" not in database.name:
+        raise RuntimeError(
+            f"Refusing to drop '{database.name}': the benchmark database name must contain 'bench'"
+        )
+    database.client.drop_database(database.name)
+    for document in _document_registry.values():
+        if issubclass(document, Document):
+            document._collection = None  # created again, with its indexes, on next use
+
+
+def seed(products=10_000, users=200, admins=2, orders=20_000, coupons=20,
+         variants=3, scarce_stock=100, limited_redemptions=100, seed=0):
+    rng = random.Random(seed)
+    now = datetime.now(pytz.utc)
+    reset()
+
+    # CATALOG
+    product_ids, prices = [], []
+
+    def product_docs():
+        for i in range(products):
+            name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}"
+            product_variants = []
+            for v in range(variants):
+                price = Decimal(rng.randrange(500, 50_000)) / 100
+                product_variants.append(ProductVariant(sku=f"BENCH-{i:07d}-{v}", stock=1_000_000, price=price))
+            product = Product(
+                id=ObjectId(), name=name, category=CATEGORIES[i % len(CATEGORIES)],
+                description=" ".join(rng.choice(WORDS) for _ in range(12)),
+                variants=product_variants, images=[f"https://img.example.com/{i}.jpg"]
+            )
+            product_ids.append(str(product.id))
+            prices.append(product_variants[0].price if product_variants else Decimal("0"))
+            yield product.to_mongo()
+
+        yield Product(
+            name="Limited edition", category=CATEGORIES[0], description="limited",
+            variants=[ProductVariant(sku=SCARCE_SKU, stock=scarce_stock, price=Decimal("99.00"))]
+        ).to_mongo()
+
+    _insert(Product, product_docs())
+
+    # USERS
+    password_hash = passwords.hash(PASSWORD)
+    customer_ids = []
+
+    def user_docs():
+        for i in range(users):
+            user = User(
+                id=ObjectId(), email=f"customer{i}@bench.example.com", password=password_hash,
+                role="prime_customer" if i % 10 == 0 else "customer"
+            )
+            customer_ids.append(str(user.id))
+            yield user.to_mongo()
+        for i in range(admins):
+            yield User(email=f"admin{i}@bench.example.com", password=password_hash, role="admin").to_mongo()
+
+    _insert(User, user_docs())
+
+    # COUPONS
+    def coupon_docs():
+        for i in range(coupons):
+            yield Coupon(
+                code=f"BENCH{i:03d}", discount_percent=rng.randrange(5, 30),
+                expiry=now + timedelta(days=365),
+                eligible_roles=rng.choice([["customer"], ["prime_customer"], ["customer", "prime_customer"]])
+            ).to_mongo()
+        yield Coupon(
+            code=LIMITED_COUPON, discount_percent=50, expiry=now + timedelta(days=365),
+            eligible_roles=["customer", "prime_customer"], max_redemptions=limited_redemptions
+        ).to_mongo()
+
+    _insert(Coupon, coupon_docs())
+
+    # ORDER HISTORY (spread over the last year)
+    def order_docs():
+        for _ in range(orders if product_ids and customer_ids else 0):
+            items = []
+            for _ in range(rng.randint(1, 3)):
+                index = rng.randrange(len(product_ids))
+                items.append(OrderItem(
+                    product_id=product_ids[index], sku=f"BENCH-{index:07d}-0",
+                    quantity=rng.randint(1, 3), price=prices[index]
+                ))
+            total = sum(item.price * item.quantity for item in items)
+            yield Order(
+                user_id=rng.choice(customer_ids), items=items,
+                total_amount=total, discount_applied=0, final_amount=total,
+                status=rng.choices(["Pending", "Shipped", "Delivered"], [1, 2, 7])[0],
+                created_at=now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+            ).to_mongo()
+
+    _insert(Order, order_docs())
+
+    return {
+        "products": products, "variants": products * variants, "users": users,
+        "admins": admins, "coupons": coupons, "orders": orders if customer_ids else 0
+    }
+
+
+def _insert(document, docs):
+    collection = document._get_collection()
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == BATCH_SIZE:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+
+# What the scenarios draw from, read back from the database, so a run can
+# also target a server whose database was seeded by an earlier invocation.
+class SeedData:
+    def __init__(self, products, scarce_product, customers, admins, coupons, product_count=None, deep_cursor=None):
+        self.products = products  # [(product id, [skus])]
+        self.product_count = product_count or len(products)
+        self.deep_cursor = deep_cursor  # cursor mode, the page at DEEP_PAGE
+        self.scarce_product = scarce_product
+        self.customers = customers
+        self.admins = admins
+        self.coupons = coupons
+        self.categories = CATEGORIES
+        self.words = WORDS
+        # most traffic goes to a fifth of the catalog
+        self.hot_products = products[:max(1, len(products) // 5)]
+
+    @classmethod
+    def load(cls, sample=10_000):
+        products = [
+            (str(doc["_id"]), [v["sku"] for v in doc.get("variants", [])])
+            for doc in Product._get_collection().find(
+                {"variants.sku": {"$ne": SCARCE_SKU}}, {"variants.sku": 1}
+            ).limit(sample)
+        ]
+        if not products:
+            raise RuntimeError("No products found; seed the benchmark database first")
+        scarce = Product._get_collection().find_one({"variants.sku": SCARCE_SKU}, {"_id": 1})
+        users = User._get_collection().find({"email": {"$regex": "@bench\\.example\\.com$"}}, {"email": 1, "role": 1})
+        customers, admins = [], []
+        for user in users:
+            (admins if user["role"] == "admin" else customers).append(user["email"])
+        coupons = [doc["code"] for doc in Coupon._get_collection().find({"code": {"$ne": LIMITED_COUPON}}, {"code": 1})]
+        count = Product._get_collection().estimated_document_count()
+        return cls(
+            products, str(scarce["_id"]) if scarce else None, customers, admins, coupons,
+            product_count=count, deep_cursor=cls._deep_cursor(count)
+        )
+
+    @staticmethod
+    def _deep_cursor(count):
+        # the _id just before the first product of the deep page
+        position = (min(DEEP_PAGE, count // DEEP_PAGE_SIZE) - 1) * DEEP_PAGE_SIZE
+        if position <= 0:
+            return None
+        doc = next(Product._get_collection().find({}, {"_id": 1}).sort("_id", 1).skip(position - 1).limit(1), None)
+        return encode_cursor(doc["_id"]) if doc else None
+
+    @property
+    def deep_page(self):
+        # page DEEP_PAGE of DEEP_PAGE_SIZE, or the last full page of a smaller catalog
+        return max(1, min(DEEP_PAGE, self.product_count // DEEP_PAGE_SIZE))
+
+    def pick_product(self, rng):
+        if rng.random() < 0.8:
+            return rng.choice(self.hot_products)
+        return rng.choice(self.products)
@@ -0,0 +1,4 @@
+from backend.async_app import create_async_app
+
+# async serving mode: `hypercorn run_async:app`
+app = create_async_app()
\ No newline at end of file
@@ -0,0 +1,44 @@
+import uuid
+import pytest
+from flask_jwt_extended import create_access_token
+from backend.blueprints.auth.models import User
+from backend.blueprints.auth.principal import user_claims
+from backend.blueprints.products.models import Product, ProductVariant
+from benchmarks.config import make_config, create_benchmark_app
+
+
+@pytest.fixture(scope="session")
+def app():
+    # mongomock, in-process cache and pub/sub, no rate limits (see benchmarks/config.py)
+    return create_benchmark_app(make_config("mongomock"))
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def customer(app_context):
+    # -> (user id, Authorization header) for a fresh customer; the password
+    # is never checked, so it is stored unhashed
+    user = User(email=f"{uuid.uuid4().hex[:12]}@example.com", password="unused", role="customer").save()
+    token = create_access_token(identity=str(user.pk), additional_claims=user_claims(user))
+    return str(user.pk), {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def make_product(app_context):
+    def make(variants=1, stock=100):
+        suffix = uuid.uuid4().hex[:8]
+        return Product(
+            name=f"Mug {suffix}", category="Home",
+            variants=[ProductVariant(sku=f"SKU-{suffix}-{i}", price="9.99", stock=stock) for i in range(variants)]
+        ).save()
+    return make
@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import DuplicateKeyError
+from backend.blueprints.cart.models import Cart
+
+
+def test_parallel_adds_land_on_one_line(app, customer, make_product):
+    user_id, headers = customer
+    product = make_product()
+    requests = 50
+    barrier = threading.Barrier(requests)
+
+    def add(_):
+        barrier.wait()
+        return app.test_client().post(
+            "/cart/add_item", json={"product_id": str(product.pk), "quantity": 1}, headers=headers
+        ).status_code
+
+    with ThreadPoolExecutor(requests) as pool:
+        statuses = list(pool.map(add, range(requests)))
+
+    assert statuses == [200] * requests
+    cart = Cart.objects(user_id=user_id).first()
+    assert [(item.sku, item.quantity) for item in cart.items] == [(product.variants[0].sku, requests)]
+
+
+def test_add_keeps_variants_apart(customer, make_product):
+    # on the model: choosing a variant by SKU uses a positional projection,
+    # which mongomock does not implement
+    user_id, _ = customer
+    product = make_product(variants=2)
+    for variant in (product.variants[0], product.variants[1], product.variants[0]):
+        Cart.add_item(user_id, str(product.pk), 2, variant.price, sku=variant.sku)
+
+    cart = Cart.objects(user_id=user_id).first()
+    assert {item.sku: item.quantity for item in cart.items} == {product.variants[0].sku: 4, product.variants[1].sku: 2}
+
+
+def test_remove_pulls_only_that_line(client, customer, make_product):
+    user_id, headers = customer
+    product = make_product(variants=2)
+    for variant in product.variants:
+        Cart.add_item(user_id, str(product.pk), 1, variant.price, sku=variant.sku)
+
+    response = client.post(
+        "/cart/remove_item", json={"product_id": str(product.pk), "sku": product.variants[0].sku}, headers=headers
+    )
+    assert response.status_code == 200
+    assert [item.sku for item in Cart.objects(user_id=user_id).first().items] == [product.variants[1].sku]
+
+
+def test_add_conflict_returns_409(client, customer, make_product, monkeypatch):
+    # the $inc never matches and the $push always loses the race
+    def conflicting(query, update, **kwargs):
+        if kwargs.get("upsert"):
+            raise DuplicateKeyError("E11000")
+        return None
+
+    monkeypatch.setattr(Cart, "_find_one_and_update", staticmethod(conflicting))
+    _, headers = customer
+    product = make_product()
+    response = client.post("/cart/add_item", json={"product_id": str(product.pk), "quantity": 1}, headers=headers)
+    assert response.status_code == 409
+    assert "retry" in response.get_json()["message"]
+
+
+def test_quantity_must_be_an_integer(client, customer, make_product):
+    _, headers = customer
+    product = make_product()
+    for quantity in (True, 1.5, "2", 0):
+        response = client.post(
+            "/cart/add_item", json={"product_id": str(product.pk), "quantity": quantity}, headers=headers
+        )
+        assert response.status_code == 400
@@ -0,0 +1,160 @@
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from datetime import datetime, timedelta
+from backend.blueprints.cart.models import Cart
+from backend.blueprints.coupons.models import Coupon
+from backend.blueprints.coupons.table import active_coupons
+from backend.blueprints.orders import inventory
+from backend.blueprints.orders.models import Order, IdempotencyKey
+
+
+@pytest.fixture
+def stock(monkeypatch):
+    # Reservations are bulk writes, whose UpdateOne mongomock rejects (it
+    # predates pymongo's `sort` option), so they are recorded here instead.
+    # -> the list of (action, reservation) calls
+    calls = []
+
+    def record(action, result=True):
+        def call(reservation, *args, **kwargs):
+            calls.append((action, reservation))
+            return result
+        return call
+
+    monkeypatch.setattr(inventory, "reserve", lambda user_id, lines: ObjectId())
+    monkeypatch.setattr(inventory, "cart_lines", lambda items: [])
+    for action in ("commit", "release", "restock"):
+        monkeypatch.setattr(inventory, action, record(action))
+    return calls
+
+
+def fill_cart(user_id, product, quantity=2):
+    variant = product.variants[0]
+    Cart.add_item(user_id, str(product.pk), quantity, variant.price, sku=variant.sku)
+
+
+def test_checkout_clears_the_cart(client, customer, make_product, stock):
+    user_id, headers = customer
+    fill_cart(user_id, make_product())
+
+    response = client.post("/orders/create", json={}, headers=headers)
+
+    assert response.status_code == 201
+    assert Cart.objects(user_id=user_id).first().items == []
+    assert [action for action, _ in stock] == ["commit"]
+
+
+def test_line_added_during_checkout_fails_it(client, customer, make_product, stock, monkeypatch):
+    user_id, headers = customer
+    product, other = make_product(), make_product()
+    fill_cart(user_id, product)
+    commit = inventory.commit
+
+    def commit_then_add(reservation, session=None):
+        # another request adds a line between reading the cart and clearing it
+        fill_cart(user_id, other, quantity=1)
+        return commit(reservation, session=session)
+
+    monkeypatch.setattr(inventory, "commit", commit_then_add)
+    response = client.post("/orders/create", json={}, headers=headers)
+
+    assert response.status_code == 409
+    assert "cart changed" in response.get_json()["message"]
+    items = Cart.objects(user_id=user_id).first().items
+    assert sorted(item.product_id for item in items) == sorted([str(product.pk), str(other.pk)])
+    assert [action for action, _ in stock] == ["commit", "release"]
+    assert not Order.objects(user_id=user_id).count()
+
+
+def test_failed_order_insert_restores_the_cart(client, customer, make_product, stock, monkeypatch):
+    user_id, headers = customer
+    fill_cart(user_id, make_product())
+    orders = Order._get_collection()
+
+    class FailingInserts:
+        def __getattr__(self, name):
+            return getattr(orders, name)
+
+        def insert_one(self, *args, **kwargs):
+            raise OperationFailure("insert failed")
+
+    monkeypatch.setattr(Order, "_get_collection", classmethod(lambda cls: FailingInserts()))
+    response = client.post("/orders/create", json={}, headers=headers)
+
+    assert response.status_code == 500
+    assert [item.quantity for item in Cart.objects(user_id=user_id).first().items] == [2]
+
+
+def test_idempotent_retry_returns_the_first_order(client, customer, make_product, stock):
+    user_id, headers = customer
+    fill_cart(user_id, make_product())
+    headers = {**headers, "Idempotency-Key": "retry-1"}
+
+    first = client.post("/orders/create", json={}, headers=headers)
+    retry = client.post("/orders/create", json={}, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert first.get_json()["order"]["id"] == retry.get_json()["order"]["id"]
+    assert Order.objects(user_id=user_id).count() == 1
+
+
+def test_retry_while_the_first_order_is_in_progress(client, customer, make_product, stock):
+    user_id, headers = customer
+    fill_cart(user_id, make_product())
+    # the first request has written its key but not its order yet
+    IdempotencyKey(user_id=user_id, key="retry-2", order_id=str(ObjectId())).save()
+
+    response = client.post("/orders/create", json={}, headers={**headers, "Idempotency-Key": "retry-2"})
+
+    assert response.status_code == 409
+    assert "in progress" in response.get_json()["message"]
+    assert len(Cart.objects(user_id=user_id).first().items) == 1
+    assert [action for action, _ in stock] == ["release"]
+
+
+def coupon(code, **fields):
+    created = Coupon(code=code, discount_percent=10, expiry=datetime.utcnow() + timedelta(days=1), **fields).save()
+    active_coupons.invalidate()
+    return created
+
+
+def test_checkout_applies_a_coupon(client, customer, make_product, stock):
+    user_id, headers = customer
+    fill_cart(user_id, make_product())
+    coupon(f"TEN-{user_id}")
+
+    response = client.post("/orders/create", json={"coupon_code": f"TEN-{user_id}"}, headers=headers)
+
+    assert response.status_code == 201
+    assert response.get_json()["order"]["discount_applied"] == 2.0
+
+
+def test_coupon_removed_on_the_primary_is_refused(client, customer, make_product, stock):
+    user_id, headers = customer
+    fill_cart(user_id, make_product())
+    code = f"GONE-{user_id}"
+    coupon(code)
+    assert active_coupons.get(code) is not None
+    # deleted without a table invalidation (e.g. the pub/sub message was lost)
+    Coupon._get_collection().delete_one({"code": code})
+
+    response = client.post("/orders/create", json={"coupon_code": code}, headers=headers)
+
+    assert response.status_code == 409
+    assert not Order.objects(user_id=user_id).count()
+    assert len(Cart.objects(user_id=user_id).first().items) == 1
+
+
+def test_coupon_edited_on_the_primary_is_refused(client, customer, make_product, stock):
+    user_id, headers = customer
+    fill_cart(user_id, make_product())
+    code = f"EDIT-{user_id}"
+    coupon(code)
+    assert active_coupons.get(code).discount_percent == 10
+    Coupon._get_collection().update_one({"code": code}, {"$set": {"discount_percent": 50}})
+
+    response = client.post("/orders/create", json={"coupon_code": code}, headers=headers)
+
+    assert response.status_code == 409
+    assert "Coupon" in response.get_json()["message"]
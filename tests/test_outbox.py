@@ -0,0 +1,29 @@
+from datetime import timedelta
+from bson import ObjectId
+from backend.blueprints.orders import outbox
+from backend.blueprints.orders.models import OutboxEvent
+
+
+def pending_events(count):
+    OutboxEvent._get_collection().delete_many({})
+    for _ in range(count):
+        OutboxEvent(topic="order_created", payload={"order_id": str(ObjectId())}).save()
+
+
+def test_dispatch_stops_at_the_configured_limit(app, app_context, monkeypatch):
+    sent = []
+    monkeypatch.setitem(outbox.HANDLERS, "order_created", sent.extend)
+    monkeypatch.setitem(app.config, "OUTBOX_DISPATCH_LIMIT", 30)
+    pending_events(100)
+
+    assert outbox.dispatch(batch_size=20, window=timedelta(0)) == 30
+    assert len(sent) == 30
+    assert OutboxEvent.objects(status="pending").count() == 70
+
+
+def test_an_explicit_limit_wins(app, app_context, monkeypatch):
+    monkeypatch.setitem(outbox.HANDLERS, "order_created", lambda payloads: None)
+    monkeypatch.setitem(app.config, "OUTBOX_DISPATCH_LIMIT", 30)
+    pending_events(100)
+
+    assert outbox.dispatch(limit=100, window=timedelta(0)) == 100
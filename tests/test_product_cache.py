@@ -0,0 +1,28 @@
+import mongomock
+from collections import Counter
+from backend.blueprints.products import cache as product_cache
+from backend.blueprints.products.models import Product
+from benchmarks.checks import burst
+
+MISSES = 500
+
+
+def test_concurrent_misses_query_the_product_once(app, make_product, monkeypatch):
+    product_id = str(make_product().pk)
+    product_cache.invalidate_all()
+
+    finds = Counter()
+    find = mongomock.collection.Collection.find
+
+    def counted_find(collection, *args, **kwargs):
+        finds[collection.name] += 1
+        return find(collection, *args, **kwargs)
+    monkeypatch.setattr(mongomock.collection.Collection, "find", counted_find)
+
+    def read(_):
+        response = app.test_client().get(f"/products/{product_id}")
+        return response.status_code, response.get_json()
+
+    statuses = burst(MISSES, read)
+    assert statuses == Counter({200: MISSES})
+    assert finds[Product._get_collection_name()] == 1
@@ -0,0 +1,70 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from limits import parse
+from limits.strategies import FixedWindowRateLimiter
+from backend.ratelimit_storage import LeasedStorage
+
+
+def store_uri():
+    # a fresh fake shared store per test; storages with the same URI share it
+    return f"leased+memory://{uuid.uuid4().hex}"
+
+
+def test_limit_is_shared_across_workers():
+    uri = store_uri()
+    workers = [FixedWindowRateLimiter(LeasedStorage(uri)) for _ in range(4)]
+    limit = parse("20/minute")
+
+    allowed = sum(workers[i % 4].hit(limit, "10.0.0.1", "products.read_product") for i in range(100))
+
+    assert allowed == 20
+
+
+def test_low_limits_stay_exact_under_concurrency():
+    uri = store_uri()
+    workers = [FixedWindowRateLimiter(LeasedStorage(uri)) for _ in range(4)]
+    limit = parse("5/minute")
+    barrier = threading.Barrier(40)
+
+    def hit(i):
+        barrier.wait()
+        return workers[i % 4].hit(limit, "10.0.0.1", "auth.login")
+
+    with ThreadPoolExecutor(40) as pool:
+        assert sum(pool.map(hit, range(40))) == 5
+
+
+def test_hot_keys_are_served_from_the_lease():
+    uri = store_uri()
+    leased = LeasedStorage(uri, max_lease=50)
+    limiter = FixedWindowRateLimiter(leased)
+    limit = parse("1000/minute")
+
+    for _ in range(500):
+        assert limiter.hit(limit, "10.0.0.1", "products.all_products")
+
+    assert leased.store_calls < 50
+    assert leased.local_hits + leased.store_calls == 500
+
+
+def test_expired_leases_are_pruned():
+    uri = store_uri()
+    leased = LeasedStorage(uri, prune_interval=0)
+    for i in range(100):
+        leased.incr(f"LIMITER/10.0.{i}.1/products.read_product/1/1/second", expiry=0)
+    leased.incr("LIMITER/10.0.0.1/products.read_product/1/1/minute", expiry=60)
+
+    assert list(leased._leases) == ["LIMITER/10.0.0.1/products.read_product/1/1/minute"]
+
+
+def test_clear_resets_the_shared_counter():
+    uri = store_uri()
+    first, second = LeasedStorage(uri), LeasedStorage(uri)
+    limiter = FixedWindowRateLimiter(first)
+    limit = parse("2/minute")
+    assert limiter.hit(limit, "k") and limiter.hit(limit, "k") and not limiter.hit(limit, "k")
+
+    FixedWindowRateLimiter(second).clear(limit, "k")
+
+    assert limiter.hit(limit, "k")
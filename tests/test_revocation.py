@@ -0,0 +1,74 @@
+import time
+import uuid
+import pytest
+from backend.blueprints.auth.revocation import RevocationCache
+from backend.pubsub import InMemoryChannel
+
+
+@pytest.fixture
+def workers(app, app_context):
+    # -> make(n): n revocation caches ("workers") on one in-memory channel
+    channels = []
+
+    def make(n, channel_name=None):
+        name = channel_name or uuid.uuid4().hex
+        caches = []
+        for _ in range(n):
+            channel = InMemoryChannel(name)
+            channels.append(channel)
+            cache = RevocationCache()
+            cache.init_app(app, channel)
+            caches.append(cache)
+        return caches
+
+    yield make
+    for channel in channels:
+        channel.close()
+
+
+def token():
+    return uuid.uuid4().hex, int(time.time()) + 3600
+
+
+def test_revocation_fans_out_to_every_worker(workers):
+    first, second, third = workers(3)
+    jti, exp = token()
+    assert not any(cache.is_revoked(jti, exp) for cache in (first, second, third))
+
+    first.revoke(jti, exp)
+
+    assert all(cache.is_revoked(jti, exp) for cache in (first, second, third))
+    # answered from the LRU, not the database
+    assert second.to_json()["db_lookups"] == third.to_json()["db_lookups"] == 0
+
+
+def test_unrevoked_tokens_skip_the_database(workers):
+    cache, = workers(1)
+    for _ in range(10):
+        cache.is_revoked(*token())
+    assert cache.to_json()["db_lookups"] == 0
+    assert cache.to_json()["bloom_skips"] == 10
+
+
+def test_dropped_message_is_picked_up_after_the_negative_ttl(app, workers, monkeypatch):
+    monkeypatch.setitem(app.config, "REVOCATION_NEGATIVE_TTL", 0.2)
+    publisher, = workers(1)
+    other, = workers(1)  # on another channel: never hears the revocation
+    jti, exp = token()
+    assert not other.is_revoked(jti, exp)
+
+    publisher.revoke(jti, exp)
+    assert not other.is_revoked(jti, exp)  # cached "not revoked"
+
+    time.sleep(0.3)
+    assert other.is_revoked(jti, exp)
+
+
+def test_resubscribe_forgets_cached_answers(workers):
+    cache, = workers(1)
+    jti, exp = token()
+    cache.is_revoked(jti, exp)
+    assert cache.to_json()["cached_tokens"] == 1
+
+    cache._on_resubscribe()
+    assert cache.to_json()["cached_tokens"] == 0